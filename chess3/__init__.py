@@ -6,6 +6,19 @@ import re
 import random
 import struct
 import platform
+import time
+import itertools
+import mmap
+import os
+import tempfile
+
+from chess3.bitboard import (
+    WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+    WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE,
+    RANK_1, RANK_2, RANK_7, RANK_8, FILE_A, FILE_H, FULL, SQUARE_COORDS, CASTLING_MASKS, BETWEEN, LINE,
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROOK_MASKS, ROOK_TABLE,
+    BISHOP_MASKS, BISHOP_TABLE, popcount, lsb, squares)
+from chess3.evaluation import MG, EG, PHASE, PHASE_TOTAL, MG_VALUES
 
 __version__ = '0.3'
 
@@ -14,7 +27,7 @@ if sys.version_info < (3, 0):
 
 if platform.system() != 'Windows':
     try:
-        from multiprocessing import Pool, cpu_count
+        from multiprocessing import Pool, TimeoutError as PoolTimeoutError, cpu_count
     except:
         pass
 
@@ -37,6 +50,9 @@ CHECKMATE = 2
 # default search depth
 DEFAULT_DEPTH = 3
 
+# deepest iteration of a search that is only limited by time or nodes
+MAX_DEPTH = 64
+
 
 def to_pos(i, j):
     """Convert a coordinate (with 0,0 at bottom left) on the board to the standard representation
@@ -87,26 +103,87 @@ def team_str(team):
     return 'black' if team == TEAM_BLACKS else 'white'
 
 
+# names of the cells, by index (a1 = 0, h8 = 63)
+SQUARE_NAMES = tuple(to_pos(sq % 8, sq // 8) for sq in range(64))
+SQUARE_INDEXES = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+
+# promotion part <-> the 3 bits used in the 16-bits encoding of a move
+PROMOTION_CODES = {None: 0, 'n': 1, 'b': 2, 'r': 3, 'q': 4, 'N': 1, 'B': 2, 'R': 3, 'Q': 4}
+
+
 class Move:
 
-    """represent a player's action"""
+    """represent a player's action
+
+       The cells are given either as (i, j) coordinates, or as indexes from 0 (a1) to 63 (h8).
+       Moves are equal when they have the same origin, target and promotion, so that they may be
+       used as dict keys. The `code` property packs these three into 16 bits, as polyglot books do :
+
+       >>> Move((4, 1), (4, 3)).code
+       796
+       >>> Move.from_code(796) == Move.from_xboard_notation('e2e4')
+       True
+    """
+
+    __slots__ = ('from_square', 'to_square', 'promotion',
+                 'enpassant', 'castling', 'capture')
 
     def __init__(self, _from, to, promotion=None, enpassant=None, castling=False, capture=False):
-        self._from = _from
-        self.to = to
+        if _from.__class__ is tuple:
+            _from = _from[1] * 8 + _from[0]
+        if to.__class__ is tuple:
+            to = to[1] * 8 + to[0]
+        self.from_square = _from
+        self.to_square = to
         self.promotion = promotion
         self.enpassant = enpassant
         self.castling = castling
         self.capture = capture
 
+    @property
+    def _from(self):
+        return SQUARE_COORDS[self.from_square]
+
+    @property
+    def to(self):
+        return SQUARE_COORDS[self.to_square]
+
+    @property
+    def code(self):
+        return self.to_square | self.from_square << 6 | PROMOTION_CODES[self.promotion] << 12
+
+    @classmethod
+    def from_code(clazz, code, team=TEAM_WHITES):
+        p = ' nbrq'[code >> 12 & 7].strip() or None
+        if p and team == TEAM_WHITES:
+            p = p.upper()
+        return Move(code >> 6 & 63, code & 63, promotion=p)
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.code == other.code
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self.code
+
     def to_xboard_notation(self):
-        m = to_pos(*self._from) + to_pos(*self.to)
+        m = SQUARE_NAMES[self.from_square] + SQUARE_NAMES[self.to_square]
         if self.promotion:
             m += self.promotion.lower()
         return m
 
+    @classmethod
+    def from_xboard_notation(clazz, notation, team=TEAM_WHITES):
+        """parses a move like 'e2e4' or 'a7a8q'"""
+        p = notation[4:5] or None
+        if p and team == TEAM_WHITES:
+            p = p.upper()
+        return Move(SQUARE_INDEXES[notation[0:2]], SQUARE_INDEXES[notation[2:4]], promotion=p)
+
     def dest_square(self):
-        return to_pos(*self.to)
+        return SQUARE_NAMES[self.to_square]
 
     def __str__(self):
         s = self.to_xboard_notation()
@@ -127,645 +204,849 @@ class Move:
         return self.to_xboard_notation()
 
     @classmethod
-    def from_polyglot(clazz, move, team=TEAM_WHITES):
-        to_i = (move & int('0000000000000111', 2))
-        to_j = (move & int('0000000000111000', 2)) >> 3
-        target = to_pos(to_i, to_j)
-
-        from_i = (move & int('0000000111000000', 2)) >> 6
-        from_j = (move & int('0000111000000000', 2)) >> 9
-        initial = to_pos(from_i, from_j)
-        p = {0: None, 1: 'n', 2: 'b', 3: 'r', 4: 'q'}[
-            (move & int('0111000000000000', 2)) >> 12]
-        p = p.upper() if team == TEAM_WHITES and p != None else p
-
-        # castling:
-        repr = initial + target
-        if repr in ['e1h1', 'e1a1', 'e8h8', 'e8a8']:
-            return {
-                'e1h1': Move(_from=(4, 0), to=(6, 0), castling=True),
-                'e1a1': Move(_from=(4, 0), to=(2, 0), castling=True),
-                'e8h8': Move(_from=(4, 7), to=(6, 7), castling=True),
-                'e8a8': Move(_from=(4, 7), to=(2, 7), castling=True)
-            }[repr]
-        else:
-            return Move(to_coord(initial), to_coord(target), promotion=p)
+    def from_polyglot(clazz, move, team=TEAM_WHITES, board=None):
+        m = Move.from_code(move, team)
+        # polyglot encodes castling as the king taking its own rook (when a board is given, only a move
+        # of its king is read as castling)
+        if m.from_square in (4, 60) and m.to_square - m.from_square in (3, -4) \
+                and (board is None or board._mailbox[m.from_square] in (KING, KING + 6)):
+            return Move(m.from_square, m.from_square + (2 if m.to_square > m.from_square else -2), castling=True)
+        return m
+
+
+INITIAL_REPR = 'HNBQABNH' + 'P' * 8 + '.' * 32 + 'p' * 8 + 'hnbqabnh'
+
+# letters of the string representation -> piece index (see chess3.bitboard)
+REPR_PIECES = {
+    'P': 0, 'N': 1, 'B': 2, 'R': 3, 'H': 3, 'Q': 4, 'K': 5, 'A': 5, 'Z': 5,
+    'p': 6, 'n': 7, 'b': 8, 'r': 9, 'h': 9, 'q': 10, 'k': 11, 'a': 11, 'z': 11}
+
+PROMOTIONS = {'n': KNIGHT, 'b': BISHOP, 'r': ROOK, 'q': QUEEN}
+
+# a move in SAN, once castling and the check marks are set aside : part, origin file and rank, target, promotion
+SAN_PATTERN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+SAN_KINDS = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+
+# values of the parts, from Claude Shannon's paper
+MATERIAL = (1, 3, 3, 5, 9, 0)
+
+
+# random numbers used for Zobrist hashing, as defined by the polyglot book format
+RANDOM64 = [
+        0x9D39247E33776D41, 0x2AF7398005AAA5C7, 0x44DB015024623547, 0x9C15F73E62A76AE2,
+        0x75834465489C0C89, 0x3290AC3A203001BF, 0x0FBBAD1F61042279, 0xE83A908FF2FB60CA,
+        0x0D7E765D58755C10, 0x1A083822CEAFE02D, 0x9605D5F0E25EC3B0, 0xD021FF5CD13A2ED5,
+        0x40BDF15D4A672E32, 0x011355146FD56395, 0x5DB4832046F3D9E5, 0x239F8B2D7FF719CC,
+        0x05D1A1AE85B49AA1, 0x679F848F6E8FC971, 0x7449BBFF801FED0B, 0x7D11CDB1C3B7ADF0,
+        0x82C7709E781EB7CC, 0xF3218F1C9510786C, 0x331478F3AF51BBE6, 0x4BB38DE5E7219443,
+        0xAA649C6EBCFD50FC, 0x8DBD98A352AFD40B, 0x87D2074B81D79217, 0x19F3C751D3E92AE1,
+        0xB4AB30F062B19ABF, 0x7B0500AC42047AC4, 0xC9452CA81A09D85D, 0x24AA6C514DA27500,
+        0x4C9F34427501B447, 0x14A68FD73C910841, 0xA71B9B83461CBD93, 0x03488B95B0F1850F,
+        0x637B2B34FF93C040, 0x09D1BC9A3DD90A94, 0x3575668334A1DD3B, 0x735E2B97A4C45A23,
+        0x18727070F1BD400B, 0x1FCBACD259BF02E7, 0xD310A7C2CE9B6555, 0xBF983FE0FE5D8244,
+        0x9F74D14F7454A824, 0x51EBDC4AB9BA3035, 0x5C82C505DB9AB0FA, 0xFCF7FE8A3430B241,
+        0x3253A729B9BA3DDE, 0x8C74C368081B3075, 0xB9BC6C87167C33E7, 0x7EF48F2B83024E20,
+        0x11D505D4C351BD7F, 0x6568FCA92C76A243, 0x4DE0B0F40F32A7B8, 0x96D693460CC37E5D,
+        0x42E240CB63689F2F, 0x6D2BDCDAE2919661, 0x42880B0236E4D951, 0x5F0F4A5898171BB6,
+        0x39F890F579F92F88, 0x93C5B5F47356388B, 0x63DC359D8D231B78, 0xEC16CA8AEA98AD76,
+        0x5355F900C2A82DC7, 0x07FB9F855A997142, 0x5093417AA8A7ED5E, 0x7BCBC38DA25A7F3C,
+        0x19FC8A768CF4B6D4, 0x637A7780DECFC0D9, 0x8249A47AEE0E41F7, 0x79AD695501E7D1E8,
+        0x14ACBAF4777D5776, 0xF145B6BECCDEA195, 0xDABF2AC8201752FC, 0x24C3C94DF9C8D3F6,
+        0xBB6E2924F03912EA, 0x0CE26C0B95C980D9, 0xA49CD132BFBF7CC4, 0xE99D662AF4243939,
+        0x27E6AD7891165C3F, 0x8535F040B9744FF1, 0x54B3F4FA5F40D873, 0x72B12C32127FED2B,
+        0xEE954D3C7B411F47, 0x9A85AC909A24EAA1, 0x70AC4CD9F04F21F5, 0xF9B89D3E99A075C2,
+        0x87B3E2B2B5C907B1, 0xA366E5B8C54F48B8, 0xAE4A9346CC3F7CF2, 0x1920C04D47267BBD,
+        0x87BF02C6B49E2AE9, 0x092237AC237F3859, 0xFF07F64EF8ED14D0, 0x8DE8DCA9F03CC54E,
+        0x9C1633264DB49C89, 0xB3F22C3D0B0B38ED, 0x390E5FB44D01144B, 0x5BFEA5B4712768E9,
+        0x1E1032911FA78984, 0x9A74ACB964E78CB3, 0x4F80F7A035DAFB04, 0x6304D09A0B3738C4,
+        0x2171E64683023A08, 0x5B9B63EB9CEFF80C, 0x506AACF489889342, 0x1881AFC9A3A701D6,
+        0x6503080440750644, 0xDFD395339CDBF4A7, 0xEF927DBCF00C20F2, 0x7B32F7D1E03680EC,
+        0xB9FD7620E7316243, 0x05A7E8A57DB91B77, 0xB5889C6E15630A75, 0x4A750A09CE9573F7,
+        0xCF464CEC899A2F8A, 0xF538639CE705B824, 0x3C79A0FF5580EF7F, 0xEDE6C87F8477609D,
+        0x799E81F05BC93F31, 0x86536B8CF3428A8C, 0x97D7374C60087B73, 0xA246637CFF328532,
+        0x043FCAE60CC0EBA0, 0x920E449535DD359E, 0x70EB093B15B290CC, 0x73A1921916591CBD,
+        0x56436C9FE1A1AA8D, 0xEFAC4B70633B8F81, 0xBB215798D45DF7AF, 0x45F20042F24F1768,
+        0x930F80F4E8EB7462, 0xFF6712FFCFD75EA1, 0xAE623FD67468AA70, 0xDD2C5BC84BC8D8FC,
+        0x7EED120D54CF2DD9, 0x22FE545401165F1C, 0xC91800E98FB99929, 0x808BD68E6AC10365,
+        0xDEC468145B7605F6, 0x1BEDE3A3AEF53302, 0x43539603D6C55602, 0xAA969B5C691CCB7A,
+        0xA87832D392EFEE56, 0x65942C7B3C7E11AE, 0xDED2D633CAD004F6, 0x21F08570F420E565,
+        0xB415938D7DA94E3C, 0x91B859E59ECB6350, 0x10CFF333E0ED804A, 0x28AED140BE0BB7DD,
+        0xC5CC1D89724FA456, 0x5648F680F11A2741, 0x2D255069F0B7DAB3, 0x9BC5A38EF729ABD4,
+        0xEF2F054308F6A2BC, 0xAF2042F5CC5C2858, 0x480412BAB7F5BE2A, 0xAEF3AF4A563DFE43,
+        0x19AFE59AE451497F, 0x52593803DFF1E840, 0xF4F076E65F2CE6F0, 0x11379625747D5AF3,
+        0xBCE5D2248682C115, 0x9DA4243DE836994F, 0x066F70B33FE09017, 0x4DC4DE189B671A1C,
+        0x51039AB7712457C3, 0xC07A3F80C31FB4B4, 0xB46EE9C5E64A6E7C, 0xB3819A42ABE61C87,
+        0x21A007933A522A20, 0x2DF16F761598AA4F, 0x763C4A1371B368FD, 0xF793C46702E086A0,
+        0xD7288E012AEB8D31, 0xDE336A2A4BC1C44B, 0x0BF692B38D079F23, 0x2C604A7A177326B3,
+        0x4850E73E03EB6064, 0xCFC447F1E53C8E1B, 0xB05CA3F564268D99, 0x9AE182C8BC9474E8,
+        0xA4FC4BD4FC5558CA, 0xE755178D58FC4E76, 0x69B97DB1A4C03DFE, 0xF9B5B7C4ACC67C96,
+        0xFC6A82D64B8655FB, 0x9C684CB6C4D24417, 0x8EC97D2917456ED0, 0x6703DF9D2924E97E,
+        0xC547F57E42A7444E, 0x78E37644E7CAD29E, 0xFE9A44E9362F05FA, 0x08BD35CC38336615,
+        0x9315E5EB3A129ACE, 0x94061B871E04DF75, 0xDF1D9F9D784BA010, 0x3BBA57B68871B59D,
+        0xD2B7ADEEDED1F73F, 0xF7A255D83BC373F8, 0xD7F4F2448C0CEB81, 0xD95BE88CD210FFA7,
+        0x336F52F8FF4728E7, 0xA74049DAC312AC71, 0xA2F61BB6E437FDB5, 0x4F2A5CB07F6A35B3,
+        0x87D380BDA5BF7859, 0x16B9F7E06C453A21, 0x7BA2484C8A0FD54E, 0xF3A678CAD9A2E38C,
+        0x39B0BF7DDE437BA2, 0xFCAF55C1BF8A4424, 0x18FCF680573FA594, 0x4C0563B89F495AC3,
+        0x40E087931A00930D, 0x8CFFA9412EB642C1, 0x68CA39053261169F, 0x7A1EE967D27579E2,
+        0x9D1D60E5076F5B6F, 0x3810E399B6F65BA2, 0x32095B6D4AB5F9B1, 0x35CAB62109DD038A,
+        0xA90B24499FCFAFB1, 0x77A225A07CC2C6BD, 0x513E5E634C70E331, 0x4361C0CA3F692F12,
+        0xD941ACA44B20A45B, 0x528F7C8602C5807B, 0x52AB92BEB9613989, 0x9D1DFA2EFC557F73,
+        0x722FF175F572C348, 0x1D1260A51107FE97, 0x7A249A57EC0C9BA2, 0x04208FE9E8F7F2D6,
+        0x5A110C6058B920A0, 0x0CD9A497658A5698, 0x56FD23C8F9715A4C, 0x284C847B9D887AAE,
+        0x04FEABFBBDB619CB, 0x742E1E651C60BA83, 0x9A9632E65904AD3C, 0x881B82A13B51B9E2,
+        0x506E6744CD974924, 0xB0183DB56FFC6A79, 0x0ED9B915C66ED37E, 0x5E11E86D5873D484,
+        0xF678647E3519AC6E, 0x1B85D488D0F20CC5, 0xDAB9FE6525D89021, 0x0D151D86ADB73615,
+        0xA865A54EDCC0F019, 0x93C42566AEF98FFB, 0x99E7AFEABE000731, 0x48CBFF086DDF285A,
+        0x7F9B6AF1EBF78BAF, 0x58627E1A149BBA21, 0x2CD16E2ABD791E33, 0xD363EFF5F0977996,
+        0x0CE2A38C344A6EED, 0x1A804AADB9CFA741, 0x907F30421D78C5DE, 0x501F65EDB3034D07,
+        0x37624AE5A48FA6E9, 0x957BAF61700CFF4E, 0x3A6C27934E31188A, 0xD49503536ABCA345,
+        0x088E049589C432E0, 0xF943AEE7FEBF21B8, 0x6C3B8E3E336139D3, 0x364F6FFA464EE52E,
+        0xD60F6DCEDC314222, 0x56963B0DCA418FC0, 0x16F50EDF91E513AF, 0xEF1955914B609F93,
+        0x565601C0364E3228, 0xECB53939887E8175, 0xBAC7A9A18531294B, 0xB344C470397BBA52,
+        0x65D34954DAF3CEBD, 0xB4B81B3FA97511E2, 0xB422061193D6F6A7, 0x071582401C38434D,
+        0x7A13F18BBEDC4FF5, 0xBC4097B116C524D2, 0x59B97885E2F2EA28, 0x99170A5DC3115544,
+        0x6F423357E7C6A9F9, 0x325928EE6E6F8794, 0xD0E4366228B03343, 0x565C31F7DE89EA27,
+        0x30F5611484119414, 0xD873DB391292ED4F, 0x7BD94E1D8E17DEBC, 0xC7D9F16864A76E94,
+        0x947AE053EE56E63C, 0xC8C93882F9475F5F, 0x3A9BF55BA91F81CA, 0xD9A11FBB3D9808E4,
+        0x0FD22063EDC29FCA, 0xB3F256D8ACA0B0B9, 0xB03031A8B4516E84, 0x35DD37D5871448AF,
+        0xE9F6082B05542E4E, 0xEBFAFA33D7254B59, 0x9255ABB50D532280, 0xB9AB4CE57F2D34F3,
+        0x693501D628297551, 0xC62C58F97DD949BF, 0xCD454F8F19C5126A, 0xBBE83F4ECC2BDECB,
+        0xDC842B7E2819E230, 0xBA89142E007503B8, 0xA3BC941D0A5061CB, 0xE9F6760E32CD8021,
+        0x09C7E552BC76492F, 0x852F54934DA55CC9, 0x8107FCCF064FCF56, 0x098954D51FFF6580,
+        0x23B70EDB1955C4BF, 0xC330DE426430F69D, 0x4715ED43E8A45C0A, 0xA8D7E4DAB780A08D,
+        0x0572B974F03CE0BB, 0xB57D2E985E1419C7, 0xE8D9ECBE2CF3D73F, 0x2FE4B17170E59750,
+        0x11317BA87905E790, 0x7FBF21EC8A1F45EC, 0x1725CABFCB045B00, 0x964E915CD5E2B207,
+        0x3E2B8BCBF016D66D, 0xBE7444E39328A0AC, 0xF85B2B4FBCDE44B7, 0x49353FEA39BA63B1,
+        0x1DD01AAFCD53486A, 0x1FCA8A92FD719F85, 0xFC7C95D827357AFA, 0x18A6A990C8B35EBD,
+        0xCCCB7005C6B9C28D, 0x3BDBB92C43B17F26, 0xAA70B5B4F89695A2, 0xE94C39A54A98307F,
+        0xB7A0B174CFF6F36E, 0xD4DBA84729AF48AD, 0x2E18BC1AD9704A68, 0x2DE0966DAF2F8B1C,
+        0xB9C11D5B1E43A07E, 0x64972D68DEE33360, 0x94628D38D0C20584, 0xDBC0D2B6AB90A559,
+        0xD2733C4335C6A72F, 0x7E75D99D94A70F4D, 0x6CED1983376FA72B, 0x97FCAACBF030BC24,
+        0x7B77497B32503B12, 0x8547EDDFB81CCB94, 0x79999CDFF70902CB, 0xCFFE1939438E9B24,
+        0x829626E3892D95D7, 0x92FAE24291F2B3F1, 0x63E22C147B9C3403, 0xC678B6D860284A1C,
+        0x5873888850659AE7, 0x0981DCD296A8736D, 0x9F65789A6509A440, 0x9FF38FED72E9052F,
+        0xE479EE5B9930578C, 0xE7F28ECD2D49EECD, 0x56C074A581EA17FE, 0x5544F7D774B14AEF,
+        0x7B3F0195FC6F290F, 0x12153635B2C0CF57, 0x7F5126DBBA5E0CA7, 0x7A76956C3EAFB413,
+        0x3D5774A11D31AB39, 0x8A1B083821F40CB4, 0x7B4A38E32537DF62, 0x950113646D1D6E03,
+        0x4DA8979A0041E8A9, 0x3BC36E078F7515D7, 0x5D0A12F27AD310D1, 0x7F9D1A2E1EBE1327,
+        0xDA3A361B1C5157B1, 0xDCDD7D20903D0C25, 0x36833336D068F707, 0xCE68341F79893389,
+        0xAB9090168DD05F34, 0x43954B3252DC25E5, 0xB438C2B67F98E5E9, 0x10DCD78E3851A492,
+        0xDBC27AB5447822BF, 0x9B3CDB65F82CA382, 0xB67B7896167B4C84, 0xBFCED1B0048EAC50,
+        0xA9119B60369FFEBD, 0x1FFF7AC80904BF45, 0xAC12FB171817EEE7, 0xAF08DA9177DDA93D,
+        0x1B0CAB936E65C744, 0xB559EB1D04E5E932, 0xC37B45B3F8D6F2BA, 0xC3A9DC228CAAC9E9,
+        0xF3B8B6675A6507FF, 0x9FC477DE4ED681DA, 0x67378D8ECCEF96CB, 0x6DD856D94D259236,
+        0xA319CE15B0B4DB31, 0x073973751F12DD5E, 0x8A8E849EB32781A5, 0xE1925C71285279F5,
+        0x74C04BF1790C0EFE, 0x4DDA48153C94938A, 0x9D266D6A1CC0542C, 0x7440FB816508C4FE,
+        0x13328503DF48229F, 0xD6BF7BAEE43CAC40, 0x4838D65F6EF6748F, 0x1E152328F3318DEA,
+        0x8F8419A348F296BF, 0x72C8834A5957B511, 0xD7A023A73260B45C, 0x94EBC8ABCFB56DAE,
+        0x9FC10D0F989993E0, 0xDE68A2355B93CAE6, 0xA44CFE79AE538BBE, 0x9D1D84FCCE371425,
+        0x51D2B1AB2DDFB636, 0x2FD7E4B9E72CD38C, 0x65CA5B96B7552210, 0xDD69A0D8AB3B546D,
+        0x604D51B25FBF70E2, 0x73AA8A564FB7AC9E, 0x1A8C1E992B941148, 0xAAC40A2703D9BEA0,
+        0x764DBEAE7FA4F3A6, 0x1E99B96E70A9BE8B, 0x2C5E9DEB57EF4743, 0x3A938FEE32D29981,
+        0x26E6DB8FFDF5ADFE, 0x469356C504EC9F9D, 0xC8763C5B08D1908C, 0x3F6C6AF859D80055,
+        0x7F7CC39420A3A545, 0x9BFB227EBDF4C5CE, 0x89039D79D6FC5C5C, 0x8FE88B57305E2AB6,
+        0xA09E8C8C35AB96DE, 0xFA7E393983325753, 0xD6B6D0ECC617C699, 0xDFEA21EA9E7557E3,
+        0xB67C1FA481680AF8, 0xCA1E3785A9E724E5, 0x1CFC8BED0D681639, 0xD18D8549D140CAEA,
+        0x4ED0FE7E9DC91335, 0xE4DBF0634473F5D2, 0x1761F93A44D5AEFE, 0x53898E4C3910DA55,
+        0x734DE8181F6EC39A, 0x2680B122BAA28D97, 0x298AF231C85BAFAB, 0x7983EED3740847D5,
+        0x66C1A2A1A60CD889, 0x9E17E49642A3E4C1, 0xEDB454E7BADC0805, 0x50B704CAB602C329,
+        0x4CC317FB9CDDD023, 0x66B4835D9EAFEA22, 0x219B97E26FFC81BD, 0x261E4E4C0A333A9D,
+        0x1FE2CCA76517DB90, 0xD7504DFA8816EDBB, 0xB9571FA04DC089C8, 0x1DDC0325259B27DE,
+        0xCF3F4688801EB9AA, 0xF4F5D05C10CAB243, 0x38B6525C21A42B0E, 0x36F60E2BA4FA6800,
+        0xEB3593803173E0CE, 0x9C4CD6257C5A3603, 0xAF0C317D32ADAA8A, 0x258E5A80C7204C4B,
+        0x8B889D624D44885D, 0xF4D14597E660F855, 0xD4347F66EC8941C3, 0xE699ED85B0DFB40D,
+        0x2472F6207C2D0484, 0xC2A1E7B5B459AEB5, 0xAB4F6451CC1D45EC, 0x63767572AE3D6174,
+        0xA59E0BD101731A28, 0x116D0016CB948F09, 0x2CF9C8CA052F6E9F, 0x0B090A7560A968E3,
+        0xABEEDDB2DDE06FF1, 0x58EFC10B06A2068D, 0xC6E57A78FBD986E0, 0x2EAB8CA63CE802D7,
+        0x14A195640116F336, 0x7C0828DD624EC390, 0xD74BBE77E6116AC7, 0x804456AF10F5FB53,
+        0xEBE9EA2ADF4321C7, 0x03219A39EE587A30, 0x49787FEF17AF9924, 0xA1E9300CD8520548,
+        0x5B45E522E4B1B4EF, 0xB49C3B3995091A36, 0xD4490AD526F14431, 0x12A8F216AF9418C2,
+        0x001F837CC7350524, 0x1877B51E57A764D5, 0xA2853B80F17F58EE, 0x993E1DE72D36D310,
+        0xB3598080CE64A656, 0x252F59CF0D9F04BB, 0xD23C8E176D113600, 0x1BDA0492E7E4586E,
+        0x21E0BD5026C619BF, 0x3B097ADAF088F94E, 0x8D14DEDB30BE846E, 0xF95CFFA23AF5F6F4,
+        0x3871700761B3F743, 0xCA672B91E9E4FA16, 0x64C8E531BFF53B55, 0x241260ED4AD1E87D,
+        0x106C09B972D2E822, 0x7FBA195410E5CA30, 0x7884D9BC6CB569D8, 0x0647DFEDCD894A29,
+        0x63573FF03E224774, 0x4FC8E9560F91B123, 0x1DB956E450275779, 0xB8D91274B9E9D4FB,
+        0xA2EBEE47E2FBFCE1, 0xD9F1F30CCD97FB09, 0xEFED53D75FD64E6B, 0x2E6D02C36017F67F,
+        0xA9AA4D20DB084E9B, 0xB64BE8D8B25396C1, 0x70CB6AF7C2D5BCF0, 0x98F076A4F7A2322E,
+        0xBF84470805E69B5F, 0x94C3251F06F90CF3, 0x3E003E616A6591E9, 0xB925A6CD0421AFF3,
+        0x61BDD1307C66E300, 0xBF8D5108E27E0D48, 0x240AB57A8B888B20, 0xFC87614BAF287E07,
+        0xEF02CDD06FFDB432, 0xA1082C0466DF6C0A, 0x8215E577001332C8, 0xD39BB9C3A48DB6CF,
+        0x2738259634305C14, 0x61CF4F94C97DF93D, 0x1B6BACA2AE4E125B, 0x758F450C88572E0B,
+        0x959F587D507A8359, 0xB063E962E045F54D, 0x60E8ED72C0DFF5D1, 0x7B64978555326F9F,
+        0xFD080D236DA814BA, 0x8C90FD9B083F4558, 0x106F72FE81E2C590, 0x7976033A39F7D952,
+        0xA4EC0132764CA04B, 0x733EA705FAE4FA77, 0xB4D8F77BC3E56167, 0x9E21F4F903B33FD9,
+        0x9D765E419FB69F6D, 0xD30C088BA61EA5EF, 0x5D94337FBFAF7F5B, 0x1A4E4822EB4D7A59,
+        0x6FFE73E81B637FB3, 0xDDF957BC36D8B9CA, 0x64D0E29EEA8838B3, 0x08DD9BDFD96B9F63,
+        0x087E79E5A57D1D13, 0xE328E230E3E2B3FB, 0x1C2559E30F0946BE, 0x720BF5F26F4D2EAA,
+        0xB0774D261CC609DB, 0x443F64EC5A371195, 0x4112CF68649A260E, 0xD813F2FAB7F5C5CA,
+        0x660D3257380841EE, 0x59AC2C7873F910A3, 0xE846963877671A17, 0x93B633ABFA3469F8,
+        0xC0C0F5A60EF4CDCF, 0xCAF21ECD4377B28C, 0x57277707199B8175, 0x506C11B9D90E8B1D,
+        0xD83CC2687A19255F, 0x4A29C6465A314CD1, 0xED2DF21216235097, 0xB5635C95FF7296E2,
+        0x22AF003AB672E811, 0x52E762596BF68235, 0x9AEBA33AC6ECC6B0, 0x944F6DE09134DFB6,
+        0x6C47BEC883A7DE39, 0x6AD047C430A12104, 0xA5B1CFDBA0AB4067, 0x7C45D833AFF07862,
+        0x5092EF950A16DA0B, 0x9338E69C052B8E7B, 0x455A4B4CFE30E3F5, 0x6B02E63195AD0CF8,
+        0x6B17B224BAD6BF27, 0xD1E0CCD25BB9C169, 0xDE0C89A556B9AE70, 0x50065E535A213CF6,
+        0x9C1169FA2777B874, 0x78EDEFD694AF1EED, 0x6DC93D9526A50E68, 0xEE97F453F06791ED,
+        0x32AB0EDB696703D3, 0x3A6853C7E70757A7, 0x31865CED6120F37D, 0x67FEF95D92607890,
+        0x1F2B1D1F15F6DC9C, 0xB69E38A8965C6B65, 0xAA9119FF184CCCF4, 0xF43C732873F24C13,
+        0xFB4A3D794A9A80D2, 0x3550C2321FD6109C, 0x371F77E76BB8417E, 0x6BFA9AAE5EC05779,
+        0xCD04F3FF001A4778, 0xE3273522064480CA, 0x9F91508BFFCFC14A, 0x049A7F41061A9E60,
+        0xFCB6BE43A9F2FE9B, 0x08DE8A1C7797DA9B, 0x8F9887E6078735A1, 0xB5B4071DBFC73A66,
+        0x230E343DFBA08D33, 0x43ED7F5A0FAE657D, 0x3A88A0FBBCB05C63, 0x21874B8B4D2DBC4F,
+        0x1BDEA12E35F6A8C9, 0x53C065C6C8E63528, 0xE34A1D250E7A8D6B, 0xD6B04D3B7651DD7E,
+        0x5E90277E7CB39E2D, 0x2C046F22062DC67D, 0xB10BB459132D0A26, 0x3FA9DDFB67E2F199,
+        0x0E09B88E1914F7AF, 0x10E8B35AF3EEAB37, 0x9EEDECA8E272B933, 0xD4C718BC4AE8AE5F,
+        0x81536D601170FC20, 0x91B534F885818A06, 0xEC8177F83F900978, 0x190E714FADA5156E,
+        0xB592BF39B0364963, 0x89C350C893AE7DC1, 0xAC042E70F8B383F2, 0xB49B52E587A1EE60,
+        0xFB152FE3FF26DA89, 0x3E666E6F69AE2C15, 0x3B544EBE544C19F9, 0xE805A1E290CF2456,
+        0x24B33C9D7ED25117, 0xE74733427B72F0C1, 0x0A804D18B7097475, 0x57E3306D881EDB4F,
+        0x4AE7D6A36EB5DBCB, 0x2D8D5432157064C8, 0xD1E649DE1E7F268B, 0x8A328A1CEDFE552C,
+        0x07A3AEC79624C7DA, 0x84547DDC3E203C94, 0x990A98FD5071D263, 0x1A4FF12616EEFC89,
+        0xF6F7FD1431714200, 0x30C05B1BA332F41C, 0x8D2636B81555A786, 0x46C9FEB55D120902,
+        0xCCEC0A73B49C9921, 0x4E9D2827355FC492, 0x19EBB029435DCB0F, 0x4659D2B743848A2C,
+        0x963EF2C96B33BE31, 0x74F85198B05A2E7D, 0x5A0F544DD2B1FB18, 0x03727073C2E134B1,
+        0xC7F6AA2DE59AEA61, 0x352787BAA0D7C22F, 0x9853EAB63B5E0B35, 0xABBDCDD7ED5C0860,
+        0xCF05DAF5AC8D77B0, 0x49CAD48CEBF4A71E, 0x7A4C10EC2158C4A6, 0xD9E92AA246BF719E,
+        0x13AE978D09FE5557, 0x730499AF921549FF, 0x4E4B705B92903BA4, 0xFF577222C14F0A3A,
+        0x55B6344CF97AAFAE, 0xB862225B055B6960, 0xCAC09AFBDDD2CDB4, 0xDAF8E9829FE96B5F,
+        0xB5FDFC5D3132C498, 0x310CB380DB6F7503, 0xE87FBB46217A360E, 0x2102AE466EBB1148,
+        0xF8549E1A3AA5E00D, 0x07A69AFDCC42261A, 0xC4C118BFE78FEAAE, 0xF9F4892ED96BD438,
+        0x1AF3DBE25D8F45DA, 0xF5B4B0B0D2DEEEB4, 0x962ACEEFA82E1C84, 0x046E3ECAAF453CE9,
+        0xF05D129681949A4C, 0x964781CE734B3C84, 0x9C2ED44081CE5FBD, 0x522E23F3925E319E,
+        0x177E00F9FC32F791, 0x2BC60A63A6F3B3F2, 0x222BBFAE61725606, 0x486289DDCC3D6780,
+        0x7DC7785B8EFDFC80, 0x8AF38731C02BA980, 0x1FAB64EA29A2DDF7, 0xE4D9429322CD065A,
+        0x9DA058C67844F20C, 0x24C0E332B70019B0, 0x233003B5A6CFE6AD, 0xD586BD01C5C217F6,
+        0x5E5637885F29BC2B, 0x7EBA726D8C94094B, 0x0A56A5F0BFE39272, 0xD79476A84EE20D06,
+        0x9E4C1269BAA4BF37, 0x17EFEE45B0DEE640, 0x1D95B0A5FCF90BC6, 0x93CBE0B699C2585D,
+        0x65FA4F227A2B6D79, 0xD5F9E858292504D5, 0xC2B5A03F71471A6F, 0x59300222B4561E00,
+        0xCE2F8642CA0712DC, 0x7CA9723FBB2E8988, 0x2785338347F2BA08, 0xC61BB3A141E50E8C,
+        0x150F361DAB9DEC26, 0x9F6A419D382595F4, 0x64A53DC924FE7AC9, 0x142DE49FFF7A7C3D,
+        0x0C335248857FA9E7, 0x0A9C32D5EAE45305, 0xE6C42178C4BBB92E, 0x71F1CE2490D20B07,
+        0xF1BCC3D275AFE51A, 0xE728E8C83C334074, 0x96FBF83A12884624, 0x81A1549FD6573DA5,
+        0x5FA7867CAF35E149, 0x56986E2EF3ED091B, 0x917F1DD5F8886C61, 0xD20D8C88C8FFE65F,
+        0x31D71DCE64B2C310, 0xF165B587DF898190, 0xA57E6339DD2CF3A0, 0x1EF6E6DBB1961EC9,
+        0x70CC73D90BC26E24, 0xE21A6B35DF0C3AD7, 0x003A93D8B2806962, 0x1C99DED33CB890A1,
+        0xCF3145DE0ADD4289, 0xD0E4427A5514FB72, 0x77C621CC9FB3A483, 0x67A34DAC4356550B,
+        0xF8D626AAAF278509]
+
+# polyglot kinds are ordered black pawn, white pawn, black knight, white knight...
+PIECE_KEYS = tuple(
+    tuple(RANDOM64[64 * (2 * (p % 6) + (p < 6)) + sq] for sq in range(64)) for p in range(12))
+CASTLING_KEYS = tuple(
+    (RANDOM64[768] if c & WHITE_KINGSIDE else 0) ^ (RANDOM64[769] if c & WHITE_QUEENSIDE else 0) ^
+    (RANDOM64[770] if c & BLACK_KINGSIDE else 0) ^ (RANDOM64[771] if c & BLACK_QUEENSIDE else 0)
+    for c in range(16))
+ENPASSANT_KEYS = tuple(RANDOM64[772:780])
+TURN_KEY = RANDOM64[780]
 
 
 class BoardState:
 
-    def __init__(self, repr=list('HNBQABNH' + 'P' * 8 + '.' * 32 + 'p' * 8 + 'hnbqabnh'), enpassant_cell=None, halfmoves=0, moves=1, trait='w'):
-        self._repr = repr
-        self.enpassant_cell = enpassant_cell
+    """An immutable chess position.
+
+       The position is stored as one bitboard per kind of piece and per color (see chess3.bitboard),
+       along with a 64-cells array telling which piece stands on each cell.
+    """
+
+    __slots__ = ('_bb', '_colors', '_mailbox', 'castling', '_ep',
+                 'halfmoves', 'moves', 'trait', '_hash', '_mg', '_eg', '_phase', '_repr_cache',
+                 '_attack_maps')
+
+    def __init__(self, repr=INITIAL_REPR, enpassant_cell=None, halfmoves=0, moves=1, trait='w'):
+        bb = [0] * 12
+        colors = [0, 0]
+        mailbox = [None] * 64
+        for sq, c in enumerate(repr):
+            p = REPR_PIECES.get(c)
+            if p is not None:
+                bb[p] |= 1 << sq
+                colors[p // 6] |= 1 << sq
+                mailbox[sq] = p
+        castling = 0
+        if repr[4] == 'A':
+            if repr[7] == 'H':
+                castling |= WHITE_KINGSIDE
+            if repr[0] == 'H':
+                castling |= WHITE_QUEENSIDE
+        if repr[60] == 'a':
+            if repr[63] == 'h':
+                castling |= BLACK_KINGSIDE
+            if repr[56] == 'h':
+                castling |= BLACK_QUEENSIDE
+        self._bb = bb
+        self._colors = colors
+        self._mailbox = mailbox
+        self.castling = castling
+        self._ep = None if enpassant_cell is None else enpassant_cell[1] * 8 + enpassant_cell[0]
         self.halfmoves = halfmoves
         self.moves = moves
         self.trait = trait
+        self._hash = self._compute_zobrist_hash()
+        self._mg, self._eg, self._phase = self._compute_evaluation()
+        self._repr_cache = None
+        self._attack_maps = None
 
     @property
     def team(self):
         return TEAM_WHITES if self.trait == 'w' else TEAM_BLACKS
 
+    @property
+    def zobrist_hash(self):
+        """The polyglot key of the position. It is maintained by apply_move, so reading it costs nothing"""
+        return self._hash
+
+    def _compute_zobrist_hash(self):
+        h = 0
+        for sq, p in enumerate(self._mailbox):
+            if p is not None:
+                h ^= PIECE_KEYS[p][sq]
+        h ^= CASTLING_KEYS[self.castling]
+        h ^= self._enpassant_key()
+        if self.trait == 'w':
+            h ^= TURN_KEY
+        return h
+
+    def _compute_evaluation(self):
+        mg = eg = phase = 0
+        for sq, p in enumerate(self._mailbox):
+            if p is not None:
+                mg += MG[p][sq]
+                eg += EG[p][sq]
+                phase += PHASE[p]
+        return mg, eg, phase
+
+    def _enpassant_key(self):
+        # as in polyglot, the enpassant cell only counts when a pawn is actually able to take it
+        ep = self._ep
+        if ep is not None:
+            color = WHITE if self.trait == 'w' else BLACK
+            if PAWN_ATTACKS[color ^ 1][ep] & self._bb[6 * color + PAWN]:
+                return ENPASSANT_KEYS[ep & 7]
+        return 0
+
+    @property
+    def enpassant_cell(self):
+        return None if self._ep is None else SQUARE_COORDS[self._ep]
+
+    @property
+    def _repr(self):
+        """The legacy string representation (as a list of 64 letters)"""
+        r = self._repr_cache
+        if r is None:
+            r = ['.' if p is None else 'PNBRQZpnbrqz'[p] for p in self._mailbox]
+            castling = self.castling
+            if castling & WHITE_KINGSIDE:
+                r[4], r[7] = 'A', 'H'
+            if castling & WHITE_QUEENSIDE:
+                r[4], r[0] = 'A', 'H'
+            if castling & BLACK_KINGSIDE:
+                r[60], r[63] = 'a', 'h'
+            if castling & BLACK_QUEENSIDE:
+                r[60], r[56] = 'a', 'h'
+            self._repr_cache = r
+        return r
+
     def get_part(self, i, j):
-        return state[j * 8 + i]
+        return self.part_at(i, j)
 
     def is_occupied(self, i, j):
-        return self._repr[j * 8 + i] != '.'
+        return self._mailbox[j * 8 + i] is not None
 
     def is_same_team(self, i, j, team):
-        possibleparts = 'PRHNBQAZ' if team == TEAM_WHITES else 'prhnbqaz'
-        return self._repr[j * 8 + i] in possibleparts
+        return bool(self._colors[team == TEAM_BLACKS] >> (j * 8 + i) & 1)
 
     def get_team(self, i, j):
-        p = self._repr[j * 8 + i]
-        if p == '.':
+        p = self._mailbox[j * 8 + i]
+        if p is None:
             return 0
-        elif p in 'PRHNBQAZ':
-            return TEAM_WHITES
-        else:
-            return TEAM_BLACKS
+        return TEAM_WHITES if p < 6 else TEAM_BLACKS
 
     def is_opponent_team(self, i, j, team):
         return self.is_same_team(i, j, opponent(team))
 
+    def _is_part(self, i, j, team, kind):
+        return self._mailbox[j * 8 + i] == kind + 6 * (team == TEAM_BLACKS)
+
     def is_rook(self, i, j, team):
-        parts = 'RH' if team == TEAM_WHITES else 'rh'
-        return self._repr[j * 8 + i] in parts
+        return self._is_part(i, j, team, ROOK)
 
     def is_knight(self, i, j, team):
-        part = 'N' if team == TEAM_WHITES else 'n'
-        return self._repr[j * 8 + i] == part
+        return self._is_part(i, j, team, KNIGHT)
 
     def is_bishop(self, i, j, team):
-        part = 'B' if team == TEAM_WHITES else 'b'
-        return self._repr[j * 8 + i] == part
+        return self._is_part(i, j, team, BISHOP)
 
     def is_queen(self, i, j, team):
-        part = 'Q' if team == TEAM_WHITES else 'q'
-        return self._repr[j * 8 + i] == part
+        return self._is_part(i, j, team, QUEEN)
 
     def is_king(self, i, j, team):
-        parts = 'AZ' if team == TEAM_WHITES else 'az'
-        return self._repr[j * 8 + i] in parts
+        return self._is_part(i, j, team, KING)
 
     def is_pawn(self, i, j, team):
-        part = 'P' if team == TEAM_WHITES else 'p'
-        return self._repr[j * 8 + i] == part
+        return self._is_part(i, j, team, PAWN)
+
+    def _attackers(self, sq, color, occupied):
+        """bitboard of the parts of the given color that attack a cell"""
+        bb = self._bb
+        base = 6 * color
+        return ((KNIGHT_ATTACKS[sq] & bb[base + KNIGHT])
+                | (PAWN_ATTACKS[color ^ 1][sq] & bb[base + PAWN])
+                | (KING_ATTACKS[sq] & bb[base + KING])
+                | (BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]] & (bb[base + BISHOP] | bb[base + QUEEN]))
+                | (ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]] & (bb[base + ROOK] | bb[base + QUEEN])))
+
+    def _attacks(self, color):
+        """bitboard of the cells attacked by the parts of the given color, whether they are empty or not
+           (those of its own parts are the ones it defends). Computed once per position, when first needed"""
+        maps = self._attack_maps
+        if maps is None:
+            maps = self._attack_maps = [None, None]
+        attacks = maps[color]
+        if attacks is None:
+            bb = self._bb
+            base = 6 * color
+            occupied = self._colors[0] | self._colors[1]
+            pawns = bb[base + PAWN]
+            if color == WHITE:
+                attacks = ((pawns & ~FILE_A) << 7 | (pawns & ~FILE_H) << 9) & FULL
+            else:
+                attacks = (pawns & ~FILE_A) >> 9 | (pawns & ~FILE_H) >> 7
+            for sq in squares(bb[base + KNIGHT]):
+                attacks |= KNIGHT_ATTACKS[sq]
+            for sq in squares(bb[base + BISHOP] | bb[base + QUEEN]):
+                attacks |= BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+            for sq in squares(bb[base + ROOK] | bb[base + QUEEN]):
+                attacks |= ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
+            kings = bb[base + KING]
+            if kings:
+                attacks |= KING_ATTACKS[lsb(kings)]
+            maps[color] = attacks
+        return attacks
+
+    def _is_attacked(self, sq, color):
+        """whether the parts of the given color attack a cell : read from the attack map when it is there,
+           otherwise only the lines going through the cell are looked at"""
+        maps = self._attack_maps
+        if maps is not None and maps[color] is not None:
+            return bool(maps[color] >> sq & 1)
+        return bool(self._attackers(sq, color, self._colors[0] | self._colors[1]))
 
     def is_under_attack(self, i, j, team=None):
         if team is None:
             team = self.get_team(i, j)
-        opponent_team = team * -1
-        # attacks from knights
-        for di, dj in KNIGHT_MOVES:
-            x, y = i + di, j + dj
-            if on_board(x, y) and self.is_knight(x, y, opponent_team):
-                return ('n', (x, y))
-        # attacks from pawns
-        y = j + team
-        for x in [i - 1, i + 1]:
-            if on_board(x, y) and self.is_pawn(x, y, opponent_team):
-                return ('p', (x, y))
-        # attack from axis (rooks,queens)
-        searched = 'RHQ' if opponent_team == TEAM_WHITES else 'rhq'
-        threat = self._explore_threat(
-            i, j, ROOK_DIRECTIONS, searched, team=team)
-        if threat:
-            return threat
-        # attack from diagonals (bishops,queens)
-        searched = 'BQ' if opponent_team == TEAM_WHITES else 'bq'
-        threat = self._explore_threat(
-            i, j, BISHOP_DIRECTIONS, searched, team=team)
-        if threat:
-            return threat
-        # attack from kings
-        for di, dj in KING_MOVES:
-            x, y = i + di, j + dj
-            if on_board(x, y) and self.is_king(x, y, opponent_team):
-                return ('k', (x, y))
+        color = WHITE if team == TEAM_BLACKS else BLACK
+        if not self._attacks(color) >> (j * 8 + i) & 1:
+            return None
+        attackers = self._attackers(
+            j * 8 + i, color, self._colors[0] | self._colors[1])
+        if attackers:
+            x, y = SQUARE_COORDS[lsb(attackers)]
+            return (self.part_at(x, y), (x, y))
         return None
 
     def find_king(self, team):
-        parts = 'AZ' if team == TEAM_WHITES else 'az'
-        for p in range(64):
-            if self._repr[p] in parts:
-                return p % 8, p // 8
+        kings = self._bb[KING + 6 * (team == TEAM_BLACKS)]
+        if kings:
+            return SQUARE_COORDS[lsb(kings)]
         return None
 
     def find_move_from_san(self, san):
-        origsan = san
-        san = re.sub('\+|#|x', '', san)
-        candidates = list(self.legal_moves())
-        if san == 'O-O':
-            candidates = [m for m in candidates if m.castling and m.to[0] == 6]
-        elif san == 'O-O-O':
-            candidates = [m for m in candidates if m.castling and m.to[0] == 2]
-        elif '=' in san:
-            candidates = [m for m in candidates if to_pos(
-                *m._from)[0] == san[0] and m.promotion and m.promotion.upper() == san[-1]]
-            if 'x' in origsan:
-                tocol = origsan[origsan.index('x')+1]
-                candidates = [
-                    m for m in candidates if to_pos(*m.to)[0] == tocol]
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
-        target = san[-2:]
-        candidates = [m for m in candidates if m.dest_square() == target]
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if len(san) == 2:
-            candidates = [
-                m for m in candidates if self.piece_at(*m._from) == 'P']
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if san[0] in 'RNBQKP':
-            candidates = [
-                m for m in candidates if self.piece_at(*m._from) == san[0]]
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if san[0] in 'abcdefgh':
-            candidates = [m for m in candidates if to_pos(
-                *m._from)[0] == san[0] and self.piece_at(*m._from) == 'P']
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if san[0] in 'abcdefgh':
-            candidates = [m for m in candidates if to_pos(
-                *m._from)[0] == san[0]]
-        if not candidates:
-            return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if san[1] in 'abcdefgh':
-            candidates = [m for m in candidates if to_pos(
-                *m._from)[0] == san[1]]
-        if not candidates:
+        """Returns the legal move written in SAN (like 'Nbd7', 'exd5', 'e8=Q+' or 'O-O'), None when there is
+           no such move or when it is ambiguous. Only the parts of the named kind that reach the target cell
+           are looked at, instead of generating all the legal moves."""
+        color = WHITE if self.trait == 'w' else BLACK
+        san = san.rstrip('+#!?')
+        if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+            to = (2 if len(san) == 5 else 6) + 56 * color
+            for move in self._castling_moves(color):
+                if move.to_square == to:
+                    return move
             return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if san[0] in '12345678':
-            candidates = [m for m in candidates if to_pos(
-                *m._from)[1] == san[0]]
-        if not candidates:
+        match = SAN_PATTERN.match(san)
+        if match is None:
             return None
-        if len(candidates) == 1:
-            return candidates[0]
-        if san[1] in '12345678':
-            candidates = [m for m in candidates if to_pos(
-                *m._from)[1] == san[1]]
-        if not candidates:
+        kind, file, rank, to, promotion = match.groups()
+        kind = SAN_KINDS[kind] if kind else PAWN
+        if (promotion is not None) != (kind == PAWN and to[1] in '18'):
             return None
-        if len(candidates) == 1:
-            return candidates[0]
-        return None
-
-    def legal_moves(self):
-        team = self.team
-        for j in range(8):
-            for i in range(8):
-                if self.get_team(i, j) == team:
-                    for move in self._moves(i, j):
-                        board = self.apply_move(move)
-                        kingpos = board.find_king(team)
-                        # avoid to emit moves that would lead to the king being
-                        # under attack
-                        if kingpos and not board.is_under_attack(*kingpos):
-                            yield move
-
-    def _moves(self, i, j):
-        team = self.team
-        opponent_team = opponent(team)
-        if self.is_rook(i, j, team):
-            for m in self._explore_moves(i, j, ROOK_DIRECTIONS):
-                yield m
-        elif self.is_bishop(i, j, team):
-            for m in self._explore_moves(i, j, BISHOP_DIRECTIONS):
-                yield m
-        elif self.is_queen(i, j, team):
-            for m in self._explore_moves(i, j, QUEEN_DIRECTIONS):
-                yield m
-        elif self.is_knight(i, j, team):
-            for di, dj in KNIGHT_MOVES:
-                x, y = i + di, j + dj
-                if on_board(x, y):
-                    op = self.get_team(x, y)
-                    if op in [0, opponent_team]:
-                        yield Move((i, j), (x, y), capture=(op != 0))
-        elif self.is_pawn(i, j, team):
-            y = j + team
-            # normal move (i.e not capturing)
-            if 0 <= y < 8 and self.get_team(i, y) == 0:
-                if y in [0, 7]:  # pawn promotion
-                    possibleproms = 'NBRQ' if team == TEAM_WHITES else 'nbrq'
-                    for p in possibleproms:
-                        yield Move((i, j), (i, y), promotion=p)
-                else:  # normal case
-                    yield Move((i, j), (i, y))
-                # initial 2-cells move
-                if (j == 1 and team == TEAM_WHITES) or (j == 6 and team == TEAM_BLACKS):
-                    row = 3 if team == TEAM_WHITES else 4
-                    if self.get_team(i, row) == 0:
-                        yield Move((i, j), (i, row), enpassant=(i, y))
-            # pawn captures opponent
-            for x in [i - 1, i + 1]:
-                if on_board(x, y) and (self.get_team(x, y) == opponent_team or (x, y) == self.enpassant_cell):
-                    if y in [0, 7]:  # pawn promotion
-                        possibleproms = 'NBRQ' if team == TEAM_WHITES else 'nbrq'
-                        for p in possibleproms:
-                            yield Move((i, j), (x, y), promotion=p, capture=True)
+        found = None
+        for move in self._moves_to(color, kind, SQUARE_INDEXES[to], promotion):
+            frm = SQUARE_NAMES[move.from_square]
+            if (file and frm[0] != file) or (rank and frm[1] != rank):
+                continue
+            if found is not None:
+                return None
+            found = move
+        return found
+
+    def _moves_to(self, color, kind, to, promotion=None):
+        """Generates the legal moves of the parts of a kind that go to a cell (castling aside).
+           The candidates are the parts that attack the cell, each one is checked by looking for
+           attackers of the king once it has moved."""
+        bb = self._bb
+        them = color ^ 1
+        own = self._colors[color]
+        enemy = self._colors[them]
+        occupied = own | enemy
+        target = 1 << to
+        if own & target:
+            return
+        parts = bb[6 * color + kind]
+        captured = enemy & target
+        if kind == PAWN:
+            push = 8 if color == WHITE else -8
+            if captured or to == self._ep:
+                origins = PAWN_ATTACKS[them][to] & parts
+                if not captured:
+                    captured = 1 << (to - push)
+            elif not occupied & target:
+                origins = parts & (1 << (to - push)) if 0 <= to - push < 64 else 0
+                if not origins and (to >> 3) == (3 if color == WHITE else 4) \
+                        and not occupied >> (to - push) & 1:
+                    origins = parts & (1 << (to - 2 * push))
+            else:
+                return
+            if promotion is not None:
+                promotion = promotion.upper() if color == WHITE else promotion.lower()
+        elif kind == KNIGHT:
+            origins = KNIGHT_ATTACKS[to] & parts
+        elif kind == BISHOP:
+            origins = BISHOP_TABLE[to][occupied & BISHOP_MASKS[to]] & parts
+        elif kind == ROOK:
+            origins = ROOK_TABLE[to][occupied & ROOK_MASKS[to]] & parts
+        elif kind == QUEEN:
+            origins = (ROOK_TABLE[to][occupied & ROOK_MASKS[to]]
+                       | BISHOP_TABLE[to][occupied & BISHOP_MASKS[to]]) & parts
+        else:
+            origins = KING_ATTACKS[to] & parts
+        kings = bb[6 * color + KING]
+        for frm in squares(origins):
+            occ = (occupied ^ (1 << frm) ^ captured) | target
+            kingsq = to if kind == KING else lsb(kings) if kings else None
+            if kingsq is not None and self._attackers(kingsq, them, occ) & ~captured:
+                continue
+            enpassant = None
+            if kind == PAWN and abs(to - frm) == 16:
+                enpassant = SQUARE_COORDS[(to + frm) // 2]
+            yield Move(frm, to, promotion=promotion, enpassant=enpassant, capture=bool(captured))
+
+    def to_san(self, move):
+        """Writes a legal move of the position in SAN, with the check and checkmate marks"""
+        frm, to = move.from_square, move.to_square
+        p = self._mailbox[frm]
+        kind, color = p % 6, p // 6
+        if kind == KING and abs(to - frm) == 2:
+            san = 'O-O' if to > frm else 'O-O-O'
+        else:
+            capture = self._mailbox[to] is not None or (kind == PAWN and to == self._ep)
+            if kind == PAWN:
+                san = SQUARE_NAMES[frm][0] + 'x' if capture else ''
+            else:
+                san = 'PNBRQK'[kind]
+                others = [m.from_square for m in self._moves_to(color, kind, to) if m.from_square != frm]
+                if others:
+                    # the file if it is enough, then the rank, then both
+                    if all(o & 7 != frm & 7 for o in others):
+                        san += SQUARE_NAMES[frm][0]
+                    elif all(o >> 3 != frm >> 3 for o in others):
+                        san += SQUARE_NAMES[frm][1]
                     else:
-                        yield Move(_from=(i, j), to=(x, y), capture=True)
-        elif self.is_king(i, j, team):
-            for di, dj in KING_MOVES:
-                x, y = i + di, j + dj
-                if on_board(x, y):
-                    op = self.get_team(x, y)
-                    if op != team:
-                        yield Move((i, j), (x, y), capture=(op != 0))
-        # castling
-        if (i, j) in [(4, 0), (4, 7)]:
-            row = 0 if team == TEAM_WHITES else 7
-            # left side
-            if self._is_castling_possible(team, (4, row), (0, row), [(2, row), (3, row)]):
-                yield Move(_from=(4, row), to=(2, row), castling=True)
-            # right side
-            if self._is_castling_possible(team, (4, row), (7, row), [(5, row), (6, row)]):
-                yield Move(_from=(4, row), to=(6, row), castling=True)
-
-    def _is_castling_possible(self, team, king_pos, rook_pos, empty_pos):
-        state = ''.join([self.part_at(i, king_pos[1]) for i in range(8)])
-        if rook_pos[0] == 0:  # O-O-O
-            expected = 'H...A'
-            state = state[:5]
-        else:  # O-O
-            expected = 'A..H'
-            state = state[4:]
-        if team == TEAM_BLACKS:
-            expected = expected.lower()
-        if state != expected:
-            return False
-        for pos in [king_pos] + empty_pos:
-            if self.is_under_attack(*pos, team=team):
-                return False
-        return True
-
-    def _explore_threat(self, i, j, directions, searched, team):
-        """ for a set of directions provided for a 'slider' part, returns the tuple (part, position) if a part of that kind is attacking the current position"""
-        for di, dj in directions:
-            x, y, go = i + di, j + dj, True
-            while go:
-                go = False
-                if on_board(x, y):
-                    if self.get_team(x, y) == 0:
-                        go = True
-                    elif self._repr[y * 8 + x] in searched:
-                        return (self._repr[y * 8 + x], (x, y))
-                    x += di
-                    y += dj
-        return None
-
-    def _explore_moves(self, i, j, directions):
-        team = self.team
-        for di, dj in directions:
-            x, y, go = i + di, j + dj, True
-            while go:
-                go = False
-                if on_board(x, y):
-                    cellteam = self.get_team(x, y)
-                    if cellteam != team:
-                        yield Move((i, j), (x, y), capture=(cellteam != 0))
-                    if cellteam == 0:
-                        go = True
-                    x += di
-                    y += dj
+                        san += SQUARE_NAMES[frm]
+                if capture:
+                    san += 'x'
+            san += SQUARE_NAMES[to]
+            if move.promotion:
+                san += '=' + move.promotion.upper()
+        check = self.apply_move(move).is_check()
+        if check == CHECKMATE:
+            san += '#'
+        elif check == CHECK:
+            san += '+'
+        return san
+
+    def legal_moves(self, quiet=True):
+        """Generates the legal moves. With quiet=False, only the captures and the promotions"""
+        color = WHITE if self.trait == 'w' else BLACK
+        them = color ^ 1
+        bb = self._bb
+        base, ebase = 6 * color, 6 * them
+        own = self._colors[color]
+        enemy = self._colors[them]
+        occupied = own | enemy
+        coords = SQUARE_COORDS
+        kings = bb[base + KING]
+        if not kings:
+            return
+        kingsq = lsb(kings)
+        checkers = self._attackers(kingsq, them, occupied)
+
+        # the king must not go to an attacked cell, the slow path here is to look for attackers
+        # once the king has left its cell (so that it does not hide the cells behind him)
+        notown = ~own
+        kingless = occupied ^ kings
+        for to in squares(KING_ATTACKS[kingsq] & (notown if quiet else enemy)):
+            if not self._attackers(to, them, kingless):
+                yield Move(kingsq, to, capture=bool(enemy >> to & 1))
+        if checkers & (checkers - 1):
+            # double check : only the king may move
+            return
+
+        if checkers:
+            # capture the checking part, or block it
+            target = (BETWEEN[kingsq][lsb(checkers)] | checkers) & notown
+        else:
+            target = notown
+            if quiet:
+                for move in self._castling_moves(color):
+                    yield move
+
+        # parts that are pinned on the king may only move along the line of the pin
+        pinned = 0
+        snipers = (ROOK_TABLE[kingsq][enemy & ROOK_MASKS[kingsq]] & (bb[ebase + ROOK] | bb[ebase + QUEEN])) \
+            | (BISHOP_TABLE[kingsq][enemy & BISHOP_MASKS[kingsq]] & (bb[ebase + BISHOP] | bb[ebase + QUEEN]))
+        for sq in squares(snipers):
+            blockers = BETWEEN[kingsq][sq] & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pinned |= blockers
+
+        # pawns
+        if color == WHITE:
+            push, start, last, proms = 8, RANK_2, RANK_8, 'NBRQ'
+        else:
+            push, start, last, proms = -8, RANK_7, RANK_1, 'nbrq'
+        ep = self._ep
+        for frm in squares(bb[base + PAWN]):
+            allowed = target
+            if pinned >> frm & 1:
+                allowed &= LINE[kingsq][frm]
+            to = frm + push
+            if not occupied >> to & 1:
+                if allowed >> to & 1:
+                    if (1 << to) & last:  # pawn promotion
+                        for p in proms:
+                            yield Move(frm, to, promotion=p)
+                    elif quiet:
+                        yield Move(frm, to)
+                # initial 2-cells move
+                if quiet and (1 << frm) & start and not occupied >> (to + push) & 1 and allowed >> (to + push) & 1:
+                    yield Move(frm, to + push, enpassant=coords[to])
+            attacks = PAWN_ATTACKS[color][frm]
+            for to in squares(attacks & enemy & allowed):
+                if (1 << to) & last:
+                    for p in proms:
+                        yield Move(frm, to, promotion=p, capture=True)
+                else:
+                    yield Move(frm, to, capture=True)
+            if ep is not None and attacks >> ep & 1:
+                # enpassant is the other slow path : the two pawns leave the same row at once,
+                # so the position is checked after the capture
+                taken = ep - push
+                occ = occupied ^ (1 << frm) ^ (1 << taken) ^ (1 << ep)
+                if not self._attackers(kingsq, them, occ) & ~(1 << taken):
+                    yield Move(frm, ep, capture=True)
+
+        # knights (a pinned knight can never move) and sliders
+        if not quiet:
+            target &= enemy
+        for frm in squares(bb[base + KNIGHT] & ~pinned):
+            for to in squares(KNIGHT_ATTACKS[frm] & target):
+                yield Move(frm, to, capture=bool(enemy >> to & 1))
+        for kind in (BISHOP, ROOK, QUEEN):
+            for frm in squares(bb[base + kind]):
+                if kind == BISHOP:
+                    attacks = BISHOP_TABLE[frm][occupied & BISHOP_MASKS[frm]]
+                elif kind == ROOK:
+                    attacks = ROOK_TABLE[frm][occupied & ROOK_MASKS[frm]]
+                else:
+                    attacks = (ROOK_TABLE[frm][occupied & ROOK_MASKS[frm]]
+                               | BISHOP_TABLE[frm][occupied & BISHOP_MASKS[frm]])
+                attacks &= target
+                if pinned >> frm & 1:
+                    attacks &= LINE[kingsq][frm]
+                for to in squares(attacks):
+                    yield Move(frm, to, capture=bool(enemy >> to & 1))
+
+    def _castling_moves(self, color):
+        castling = self.castling
+        if color == WHITE:
+            kingside, queenside, row = castling & WHITE_KINGSIDE, castling & WHITE_QUEENSIDE, 0
+        else:
+            kingside, queenside, row = castling & BLACK_KINGSIDE, castling & BLACK_QUEENSIDE, 56
+        if not (kingside or queenside):
+            return
+        occupied = self._colors[0] | self._colors[1]
+        them = color ^ 1
+        is_attacked = self._is_attacked
+        king = row + 4
+        if is_attacked(king, them):
+            return
+        # left side
+        if queenside and not occupied & (0b1110 << row) \
+                and not is_attacked(row + 3, them) and not is_attacked(row + 2, them):
+            yield Move(king, row + 2, castling=True)
+        # right side
+        if kingside and not occupied & (0b1100000 << row) \
+                and not is_attacked(row + 5, them) and not is_attacked(row + 6, them):
+            yield Move(king, row + 6, castling=True)
 
     def part_at(self, i, j):
         """Returns the content of the board at this position"""
         return self._repr[j * 8 + i]
 
     def piece_at(self, i, j):
-        return self.part_at(i, j).upper().replace('H', 'R').replace('A', 'K').replace('Z', 'K')
+        p = self._mailbox[j * 8 + i]
+        return '.' if p is None else 'PNBRQKPNBRQK'[p]
 
     def is_check(self):
         """Returns 0 if not check, 1 if check, 2 if checkmate"""
-        team = self.team
-        i, j = self.find_king(team)
-        if self.is_under_attack(i, j, team):
-            return CHECKMATE if len(list(self.legal_moves())) == 0 else CHECK
+        if self.in_check():
+            for _ in self.legal_moves():
+                return CHECK
+            return CHECKMATE
         return 0
 
+    def in_check(self):
+        """Whether the king of the side to play is attacked (cheaper than is_check)"""
+        color = WHITE if self.trait == 'w' else BLACK
+        kings = self._bb[KING + 6 * color]
+        return bool(kings) and self._is_attacked(lsb(kings), color ^ 1)
+
     def apply_move(self, move, check_legal=False):
         """Modifies the board by applying the move. As BoarState instances are immutable, returns a new instance of BoardState"""
-        team = self.team
-        newtrait = 'w' if self.trait == 'b' else 'b'
-        newmoves = self.moves + int(self.trait == 'b')
-        part = self.part_at(*move._from)
-        if check_legal:
-            checked = False
-            for lm in self.legal_moves():
-                if lm._from == move._from and lm.to == move.to:
-                    checked = True
-                    break
-            if not checked:
-                raise Exception('Illegal move')
-        r = self._repr[::]
-        i, j = move._from
-
-        # castling
-        row = 0 if team == TEAM_WHITES else 7
-        if part in 'Aa' and move._from == (4, row):
-            # O-O-O
-            if move.to == (2, row) and self._is_castling_possible(team, (4, row), (0, row), [(2, row), (3, row)]):
-                r[row * 8] = '.'
-                r[row * 8 + 3] = 'R' if team == TEAM_WHITES else 'r'
-            # O-O
-            elif move.to == (6, row) and self._is_castling_possible(team, (4, row), (7, row), [(5, row), (6, row)]):
-                r[row * 8 + 7] = '.'
-                r[row * 8 + 5] = 'R' if team == TEAM_WHITES else 'r'
-        r[j * 8 + i] = '.'  # remove part from original position
-
-        # change rook symbol after first move (prevent castling afterwards)
-        if part in 'Hh':
-            part = {'H': 'R', 'h': 'r'}[part]
-        # change king symbol after first move (prevent castling afterwards)
-        elif part in 'Aa':
-            part = {'A': 'Z', 'a': 'z'}[part]
-        x, y = move.to
+        # equal moves have the same origin, target and promotion
+        if check_legal and move not in self.legal_moves():
+            raise Exception('Illegal move')
+        board = BoardState.__new__(BoardState)
+        board._bb = self._bb[:]
+        board._colors = self._colors[:]
+        board._mailbox = self._mailbox[:]
+        board.castling = self.castling
+        board._ep = self._ep
+        board.halfmoves = self.halfmoves
+        board.moves = self.moves
+        board.trait = self.trait
+        board._hash = self._hash
+        board._mg, board._eg, board._phase = self._mg, self._eg, self._phase
+        board._play(move)
+        return board
+
+    def _play(self, move):
+        """Applies the move in place"""
+        frm, to = move.from_square, move.to_square
+        bb = self._bb
+        colors = self._colors
+        mailbox = self._mailbox
+        piece = mailbox[frm]
+        color = piece // 6
+        kind = piece - 6 * color
+        halfmoves = self.halfmoves + 1
+        ep = None
+        castling = self.castling & CASTLING_MASKS[frm] & CASTLING_MASKS[to]
+        h = self._hash ^ TURN_KEY
+        mg = self._mg + MG[piece][to] - MG[piece][frm]
+        eg = self._eg + EG[piece][to] - EG[piece][frm]
+        phase = self._phase
+        if castling != self.castling:
+            h ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+        if self._ep is not None:
+            h ^= self._enpassant_key()
+
+        captured = mailbox[to]
+        if captured is not None:
+            bb[captured] ^= 1 << to
+            colors[color ^ 1] ^= 1 << to
+            h ^= PIECE_KEYS[captured][to]
+            mg -= MG[captured][to]
+            eg -= EG[captured][to]
+            phase -= PHASE[captured]
+            halfmoves = 0
         # move to target position
-        r[y * 8 + x] = part if not(move.promotion) else move.promotion
-        # enpassant rules
-        if part in 'Pp':
-            # when a pawn make a 2-cells move, remember that the cell behind it
-            # is weak for 1 turn
-            if abs(j - y) == 2:
-                enpassant_row = 2 if team == TEAM_WHITES else 5
-                enpassant_cell = (i, enpassant_row)
-                return BoardState(repr=r, enpassant_cell=enpassant_cell, halfmoves=0, moves=newmoves, trait=newtrait)
-            # a pawn has the right to take the enpassant cell
-            if self.enpassant_cell == (x, y):
-                pawnrow = 3 if team == TEAM_BLACKS else 4
-                r[pawnrow * 8 + x] = '.'
-        newhalfmoves = 0 if part in 'pP' or move.capture else self.halfmoves+1
-        return BoardState(repr=r, halfmoves=newhalfmoves, moves=newmoves, trait=newtrait)
+        bb[piece] ^= (1 << frm) | (1 << to)
+        colors[color] ^= (1 << frm) | (1 << to)
+        mailbox[frm] = None
+        mailbox[to] = piece
+        h ^= PIECE_KEYS[piece][frm] ^ PIECE_KEYS[piece][to]
+
+        if kind == PAWN:
+            halfmoves = 0
+            if to - frm in (16, -16):
+                # when a pawn make a 2-cells move, remember that the cell behind it
+                # is weak for 1 turn
+                ep = (frm + to) // 2
+                if PAWN_ATTACKS[color][ep] & bb[6 * (color ^ 1) + PAWN]:
+                    h ^= ENPASSANT_KEYS[ep & 7]
+            elif to == self._ep:
+                # a pawn has the right to take the enpassant cell
+                sq = to - 8 if color == WHITE else to + 8
+                h ^= PIECE_KEYS[mailbox[sq]][sq]
+                mg -= MG[mailbox[sq]][sq]
+                eg -= EG[mailbox[sq]][sq]
+                bb[mailbox[sq]] ^= 1 << sq
+                colors[color ^ 1] ^= 1 << sq
+                mailbox[sq] = None
+            elif move.promotion:
+                promoted = PROMOTIONS[move.promotion.lower()] + 6 * color
+                bb[piece] ^= 1 << to
+                bb[promoted] ^= 1 << to
+                mailbox[to] = promoted
+                h ^= PIECE_KEYS[piece][to] ^ PIECE_KEYS[promoted][to]
+                mg += MG[promoted][to] - MG[piece][to]
+                eg += EG[promoted][to] - EG[piece][to]
+                phase += PHASE[promoted]
+        elif kind == KING and to - frm in (2, -2):
+            # castling : the rook jumps over the king
+            rookfrom, rookto = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+            rook = mailbox[rookfrom]
+            bb[rook] ^= (1 << rookfrom) | (1 << rookto)
+            colors[color] ^= (1 << rookfrom) | (1 << rookto)
+            mailbox[rookfrom] = None
+            mailbox[rookto] = rook
+            h ^= PIECE_KEYS[rook][rookfrom] ^ PIECE_KEYS[rook][rookto]
+            mg += MG[rook][rookto] - MG[rook][rookfrom]
+            eg += EG[rook][rookto] - EG[rook][rookfrom]
+
+        self.castling = castling
+        self._ep = ep
+        self.halfmoves = halfmoves
+        if self.trait == 'b':
+            self.moves += 1
+            self.trait = 'w'
+        else:
+            self.trait = 'b'
+        self._hash = h
+        self._mg, self._eg, self._phase = mg, eg, phase
+        self._repr_cache = None
+        self._attack_maps = None
+
+    def evaluate(self):
+        """Evaluates the position for the side to play, in centipawns : material and placement of the
+           parts (see chess3.evaluation). The totals are updated by each move, so this costs nothing."""
+        phase = min(self._phase, PHASE_TOTAL)
+        score = self._mg * phase + self._eg * (PHASE_TOTAL - phase)
+        # rounded towards zero, so that a position and its mirror image get the same score
+        score = score // PHASE_TOTAL if score >= 0 else -(-score // PHASE_TOTAL)
+        return score if self.trait == 'w' else -score
 
     def score(self, team):
         """Evaluates the material on the board. the scores for each part are just the ones from Claude Shannon's paper"""
-        s, names = ('PBNHRQpbnhrqAZaz.' if team == TEAM_WHITES else 'pbnhrqPBNHRQAZaz.'), [
-            1, 3, 3, 5, 5, 9, -1, -3, -3, -5, -5, -9, 0, 0, 0, 0, 0]
-        values = dict(list(zip(s, names)))
-        score = sum([values[x] for x in self._repr])
-        return score
+        bb = self._bb
+        score = 0
+        for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN):
+            score += MATERIAL[kind] * (popcount(bb[kind]) - popcount(bb[kind + 6]))
+        return score if team == TEAM_WHITES else -score
 
     def count_controlled_cells(self, team):
-        count = 0
-        opp = opponent(team)
-        for i in range(8):
-            for j in range(8):
-                if not self.is_same_team(i, j, team):
-                    if self.is_under_attack(i, j, opp):
-                        count += 1
-        return count
+        """Number of cells, empty or held by the opponent, that the parts of the team attack"""
+        color = BLACK if team == TEAM_BLACKS else WHITE
+        return popcount(self._attacks(color) & ~self._colors[color])
 
     def cells_under_attack(self, team):
-        for i in range(8):
-            for j in range(8):
-                if self.is_same_team(i, j, team) and self.is_under_attack(i, j, team):
-                    yield i, j
-
-    @property
-    def zobrist_hash(self):
-        random64 = [
-            0x9D39247E33776D41, 0x2AF7398005AAA5C7, 0x44DB015024623547, 0x9C15F73E62A76AE2,
-            0x75834465489C0C89, 0x3290AC3A203001BF, 0x0FBBAD1F61042279, 0xE83A908FF2FB60CA,
-            0x0D7E765D58755C10, 0x1A083822CEAFE02D, 0x9605D5F0E25EC3B0, 0xD021FF5CD13A2ED5,
-            0x40BDF15D4A672E32, 0x011355146FD56395, 0x5DB4832046F3D9E5, 0x239F8B2D7FF719CC,
-            0x05D1A1AE85B49AA1, 0x679F848F6E8FC971, 0x7449BBFF801FED0B, 0x7D11CDB1C3B7ADF0,
-            0x82C7709E781EB7CC, 0xF3218F1C9510786C, 0x331478F3AF51BBE6, 0x4BB38DE5E7219443,
-            0xAA649C6EBCFD50FC, 0x8DBD98A352AFD40B, 0x87D2074B81D79217, 0x19F3C751D3E92AE1,
-            0xB4AB30F062B19ABF, 0x7B0500AC42047AC4, 0xC9452CA81A09D85D, 0x24AA6C514DA27500,
-            0x4C9F34427501B447, 0x14A68FD73C910841, 0xA71B9B83461CBD93, 0x03488B95B0F1850F,
-            0x637B2B34FF93C040, 0x09D1BC9A3DD90A94, 0x3575668334A1DD3B, 0x735E2B97A4C45A23,
-            0x18727070F1BD400B, 0x1FCBACD259BF02E7, 0xD310A7C2CE9B6555, 0xBF983FE0FE5D8244,
-            0x9F74D14F7454A824, 0x51EBDC4AB9BA3035, 0x5C82C505DB9AB0FA, 0xFCF7FE8A3430B241,
-            0x3253A729B9BA3DDE, 0x8C74C368081B3075, 0xB9BC6C87167C33E7, 0x7EF48F2B83024E20,
-            0x11D505D4C351BD7F, 0x6568FCA92C76A243, 0x4DE0B0F40F32A7B8, 0x96D693460CC37E5D,
-            0x42E240CB63689F2F, 0x6D2BDCDAE2919661, 0x42880B0236E4D951, 0x5F0F4A5898171BB6,
-            0x39F890F579F92F88, 0x93C5B5F47356388B, 0x63DC359D8D231B78, 0xEC16CA8AEA98AD76,
-            0x5355F900C2A82DC7, 0x07FB9F855A997142, 0x5093417AA8A7ED5E, 0x7BCBC38DA25A7F3C,
-            0x19FC8A768CF4B6D4, 0x637A7780DECFC0D9, 0x8249A47AEE0E41F7, 0x79AD695501E7D1E8,
-            0x14ACBAF4777D5776, 0xF145B6BECCDEA195, 0xDABF2AC8201752FC, 0x24C3C94DF9C8D3F6,
-            0xBB6E2924F03912EA, 0x0CE26C0B95C980D9, 0xA49CD132BFBF7CC4, 0xE99D662AF4243939,
-            0x27E6AD7891165C3F, 0x8535F040B9744FF1, 0x54B3F4FA5F40D873, 0x72B12C32127FED2B,
-            0xEE954D3C7B411F47, 0x9A85AC909A24EAA1, 0x70AC4CD9F04F21F5, 0xF9B89D3E99A075C2,
-            0x87B3E2B2B5C907B1, 0xA366E5B8C54F48B8, 0xAE4A9346CC3F7CF2, 0x1920C04D47267BBD,
-            0x87BF02C6B49E2AE9, 0x092237AC237F3859, 0xFF07F64EF8ED14D0, 0x8DE8DCA9F03CC54E,
-            0x9C1633264DB49C89, 0xB3F22C3D0B0B38ED, 0x390E5FB44D01144B, 0x5BFEA5B4712768E9,
-            0x1E1032911FA78984, 0x9A74ACB964E78CB3, 0x4F80F7A035DAFB04, 0x6304D09A0B3738C4,
-            0x2171E64683023A08, 0x5B9B63EB9CEFF80C, 0x506AACF489889342, 0x1881AFC9A3A701D6,
-            0x6503080440750644, 0xDFD395339CDBF4A7, 0xEF927DBCF00C20F2, 0x7B32F7D1E03680EC,
-            0xB9FD7620E7316243, 0x05A7E8A57DB91B77, 0xB5889C6E15630A75, 0x4A750A09CE9573F7,
-            0xCF464CEC899A2F8A, 0xF538639CE705B824, 0x3C79A0FF5580EF7F, 0xEDE6C87F8477609D,
-            0x799E81F05BC93F31, 0x86536B8CF3428A8C, 0x97D7374C60087B73, 0xA246637CFF328532,
-            0x043FCAE60CC0EBA0, 0x920E449535DD359E, 0x70EB093B15B290CC, 0x73A1921916591CBD,
-            0x56436C9FE1A1AA8D, 0xEFAC4B70633B8F81, 0xBB215798D45DF7AF, 0x45F20042F24F1768,
-            0x930F80F4E8EB7462, 0xFF6712FFCFD75EA1, 0xAE623FD67468AA70, 0xDD2C5BC84BC8D8FC,
-            0x7EED120D54CF2DD9, 0x22FE545401165F1C, 0xC91800E98FB99929, 0x808BD68E6AC10365,
-            0xDEC468145B7605F6, 0x1BEDE3A3AEF53302, 0x43539603D6C55602, 0xAA969B5C691CCB7A,
-            0xA87832D392EFEE56, 0x65942C7B3C7E11AE, 0xDED2D633CAD004F6, 0x21F08570F420E565,
-            0xB415938D7DA94E3C, 0x91B859E59ECB6350, 0x10CFF333E0ED804A, 0x28AED140BE0BB7DD,
-            0xC5CC1D89724FA456, 0x5648F680F11A2741, 0x2D255069F0B7DAB3, 0x9BC5A38EF729ABD4,
-            0xEF2F054308F6A2BC, 0xAF2042F5CC5C2858, 0x480412BAB7F5BE2A, 0xAEF3AF4A563DFE43,
-            0x19AFE59AE451497F, 0x52593803DFF1E840, 0xF4F076E65F2CE6F0, 0x11379625747D5AF3,
-            0xBCE5D2248682C115, 0x9DA4243DE836994F, 0x066F70B33FE09017, 0x4DC4DE189B671A1C,
-            0x51039AB7712457C3, 0xC07A3F80C31FB4B4, 0xB46EE9C5E64A6E7C, 0xB3819A42ABE61C87,
-            0x21A007933A522A20, 0x2DF16F761598AA4F, 0x763C4A1371B368FD, 0xF793C46702E086A0,
-            0xD7288E012AEB8D31, 0xDE336A2A4BC1C44B, 0x0BF692B38D079F23, 0x2C604A7A177326B3,
-            0x4850E73E03EB6064, 0xCFC447F1E53C8E1B, 0xB05CA3F564268D99, 0x9AE182C8BC9474E8,
-            0xA4FC4BD4FC5558CA, 0xE755178D58FC4E76, 0x69B97DB1A4C03DFE, 0xF9B5B7C4ACC67C96,
-            0xFC6A82D64B8655FB, 0x9C684CB6C4D24417, 0x8EC97D2917456ED0, 0x6703DF9D2924E97E,
-            0xC547F57E42A7444E, 0x78E37644E7CAD29E, 0xFE9A44E9362F05FA, 0x08BD35CC38336615,
-            0x9315E5EB3A129ACE, 0x94061B871E04DF75, 0xDF1D9F9D784BA010, 0x3BBA57B68871B59D,
-            0xD2B7ADEEDED1F73F, 0xF7A255D83BC373F8, 0xD7F4F2448C0CEB81, 0xD95BE88CD210FFA7,
-            0x336F52F8FF4728E7, 0xA74049DAC312AC71, 0xA2F61BB6E437FDB5, 0x4F2A5CB07F6A35B3,
-            0x87D380BDA5BF7859, 0x16B9F7E06C453A21, 0x7BA2484C8A0FD54E, 0xF3A678CAD9A2E38C,
-            0x39B0BF7DDE437BA2, 0xFCAF55C1BF8A4424, 0x18FCF680573FA594, 0x4C0563B89F495AC3,
-            0x40E087931A00930D, 0x8CFFA9412EB642C1, 0x68CA39053261169F, 0x7A1EE967D27579E2,
-            0x9D1D60E5076F5B6F, 0x3810E399B6F65BA2, 0x32095B6D4AB5F9B1, 0x35CAB62109DD038A,
-            0xA90B24499FCFAFB1, 0x77A225A07CC2C6BD, 0x513E5E634C70E331, 0x4361C0CA3F692F12,
-            0xD941ACA44B20A45B, 0x528F7C8602C5807B, 0x52AB92BEB9613989, 0x9D1DFA2EFC557F73,
-            0x722FF175F572C348, 0x1D1260A51107FE97, 0x7A249A57EC0C9BA2, 0x04208FE9E8F7F2D6,
-            0x5A110C6058B920A0, 0x0CD9A497658A5698, 0x56FD23C8F9715A4C, 0x284C847B9D887AAE,
-            0x04FEABFBBDB619CB, 0x742E1E651C60BA83, 0x9A9632E65904AD3C, 0x881B82A13B51B9E2,
-            0x506E6744CD974924, 0xB0183DB56FFC6A79, 0x0ED9B915C66ED37E, 0x5E11E86D5873D484,
-            0xF678647E3519AC6E, 0x1B85D488D0F20CC5, 0xDAB9FE6525D89021, 0x0D151D86ADB73615,
-            0xA865A54EDCC0F019, 0x93C42566AEF98FFB, 0x99E7AFEABE000731, 0x48CBFF086DDF285A,
-            0x7F9B6AF1EBF78BAF, 0x58627E1A149BBA21, 0x2CD16E2ABD791E33, 0xD363EFF5F0977996,
-            0x0CE2A38C344A6EED, 0x1A804AADB9CFA741, 0x907F30421D78C5DE, 0x501F65EDB3034D07,
-            0x37624AE5A48FA6E9, 0x957BAF61700CFF4E, 0x3A6C27934E31188A, 0xD49503536ABCA345,
-            0x088E049589C432E0, 0xF943AEE7FEBF21B8, 0x6C3B8E3E336139D3, 0x364F6FFA464EE52E,
-            0xD60F6DCEDC314222, 0x56963B0DCA418FC0, 0x16F50EDF91E513AF, 0xEF1955914B609F93,
-            0x565601C0364E3228, 0xECB53939887E8175, 0xBAC7A9A18531294B, 0xB344C470397BBA52,
-            0x65D34954DAF3CEBD, 0xB4B81B3FA97511E2, 0xB422061193D6F6A7, 0x071582401C38434D,
-            0x7A13F18BBEDC4FF5, 0xBC4097B116C524D2, 0x59B97885E2F2EA28, 0x99170A5DC3115544,
-            0x6F423357E7C6A9F9, 0x325928EE6E6F8794, 0xD0E4366228B03343, 0x565C31F7DE89EA27,
-            0x30F5611484119414, 0xD873DB391292ED4F, 0x7BD94E1D8E17DEBC, 0xC7D9F16864A76E94,
-            0x947AE053EE56E63C, 0xC8C93882F9475F5F, 0x3A9BF55BA91F81CA, 0xD9A11FBB3D9808E4,
-            0x0FD22063EDC29FCA, 0xB3F256D8ACA0B0B9, 0xB03031A8B4516E84, 0x35DD37D5871448AF,
-            0xE9F6082B05542E4E, 0xEBFAFA33D7254B59, 0x9255ABB50D532280, 0xB9AB4CE57F2D34F3,
-            0x693501D628297551, 0xC62C58F97DD949BF, 0xCD454F8F19C5126A, 0xBBE83F4ECC2BDECB,
-            0xDC842B7E2819E230, 0xBA89142E007503B8, 0xA3BC941D0A5061CB, 0xE9F6760E32CD8021,
-            0x09C7E552BC76492F, 0x852F54934DA55CC9, 0x8107FCCF064FCF56, 0x098954D51FFF6580,
-            0x23B70EDB1955C4BF, 0xC330DE426430F69D, 0x4715ED43E8A45C0A, 0xA8D7E4DAB780A08D,
-            0x0572B974F03CE0BB, 0xB57D2E985E1419C7, 0xE8D9ECBE2CF3D73F, 0x2FE4B17170E59750,
-            0x11317BA87905E790, 0x7FBF21EC8A1F45EC, 0x1725CABFCB045B00, 0x964E915CD5E2B207,
-            0x3E2B8BCBF016D66D, 0xBE7444E39328A0AC, 0xF85B2B4FBCDE44B7, 0x49353FEA39BA63B1,
-            0x1DD01AAFCD53486A, 0x1FCA8A92FD719F85, 0xFC7C95D827357AFA, 0x18A6A990C8B35EBD,
-            0xCCCB7005C6B9C28D, 0x3BDBB92C43B17F26, 0xAA70B5B4F89695A2, 0xE94C39A54A98307F,
-            0xB7A0B174CFF6F36E, 0xD4DBA84729AF48AD, 0x2E18BC1AD9704A68, 0x2DE0966DAF2F8B1C,
-            0xB9C11D5B1E43A07E, 0x64972D68DEE33360, 0x94628D38D0C20584, 0xDBC0D2B6AB90A559,
-            0xD2733C4335C6A72F, 0x7E75D99D94A70F4D, 0x6CED1983376FA72B, 0x97FCAACBF030BC24,
-            0x7B77497B32503B12, 0x8547EDDFB81CCB94, 0x79999CDFF70902CB, 0xCFFE1939438E9B24,
-            0x829626E3892D95D7, 0x92FAE24291F2B3F1, 0x63E22C147B9C3403, 0xC678B6D860284A1C,
-            0x5873888850659AE7, 0x0981DCD296A8736D, 0x9F65789A6509A440, 0x9FF38FED72E9052F,
-            0xE479EE5B9930578C, 0xE7F28ECD2D49EECD, 0x56C074A581EA17FE, 0x5544F7D774B14AEF,
-            0x7B3F0195FC6F290F, 0x12153635B2C0CF57, 0x7F5126DBBA5E0CA7, 0x7A76956C3EAFB413,
-            0x3D5774A11D31AB39, 0x8A1B083821F40CB4, 0x7B4A38E32537DF62, 0x950113646D1D6E03,
-            0x4DA8979A0041E8A9, 0x3BC36E078F7515D7, 0x5D0A12F27AD310D1, 0x7F9D1A2E1EBE1327,
-            0xDA3A361B1C5157B1, 0xDCDD7D20903D0C25, 0x36833336D068F707, 0xCE68341F79893389,
-            0xAB9090168DD05F34, 0x43954B3252DC25E5, 0xB438C2B67F98E5E9, 0x10DCD78E3851A492,
-            0xDBC27AB5447822BF, 0x9B3CDB65F82CA382, 0xB67B7896167B4C84, 0xBFCED1B0048EAC50,
-            0xA9119B60369FFEBD, 0x1FFF7AC80904BF45, 0xAC12FB171817EEE7, 0xAF08DA9177DDA93D,
-            0x1B0CAB936E65C744, 0xB559EB1D04E5E932, 0xC37B45B3F8D6F2BA, 0xC3A9DC228CAAC9E9,
-            0xF3B8B6675A6507FF, 0x9FC477DE4ED681DA, 0x67378D8ECCEF96CB, 0x6DD856D94D259236,
-            0xA319CE15B0B4DB31, 0x073973751F12DD5E, 0x8A8E849EB32781A5, 0xE1925C71285279F5,
-            0x74C04BF1790C0EFE, 0x4DDA48153C94938A, 0x9D266D6A1CC0542C, 0x7440FB816508C4FE,
-            0x13328503DF48229F, 0xD6BF7BAEE43CAC40, 0x4838D65F6EF6748F, 0x1E152328F3318DEA,
-            0x8F8419A348F296BF, 0x72C8834A5957B511, 0xD7A023A73260B45C, 0x94EBC8ABCFB56DAE,
-            0x9FC10D0F989993E0, 0xDE68A2355B93CAE6, 0xA44CFE79AE538BBE, 0x9D1D84FCCE371425,
-            0x51D2B1AB2DDFB636, 0x2FD7E4B9E72CD38C, 0x65CA5B96B7552210, 0xDD69A0D8AB3B546D,
-            0x604D51B25FBF70E2, 0x73AA8A564FB7AC9E, 0x1A8C1E992B941148, 0xAAC40A2703D9BEA0,
-            0x764DBEAE7FA4F3A6, 0x1E99B96E70A9BE8B, 0x2C5E9DEB57EF4743, 0x3A938FEE32D29981,
-            0x26E6DB8FFDF5ADFE, 0x469356C504EC9F9D, 0xC8763C5B08D1908C, 0x3F6C6AF859D80055,
-            0x7F7CC39420A3A545, 0x9BFB227EBDF4C5CE, 0x89039D79D6FC5C5C, 0x8FE88B57305E2AB6,
-            0xA09E8C8C35AB96DE, 0xFA7E393983325753, 0xD6B6D0ECC617C699, 0xDFEA21EA9E7557E3,
-            0xB67C1FA481680AF8, 0xCA1E3785A9E724E5, 0x1CFC8BED0D681639, 0xD18D8549D140CAEA,
-            0x4ED0FE7E9DC91335, 0xE4DBF0634473F5D2, 0x1761F93A44D5AEFE, 0x53898E4C3910DA55,
-            0x734DE8181F6EC39A, 0x2680B122BAA28D97, 0x298AF231C85BAFAB, 0x7983EED3740847D5,
-            0x66C1A2A1A60CD889, 0x9E17E49642A3E4C1, 0xEDB454E7BADC0805, 0x50B704CAB602C329,
-            0x4CC317FB9CDDD023, 0x66B4835D9EAFEA22, 0x219B97E26FFC81BD, 0x261E4E4C0A333A9D,
-            0x1FE2CCA76517DB90, 0xD7504DFA8816EDBB, 0xB9571FA04DC089C8, 0x1DDC0325259B27DE,
-            0xCF3F4688801EB9AA, 0xF4F5D05C10CAB243, 0x38B6525C21A42B0E, 0x36F60E2BA4FA6800,
-            0xEB3593803173E0CE, 0x9C4CD6257C5A3603, 0xAF0C317D32ADAA8A, 0x258E5A80C7204C4B,
-            0x8B889D624D44885D, 0xF4D14597E660F855, 0xD4347F66EC8941C3, 0xE699ED85B0DFB40D,
-            0x2472F6207C2D0484, 0xC2A1E7B5B459AEB5, 0xAB4F6451CC1D45EC, 0x63767572AE3D6174,
-            0xA59E0BD101731A28, 0x116D0016CB948F09, 0x2CF9C8CA052F6E9F, 0x0B090A7560A968E3,
-            0xABEEDDB2DDE06FF1, 0x58EFC10B06A2068D, 0xC6E57A78FBD986E0, 0x2EAB8CA63CE802D7,
-            0x14A195640116F336, 0x7C0828DD624EC390, 0xD74BBE77E6116AC7, 0x804456AF10F5FB53,
-            0xEBE9EA2ADF4321C7, 0x03219A39EE587A30, 0x49787FEF17AF9924, 0xA1E9300CD8520548,
-            0x5B45E522E4B1B4EF, 0xB49C3B3995091A36, 0xD4490AD526F14431, 0x12A8F216AF9418C2,
-            0x001F837CC7350524, 0x1877B51E57A764D5, 0xA2853B80F17F58EE, 0x993E1DE72D36D310,
-            0xB3598080CE64A656, 0x252F59CF0D9F04BB, 0xD23C8E176D113600, 0x1BDA0492E7E4586E,
-            0x21E0BD5026C619BF, 0x3B097ADAF088F94E, 0x8D14DEDB30BE846E, 0xF95CFFA23AF5F6F4,
-            0x3871700761B3F743, 0xCA672B91E9E4FA16, 0x64C8E531BFF53B55, 0x241260ED4AD1E87D,
-            0x106C09B972D2E822, 0x7FBA195410E5CA30, 0x7884D9BC6CB569D8, 0x0647DFEDCD894A29,
-            0x63573FF03E224774, 0x4FC8E9560F91B123, 0x1DB956E450275779, 0xB8D91274B9E9D4FB,
-            0xA2EBEE47E2FBFCE1, 0xD9F1F30CCD97FB09, 0xEFED53D75FD64E6B, 0x2E6D02C36017F67F,
-            0xA9AA4D20DB084E9B, 0xB64BE8D8B25396C1, 0x70CB6AF7C2D5BCF0, 0x98F076A4F7A2322E,
-            0xBF84470805E69B5F, 0x94C3251F06F90CF3, 0x3E003E616A6591E9, 0xB925A6CD0421AFF3,
-            0x61BDD1307C66E300, 0xBF8D5108E27E0D48, 0x240AB57A8B888B20, 0xFC87614BAF287E07,
-            0xEF02CDD06FFDB432, 0xA1082C0466DF6C0A, 0x8215E577001332C8, 0xD39BB9C3A48DB6CF,
-            0x2738259634305C14, 0x61CF4F94C97DF93D, 0x1B6BACA2AE4E125B, 0x758F450C88572E0B,
-            0x959F587D507A8359, 0xB063E962E045F54D, 0x60E8ED72C0DFF5D1, 0x7B64978555326F9F,
-            0xFD080D236DA814BA, 0x8C90FD9B083F4558, 0x106F72FE81E2C590, 0x7976033A39F7D952,
-            0xA4EC0132764CA04B, 0x733EA705FAE4FA77, 0xB4D8F77BC3E56167, 0x9E21F4F903B33FD9,
-            0x9D765E419FB69F6D, 0xD30C088BA61EA5EF, 0x5D94337FBFAF7F5B, 0x1A4E4822EB4D7A59,
-            0x6FFE73E81B637FB3, 0xDDF957BC36D8B9CA, 0x64D0E29EEA8838B3, 0x08DD9BDFD96B9F63,
-            0x087E79E5A57D1D13, 0xE328E230E3E2B3FB, 0x1C2559E30F0946BE, 0x720BF5F26F4D2EAA,
-            0xB0774D261CC609DB, 0x443F64EC5A371195, 0x4112CF68649A260E, 0xD813F2FAB7F5C5CA,
-            0x660D3257380841EE, 0x59AC2C7873F910A3, 0xE846963877671A17, 0x93B633ABFA3469F8,
-            0xC0C0F5A60EF4CDCF, 0xCAF21ECD4377B28C, 0x57277707199B8175, 0x506C11B9D90E8B1D,
-            0xD83CC2687A19255F, 0x4A29C6465A314CD1, 0xED2DF21216235097, 0xB5635C95FF7296E2,
-            0x22AF003AB672E811, 0x52E762596BF68235, 0x9AEBA33AC6ECC6B0, 0x944F6DE09134DFB6,
-            0x6C47BEC883A7DE39, 0x6AD047C430A12104, 0xA5B1CFDBA0AB4067, 0x7C45D833AFF07862,
-            0x5092EF950A16DA0B, 0x9338E69C052B8E7B, 0x455A4B4CFE30E3F5, 0x6B02E63195AD0CF8,
-            0x6B17B224BAD6BF27, 0xD1E0CCD25BB9C169, 0xDE0C89A556B9AE70, 0x50065E535A213CF6,
-            0x9C1169FA2777B874, 0x78EDEFD694AF1EED, 0x6DC93D9526A50E68, 0xEE97F453F06791ED,
-            0x32AB0EDB696703D3, 0x3A6853C7E70757A7, 0x31865CED6120F37D, 0x67FEF95D92607890,
-            0x1F2B1D1F15F6DC9C, 0xB69E38A8965C6B65, 0xAA9119FF184CCCF4, 0xF43C732873F24C13,
-            0xFB4A3D794A9A80D2, 0x3550C2321FD6109C, 0x371F77E76BB8417E, 0x6BFA9AAE5EC05779,
-            0xCD04F3FF001A4778, 0xE3273522064480CA, 0x9F91508BFFCFC14A, 0x049A7F41061A9E60,
-            0xFCB6BE43A9F2FE9B, 0x08DE8A1C7797DA9B, 0x8F9887E6078735A1, 0xB5B4071DBFC73A66,
-            0x230E343DFBA08D33, 0x43ED7F5A0FAE657D, 0x3A88A0FBBCB05C63, 0x21874B8B4D2DBC4F,
-            0x1BDEA12E35F6A8C9, 0x53C065C6C8E63528, 0xE34A1D250E7A8D6B, 0xD6B04D3B7651DD7E,
-            0x5E90277E7CB39E2D, 0x2C046F22062DC67D, 0xB10BB459132D0A26, 0x3FA9DDFB67E2F199,
-            0x0E09B88E1914F7AF, 0x10E8B35AF3EEAB37, 0x9EEDECA8E272B933, 0xD4C718BC4AE8AE5F,
-            0x81536D601170FC20, 0x91B534F885818A06, 0xEC8177F83F900978, 0x190E714FADA5156E,
-            0xB592BF39B0364963, 0x89C350C893AE7DC1, 0xAC042E70F8B383F2, 0xB49B52E587A1EE60,
-            0xFB152FE3FF26DA89, 0x3E666E6F69AE2C15, 0x3B544EBE544C19F9, 0xE805A1E290CF2456,
-            0x24B33C9D7ED25117, 0xE74733427B72F0C1, 0x0A804D18B7097475, 0x57E3306D881EDB4F,
-            0x4AE7D6A36EB5DBCB, 0x2D8D5432157064C8, 0xD1E649DE1E7F268B, 0x8A328A1CEDFE552C,
-            0x07A3AEC79624C7DA, 0x84547DDC3E203C94, 0x990A98FD5071D263, 0x1A4FF12616EEFC89,
-            0xF6F7FD1431714200, 0x30C05B1BA332F41C, 0x8D2636B81555A786, 0x46C9FEB55D120902,
-            0xCCEC0A73B49C9921, 0x4E9D2827355FC492, 0x19EBB029435DCB0F, 0x4659D2B743848A2C,
-            0x963EF2C96B33BE31, 0x74F85198B05A2E7D, 0x5A0F544DD2B1FB18, 0x03727073C2E134B1,
-            0xC7F6AA2DE59AEA61, 0x352787BAA0D7C22F, 0x9853EAB63B5E0B35, 0xABBDCDD7ED5C0860,
-            0xCF05DAF5AC8D77B0, 0x49CAD48CEBF4A71E, 0x7A4C10EC2158C4A6, 0xD9E92AA246BF719E,
-            0x13AE978D09FE5557, 0x730499AF921549FF, 0x4E4B705B92903BA4, 0xFF577222C14F0A3A,
-            0x55B6344CF97AAFAE, 0xB862225B055B6960, 0xCAC09AFBDDD2CDB4, 0xDAF8E9829FE96B5F,
-            0xB5FDFC5D3132C498, 0x310CB380DB6F7503, 0xE87FBB46217A360E, 0x2102AE466EBB1148,
-            0xF8549E1A3AA5E00D, 0x07A69AFDCC42261A, 0xC4C118BFE78FEAAE, 0xF9F4892ED96BD438,
-            0x1AF3DBE25D8F45DA, 0xF5B4B0B0D2DEEEB4, 0x962ACEEFA82E1C84, 0x046E3ECAAF453CE9,
-            0xF05D129681949A4C, 0x964781CE734B3C84, 0x9C2ED44081CE5FBD, 0x522E23F3925E319E,
-            0x177E00F9FC32F791, 0x2BC60A63A6F3B3F2, 0x222BBFAE61725606, 0x486289DDCC3D6780,
-            0x7DC7785B8EFDFC80, 0x8AF38731C02BA980, 0x1FAB64EA29A2DDF7, 0xE4D9429322CD065A,
-            0x9DA058C67844F20C, 0x24C0E332B70019B0, 0x233003B5A6CFE6AD, 0xD586BD01C5C217F6,
-            0x5E5637885F29BC2B, 0x7EBA726D8C94094B, 0x0A56A5F0BFE39272, 0xD79476A84EE20D06,
-            0x9E4C1269BAA4BF37, 0x17EFEE45B0DEE640, 0x1D95B0A5FCF90BC6, 0x93CBE0B699C2585D,
-            0x65FA4F227A2B6D79, 0xD5F9E858292504D5, 0xC2B5A03F71471A6F, 0x59300222B4561E00,
-            0xCE2F8642CA0712DC, 0x7CA9723FBB2E8988, 0x2785338347F2BA08, 0xC61BB3A141E50E8C,
-            0x150F361DAB9DEC26, 0x9F6A419D382595F4, 0x64A53DC924FE7AC9, 0x142DE49FFF7A7C3D,
-            0x0C335248857FA9E7, 0x0A9C32D5EAE45305, 0xE6C42178C4BBB92E, 0x71F1CE2490D20B07,
-            0xF1BCC3D275AFE51A, 0xE728E8C83C334074, 0x96FBF83A12884624, 0x81A1549FD6573DA5,
-            0x5FA7867CAF35E149, 0x56986E2EF3ED091B, 0x917F1DD5F8886C61, 0xD20D8C88C8FFE65F,
-            0x31D71DCE64B2C310, 0xF165B587DF898190, 0xA57E6339DD2CF3A0, 0x1EF6E6DBB1961EC9,
-            0x70CC73D90BC26E24, 0xE21A6B35DF0C3AD7, 0x003A93D8B2806962, 0x1C99DED33CB890A1,
-            0xCF3145DE0ADD4289, 0xD0E4427A5514FB72, 0x77C621CC9FB3A483, 0x67A34DAC4356550B,
-            0xF8D626AAAF278509]
-
-        def kind_of_piece(p):
-            return dict(list(zip(list('pnbhrqaz'), [0, 2, 4, 6, 6, 8, 10, 10])) + list(zip(list('PNBHRQAZ'), [1, 3, 5, 7, 7, 9, 11, 11])))[p]
-        piece = 0
-        for j in range(8):
-            for i in range(8):
-                p = self.part_at(i, j)
-                if p != '.':
-                    offset_piece = 64 * kind_of_piece(p) + 8 * j + i
-                    piece ^= random64[offset_piece]
-        castle = 0
-        if self._repr[4] == 'A':  # whites
-            if self._repr[7] == 'H':  # king side
-                castle ^= random64[768 + 0]
-            if self._repr[0] == 'H':  # queen side
-                castle ^= random64[768 + 1]
-        if self._repr[60] == 'a':  # blacks
-            if self._repr[63] == 'h':  # king side
-                castle ^= random64[768 + 2]
-            if self._repr[56] == 'h':  # queen side
-                castle ^= random64[768 + 3]
-        enpassant = 0
-        if self.enpassant_cell:
-            i, j = self.enpassant_cell
-            enpassant = random64[772 + i]
-        turn = random64[-1] if self.team == TEAM_WHITES else 0
-        return piece ^ castle ^ enpassant ^ turn
+        """Yields the (i, j) cells of the parts of the team that the opponent attacks, file by file"""
+        color = BLACK if team == TEAM_BLACKS else WHITE
+        attacked = self._colors[color] & self._attacks(color ^ 1)
+        for sq in sorted(squares(attacked), key=lambda sq: (sq & 7, sq >> 3)):
+            yield SQUARE_COORDS[sq]
 
     def __str__(self):
         return '#' * 9 + '\n' + '\n'.join(['#' + ''.join(self._repr[i:i + 8]) for i in range(56, -1, -8)])
@@ -854,19 +1135,155 @@ class BoardState:
         if len(repr) != 64:
             raise Exception('incorrect syntax in board representation')
         else:
-            repr = [repr[i:i + 8] for i in range(56, -1, -8)]
+            repr = [c for i in range(56, -1, -8) for c in repr[i:i + 8]]
             return BoardState(repr=repr)
 
 
+class SearchBoard(BoardState):
+
+    """A mutable copy of a BoardState, for the search : push(move) plays a move in place, and pop() undoes
+       the last one. It answers the same queries as BoardState (legal_moves, is_check, score, zobrist_hash...)
+       without allocating a new board at each node.
+
+       >>> board = SearchBoard(BoardState())
+       >>> board.push(next(board.legal_moves()))
+       >>> board.pop()
+       >>> board.snapshot().to_FEN()
+       'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+    """
+
+    __slots__ = ('_stack',)
+
+    def __init__(self, board=None):
+        if board is None:
+            board = BoardState()
+        self._bb = board._bb[:]
+        self._colors = board._colors[:]
+        self._mailbox = board._mailbox[:]
+        self.castling = board.castling
+        self._ep = board._ep
+        self.halfmoves = board.halfmoves
+        self.moves = board.moves
+        self.trait = board.trait
+        self._hash = board._hash
+        self._mg, self._eg, self._phase = board._mg, board._eg, board._phase
+        self._repr_cache = None
+        self._attack_maps = None
+        self._stack = []
+
+    @property
+    def ply(self):
+        """Number of moves pushed and not popped yet"""
+        return len(self._stack)
+
+    def push(self, move):
+        frm, to = move.from_square, move.to_square
+        colors = self._colors
+        mailbox = self._mailbox
+        # the bitboards are few enough to be saved as a whole
+        self._stack.append((frm, to, mailbox[frm], mailbox[to], tuple(self._bb), colors[0], colors[1],
+                            self.castling, self._ep, self.halfmoves, self._hash,
+                            self._mg, self._eg, self._phase))
+        self._play(move)
+
+    def pop(self):
+        frm, to, piece, captured, bb, white, black, castling, ep, halfmoves, h, mg, eg, phase = self._stack.pop()
+        self._bb[:] = bb
+        colors = self._colors
+        colors[0] = white
+        colors[1] = black
+        mailbox = self._mailbox
+        mailbox[frm] = piece
+        mailbox[to] = captured
+        kind = piece % 6
+        if kind == PAWN:
+            if captured is None and (to - frm) & 7:
+                # enpassant : the pawn that was taken stood behind the target cell
+                if piece < 6:
+                    mailbox[to - 8] = PAWN + 6
+                else:
+                    mailbox[to + 8] = PAWN
+        elif kind == KING and to - frm in (2, -2):
+            rookfrom, rookto = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+            mailbox[rookfrom] = mailbox[rookto]
+            mailbox[rookto] = None
+        self.castling = castling
+        self._ep = ep
+        self.halfmoves = halfmoves
+        if self.trait == 'w':
+            self.moves -= 1
+            self.trait = 'b'
+        else:
+            self.trait = 'w'
+        self._hash = h
+        self._mg, self._eg, self._phase = mg, eg, phase
+        self._repr_cache = None
+        self._attack_maps = None
+
+    def push_null(self):
+        """Passes : the other side plays next, on the same board (for null-move pruning)"""
+        self._stack.append((None, self._ep, self.halfmoves, self._hash))
+        self._hash ^= self._enpassant_key() ^ TURN_KEY
+        self._ep = None
+        self.halfmoves += 1
+        if self.trait == 'b':
+            self.moves += 1
+            self.trait = 'w'
+        else:
+            self.trait = 'b'
+
+    def pop_null(self):
+        _, self._ep, self.halfmoves, self._hash = self._stack.pop()
+        if self.trait == 'w':
+            self.moves -= 1
+            self.trait = 'b'
+        else:
+            self.trait = 'w'
+
+    @property
+    def after_null(self):
+        """Whether the last move pushed was a null move"""
+        return bool(self._stack) and self._stack[-1][0] is None
+
+    def snapshot(self):
+        """Returns the current position as an immutable BoardState"""
+        board = BoardState.__new__(BoardState)
+        board._bb = self._bb[:]
+        board._colors = self._colors[:]
+        board._mailbox = self._mailbox[:]
+        board.castling = self.castling
+        board._ep = self._ep
+        board.halfmoves = self.halfmoves
+        board.moves = self.moves
+        board.trait = self.trait
+        board._hash = self._hash
+        board._mg, board._eg, board._phase = self._mg, self._eg, self._phase
+        board._repr_cache = None
+        board._attack_maps = None
+        return board
+
+
 class OpeningsBook:
 
+    """A polyglot openings book.
+
+       read() loads the whole file in memory, keeping the heaviest move of each position. open() instead
+       maps the file in memory and looks the positions up by binary search (polyglot books are sorted by
+       key), so that nothing is decoded until asked for, and the pages are shared by all the processes
+       that use the same file.
+    """
+
+    # key, move, weight, learn
+    ENTRY = struct.Struct('>QHHL')
+
     def __init__(self):
         self._moves = {}
+        self._mmap = None
 
     def read(self, polyglot):
         if type(polyglot) == str:
             polyglot = open(polyglot, 'rb')
-        format = struct.Struct('>QHHL')
+        format = self.ENTRY
 
         def readchunk():
             while True:
@@ -878,78 +1295,885 @@ class OpeningsBook:
         for c in readchunk():
             key, move, weight, learn = format.unpack(c)
             if move != 0 and weight != 0:
-                if key in self._moves:
-                    m, w = self._moves[key]
-                    if w < weight:
-                        self._moves[key] = (Move.from_polyglot(move), weight)
-                else:
-                    self._moves[key] = (Move.from_polyglot(move), weight)
+                # the moves are decoded once the board is known, see find_moves
+                if key not in self._moves or self._moves[key][1] < weight:
+                    self._moves[key] = (move, weight)
+
+    def open(self, filename):
+        """Maps a polyglot file in memory, instead of reading it"""
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _lower_bound(self, key):
+        # index of the first entry whose key is not lower than the given one
+        data, size = self._mmap, self.ENTRY.size
+        lo, hi = 0, len(data) // size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from('>Q', data, mid * size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find_moves(self, board):
+        """Returns the list of (move, weight) known for the board, the heaviest first. The moves that are not
+           legal on the board (a corrupted book, or another position with the same key) are left out."""
+        key = board.zobrist_hash
+        if self._mmap is None:
+            found = [self._moves[key]] if key in self._moves else []
+        else:
+            found = []
+            entry = self.ENTRY
+            count = len(self._mmap) // entry.size
+            index = self._lower_bound(key)
+            while index < count:
+                k, move, weight, learn = entry.unpack_from(self._mmap, index * entry.size)
+                if k != key:
+                    break
+                if move != 0 and weight != 0:
+                    found.append((move, weight))
+                index += 1
+        if not found:
+            return []
+        legal = {move.code: move for move in board.legal_moves()}
+        moves = []
+        for move, weight in found:
+            move = legal.get(Move.from_polyglot(move, board.team, board).code)
+            if move is not None:
+                moves.append((move, weight))
+        moves.sort(key=lambda x: -x[1])
+        return moves
 
     def find_best_move(self, board):
-        key = board.zobrist_hash
-        if key in self._moves:
-            m, w = self._moves[key]
-            return m
+        moves = self.find_moves(board)
+        if moves:
+            return moves[0][0]
         else:
             return None
-            
+
+
 openingsBook = OpeningsBook()
 
-def negamax_alphabeta(board, a=-sys.maxsize, b=sys.maxsize, depth=DEFAULT_DEPTH):
-    if depth == 0:
-        return board.score(board.team)
+# kinds of scores stored in the transposition table
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
+
+
+class TranspositionTable:
+
+    """Remembers the result of the positions already searched, indexed by their Zobrist hash.
+
+       Entries are tuples (key, depth, score, bound, move, generation), the move being stored as
+       its 16-bits code (see Move.code). The table has a fixed number of slots, derived from the memory it is allowed to use ; when two positions fall in the same slot,
+       the replacement policy decides which one is kept :
+
+       * 'depth' : keep the deepest search, unless it was left over by a previous call to find_best_move
+       * 'always' : always keep the most recent one
+    """
+
+    # rough size of a filled slot : the list cell, the tuple and the ints it holds
+    ENTRY_SIZE = 160
+
+    def __init__(self, megabytes=16, policy='depth'):
+        if policy not in ('depth', 'always'):
+            raise ValueError('unknown replacement policy: ' + str(policy))
+        self.policy = policy
+        self.size = max(1, megabytes * 1024 * 1024 // self.ENTRY_SIZE)
+        self.generation = 0
+        self._slots = [None] * self.size
+
+    def new_search(self):
+        """Marks the current entries as coming from an older search"""
+        self.generation += 1
+
+    def clear(self):
+        self.generation = 0
+        self._slots = [None] * self.size
+
+    def probe(self, key):
+        entry = self._slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move=None):
+        index = key % self.size
+        old = self._slots[index]
+        if old is None or self.policy == 'always' or old[0] == key \
+                or old[5] != self.generation or depth >= old[1]:
+            self._slots[index] = (key, depth, score, bound, move, self.generation)
+
+
+class SearchTimeout(Exception):
+
+    """Raised from within the search when its time or nodes budget is exhausted"""
+
+
+class SearchControl:
+
+    """Budget of a search : a deadline (as returned by time.time()) and/or a maximum number of nodes.
+       negamax_alphabeta calls check() at each node, which counts it and raises SearchTimeout
+       once the budget is exhausted, or once another thread called stop().
+
+       The search also counts its beta cutoffs (and how many of them came from the first move searched),
+       its transposition table probes and the entries found, see SearchStats.
+    """
+
+    def __init__(self, deadline=None, max_nodes=None):
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        # the part of the nodes that were searched by the quiescence search
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.stopped = False
+
+    def counters(self):
+        """The counters, as a tuple that a worker process may send back"""
+        return self.nodes, self.qnodes, self.cutoffs, self.first_cutoffs, self.tt_probes, self.tt_hits
+
+    def add(self, counters):
+        """Adds the counters of another search (from a worker process) to this one"""
+        nodes, qnodes, cutoffs, first_cutoffs, tt_probes, tt_hits = counters
+        self.nodes += nodes
+        self.qnodes += qnodes
+        self.cutoffs += cutoffs
+        self.first_cutoffs += first_cutoffs
+        self.tt_probes += tt_probes
+        self.tt_hits += tt_hits
+
+    def stop(self):
+        """Makes the search end as soon as possible, with the move found so far"""
+        self.stopped = True
+
+    def expired(self):
+        """Whether the search was stopped or its deadline is past (the deadline may be set while it is running)"""
+        return self.stopped or self.deadline is not None and time.time() >= self.deadline
+
+    def check(self, quiescence=False):
+        self.nodes += 1
+        if quiescence:
+            self.qnodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchTimeout()
+        # looking at the clock every 64 nodes is enough
+        if not self.nodes & 63 and self.expired():
+            raise SearchTimeout()
+
+
+class SearchSignals:
+
+    """A stop flag, the alpha bound and the nodes budget of a search, in a small file mapped in memory : the
+       process that spreads the root moves over a process pool sets them, and the workers map the same file
+       (given its path) to read them, so that they start each move with the best score found so far and give
+       up as soon as the search is stopped. Each of the tasks counts its nodes in its own slot, so that they
+       all share the same budget. The process that creates them must close() them, which removes the file.
+    """
+
+    def __init__(self, path=None, tasks=0):
+        self._owner = path is None
+        if self._owner:
+            fd, path = tempfile.mkstemp(prefix='chess3-signals-')
+            # the stop flag, alpha, the budget, then the nodes of each task
+            os.write(fd, bytes(8 * (3 + tasks)))
+        else:
+            fd = os.open(path, os.O_RDWR)
+        try:
+            self._map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        self.path = path
+        self._words = memoryview(self._map).cast('q')
+        if self._owner:
+            self._words[1] = -sys.maxsize
+            self._words[2] = -1
+
+    @property
+    def stopped(self):
+        return self._words[0] != 0
+
+    @stopped.setter
+    def stopped(self, value):
+        self._words[0] = int(bool(value))
+
+    @property
+    def alpha(self):
+        return self._words[1]
+
+    @alpha.setter
+    def alpha(self, value):
+        self._words[1] = value
+
+    @property
+    def max_nodes(self):
+        """The nodes that the tasks may search altogether, None when there is no limit"""
+        budget = self._words[2]
+        return None if budget < 0 else budget
+
+    @max_nodes.setter
+    def max_nodes(self, value):
+        self._words[2] = -1 if value is None else value
+
+    @property
+    def nodes(self):
+        """The nodes searched by all the tasks so far"""
+        return sum(self._words[3:])
+
+    def set_nodes(self, task, nodes):
+        self._words[3 + task] = nodes
+
+    def close(self):
+        self._words.release()
+        self._map.close()
+        if self._owner:
+            os.remove(self.path)
+
+
+class SearchStats:
+
+    """What a call to find_best_move did : it is filled as the search goes, passed to the on_depth callback
+       after each completed iteration, and returned along with the move when with_stats=True.
+
+       depth, score, move : the last completed iteration, its score and its best move
+       nodes, qnodes : number of positions searched, and those of them that were searched by the quiescence search
+       cutoffs, first_cutoffs : number of beta cutoffs, and those of them that the first move searched caused
+       tt_probes, tt_hits : number of transposition table lookups, and those of them that found an entry
+       iterations : the (depth, seconds, nodes) of each completed iteration
+    """
+
+    def __init__(self):
+        self.depth = -1
+        self.score = None
+        self.move = None
+        self.nodes = self.qnodes = 0
+        self.cutoffs = self.first_cutoffs = 0
+        self.tt_probes = self.tt_hits = 0
+        self.iterations = []
+        self.started = time.time()
+        self.elapsed = 0.
+
+    def update(self, control):
+        """Reads the counters of the search"""
+        (self.nodes, self.qnodes, self.cutoffs, self.first_cutoffs,
+         self.tt_probes, self.tt_hits) = control.counters()
+        self.elapsed = time.time() - self.started
+
+    def iteration(self, depth, score, move, control):
+        """Records a completed iteration"""
+        spent = time.time() - self.started
+        self.iterations.append((depth, spent - self.elapsed, control.nodes - self.nodes))
+        self.depth, self.score, self.move = depth, score, move
+        self.update(control)
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    @property
+    def first_cutoff_rate(self):
+        """Part of the cutoffs caused by the first move : tells how good the move ordering is (above 0.9 is good)"""
+        return self.first_cutoffs / self.cutoffs if self.cutoffs else 0.
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.
+
+    @property
+    def branching_factor(self):
+        """Effective branching factor : how many times more nodes the last iteration needed than the one before"""
+        if len(self.iterations) < 2 or not self.iterations[-2][2]:
+            return 0.
+        return self.iterations[-1][2] / self.iterations[-2][2]
+
+    def __str__(self):
+        return ('depth %d, %d nodes (%d quiescence) in %.2fs, %d nps, first move cutoffs %.1f%%, '
+                'branching factor %.2f, tt hits %.1f%%' % (
+                    self.depth, self.nodes, self.qnodes, self.elapsed, self.nps, 100 * self.first_cutoff_rate,
+                    self.branching_factor, 100 * self.tt_hit_rate))
+
+
+class SearchOptions:
+
+    """The parts of the search that look at some moves less deeply than others, each of which may be switched
+       off to measure what it saves (see `python -m chess3 bench`) :
+
+       pvs : principal variation search, the moves after the first one are searched with a zero window, that is
+             only to prove that they are not better, and searched again with the full window when they are
+       aspiration : each iteration of an iterative search starts with a window around the score of the previous one
+       null_move : the side to play passes, if the reduced search that follows still fails high the position is
+                   cut off (not when in check, nor when the side to play has nothing but pawns)
+       lmr : late move reductions, the quiet moves that come late in the ordering are searched one ply less deep,
+             and searched again at full depth when they raise alpha
+    """
+
+    def __init__(self, pvs=True, aspiration=True, null_move=True, lmr=True):
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.null_move = null_move
+        self.lmr = lmr
+
+    def __repr__(self):
+        return 'SearchOptions(pvs=%r, aspiration=%r, null_move=%r, lmr=%r)' % (
+            self.pvs, self.aspiration, self.null_move, self.lmr)
+
+
+DEFAULT_OPTIONS = SearchOptions()
+
+# half the width of the aspiration window, in centipawns
+ASPIRATION_WINDOW = 50
+
+# how much shallower the search after a null move is
+NULL_MOVE_REDUCTION = 2
+
+# the moves that come after this many in the ordering are reduced, at this depth or more : a reduced move
+# still gets two full-width plies, so that the last one is never skipped
+LMR_MOVES = 3
+LMR_DEPTH = 4
+
+
+def time_for_move(remaining, increment=0, moves_to_go=None):
+    """Number of seconds to spend on the next move, given the time left on the clock (in seconds),
+       the increment added after each move and the number of moves until the next time control
+       (None for sudden death)"""
+    if moves_to_go is None:
+        moves_to_go = 30
+    budget = remaining / max(moves_to_go, 1) + increment
+    # never spend the whole clock, some time is lost in the exchanges with the GUI
+    return max(0.01, min(budget, remaining * 0.75, remaining - 0.5))
+
+
+class MoveOrdering:
+
+    """Order in which the search looks at the moves of a position, so that alpha-beta cuts off early :
+       the move found best by a previous search (from the transposition table), then the captures and
+       promotions by MVV-LVA (most valuable victim, least valuable attacker), then the killer moves
+       (the quiet moves that caused a cutoff at the same ply in another branch), then the other quiet moves
+       by history score (how often and how deep they caused cutoffs so far).
+
+       It is meant to live as long as one call to find_best_move.
+    """
+
+    HASH_MOVE = 1 << 30
+    CAPTURE = 1 << 29
+    KILLER = 1 << 28
+
+    def __init__(self):
+        # two killer moves per ply, as 16-bits codes
+        self.killers = []
+        # by piece (0-11) * 64 + target cell
+        self.history = [0] * 768
+
+    def order(self, board, hashmove=None, quiet=True):
+        """The legal moves of the board, sorted. hashmove is the code of the move to search first,
+           quiet=False leaves the moves that are neither captures nor promotions out."""
+        mailbox = board._mailbox
+        ply = board.ply if isinstance(board, SearchBoard) else 0
+        killer1, killer2 = self.killers[ply] if ply < len(self.killers) else (None, None)
+        history = self.history
+        capture, killer = self.CAPTURE, self.KILLER
+
+        def key(move):
+            code = move.code
+            if code == hashmove:
+                return self.HASH_MOVE
+            if move.capture or move.promotion:
+                victim = mailbox[move.to_square]
+                # no piece on the target cell of a capture : en passant
+                value = MATERIAL[victim % 6 if victim is not None else PAWN if move.capture else KING]
+                if move.promotion:
+                    value += MATERIAL[PROMOTIONS[move.promotion.lower()]]
+                return capture + value * 16 - mailbox[move.from_square] % 6
+            if code == killer1:
+                return killer + 1
+            if code == killer2:
+                return killer
+            return history[mailbox[move.from_square] * 64 + move.to_square]
+
+        moves = list(board.legal_moves(quiet))
+        moves.sort(key=key, reverse=True)
+        return moves
+
+    def cutoff(self, board, move, depth):
+        """Remembers a quiet move that caused a beta cutoff. To be called once the move is popped."""
+        ply = board.ply if isinstance(board, SearchBoard) else 0
+        while len(self.killers) <= ply:
+            self.killers.append((None, None))
+        code = move.code
+        killer1, killer2 = self.killers[ply]
+        if code != killer1:
+            self.killers[ply] = (code, killer1)
+        index = board._mailbox[move.from_square] * 64 + move.to_square
+        self.history[index] += depth * depth
+        if self.history[index] >= self.KILLER:
+            # keep the history scores below the killers
+            self.history = [h // 2 for h in self.history]
+
+
+# a capture that cannot bring the score back above alpha with this margin (in centipawns) is not searched
+DELTA_MARGIN = 200
+
+
+def quiescence(board, a=-sys.maxsize, b=sys.maxsize, control=None, ordering=None):
+    """Scores the position for the side to play, once the captures and promotions have been played,
+       so that the evaluation is not made in the middle of an exchange.
+
+       The side to play may also "stand pat" (keep the current evaluation, as some quiet move is
+       usually at least as good) unless it is in check, in which case all the moves are searched.
+       Captures that would not raise the score up to alpha even if they won the part for free are
+       skipped (delta pruning).
+    """
+    if not isinstance(board, SearchBoard):
+        board = SearchBoard(board)
+    if control is not None:
+        control.check(quiescence=True)
+    if ordering is None:
+        ordering = MoveOrdering()
+    check = board.in_check()
+    if check:
+        bestscore = -sys.maxsize
     else:
-        bestscore, bestmove = -sys.maxsize, None
-        for childmove in board.legal_moves():
-            score = - \
-                negamax_alphabeta(board.apply_move(
-                    childmove), -b, -a, depth - 1)
-            if score > bestscore:
-                bestscore = score
-                if bestscore > a:
-                    a = bestscore
-                    if a >= b:
-                        return bestscore
-        return bestscore
+        bestscore = board.evaluate()
+        if bestscore >= b:
+            return bestscore
+        if bestscore > a:
+            a = bestscore
+    mailbox = board._mailbox
+    for move in ordering.order(board, quiet=check):
+        if not check and not move.promotion:
+            victim = mailbox[move.to_square]
+            if bestscore + MG_VALUES[PAWN if victim is None else victim % 6] + DELTA_MARGIN <= a:
+                continue
+        board.push(move)
+        try:
+            score = -quiescence(board, -b, -a, control, ordering)
+        finally:
+            board.pop()
+        if score > bestscore:
+            bestscore = score
+            if bestscore > a:
+                a = bestscore
+                if a >= b:
+                    break
+    return bestscore
+
+
+def negamax_alphabeta(board, a=-sys.maxsize, b=sys.maxsize, depth=DEFAULT_DEPTH, transposition_table=None, control=None, ordering=None,
+                      options=None):
+    """Scores the position for the side to play. The moves are played on a SearchBoard, which is
+       created from the given board when it is an immutable BoardState.
+
+       The moves are searched in the order given by a MoveOrdering, which learns from the cutoffs : the same
+       one should be passed to all the searches that are part of a call to find_best_move.
+
+       options (a SearchOptions, all of them on by default) tells which moves may be searched less deeply.
+    """
+    if depth <= 0:
+        return quiescence(board, a, b, control, ordering)
+    if not isinstance(board, SearchBoard):
+        board = SearchBoard(board)
+    if control is not None:
+        control.check()
+    hashmove = None
+    if transposition_table is not None:
+        key = board.zobrist_hash
+        entry = transposition_table.probe(key)
+        if control is not None:
+            control.tt_probes += 1
+        if entry is not None:
+            if control is not None:
+                control.tt_hits += 1
+            hashmove = entry[4]
+            if entry[1] >= depth:
+                score, bound = entry[2], entry[3]
+                if bound == EXACT:
+                    return score
+                elif bound == LOWERBOUND:
+                    a = max(a, score)
+                else:
+                    b = min(b, score)
+                if a >= b:
+                    return score
+    if ordering is None:
+        ordering = MoveOrdering()
+    if options is None:
+        options = DEFAULT_OPTIONS
+    check = board.in_check()
+    if options.null_move and not check and depth >= NULL_MOVE_REDUCTION + 2 and b < sys.maxsize and not board.after_null:
+        color = WHITE if board.trait == 'w' else BLACK
+        bb = board._bb
+        # in pawn endings, passing may well be the best move (zugzwang) : it is not tried there
+        if board._colors[color] & ~(bb[6 * color + PAWN] | bb[6 * color + KING]) and board.evaluate() >= b:
+            board.push_null()
+            try:
+                score = -negamax_alphabeta(board, -b, -b + 1, depth - 1 - NULL_MOVE_REDUCTION,
+                                           transposition_table, control, ordering, options)
+            finally:
+                board.pop_null()
+            if score >= b:
+                # a mate found after a pass is not to be trusted
+                score = b if score >= sys.maxsize else score
+                if transposition_table is not None:
+                    transposition_table.store(key, depth, score, LOWERBOUND, hashmove)
+                return score
+    a0 = a
+    bestscore, bestmove = -sys.maxsize, None
+    for index, childmove in enumerate(ordering.order(board, hashmove)):
+        board.push(childmove)
+        try:
+            if not index:
+                score = -negamax_alphabeta(board, -b, -a, depth - 1,
+                                           transposition_table, control, ordering, options)
+            else:
+                reduction = 0
+                if options.lmr and index >= LMR_MOVES and depth >= LMR_DEPTH and not check \
+                        and not (childmove.capture or childmove.promotion) and not board.in_check():
+                    reduction = 1
+                # with pvs, the later moves only have to be proven worse than the best one so far
+                window = -a - 1 if options.pvs else -b
+                score = -negamax_alphabeta(board, window, -a, depth - 1 - reduction,
+                                           transposition_table, control, ordering, options)
+                if reduction and score > a:
+                    score = -negamax_alphabeta(board, window, -a, depth - 1,
+                                               transposition_table, control, ordering, options)
+                if window != -b and a < score < b:
+                    score = -negamax_alphabeta(board, -b, -a, depth - 1,
+                                               transposition_table, control, ordering, options)
+        finally:
+            board.pop()
+        if score > bestscore:
+            bestscore, bestmove = score, childmove
+            if bestscore > a:
+                a = bestscore
+                if a >= b:
+                    if not (childmove.capture or childmove.promotion):
+                        ordering.cutoff(board, childmove, depth)
+                    if control is not None:
+                        control.cutoffs += 1
+                        if not index:
+                            control.first_cutoffs += 1
+                    break
+    if transposition_table is not None:
+        if bestscore <= a0:
+            bound = UPPERBOUND
+        elif bestscore >= b:
+            bound = LOWERBOUND
+        else:
+            bound = EXACT
+        transposition_table.store(key, depth, bestscore, bound,
+                                  bestmove.code if bestmove else None)
+    return bestscore
 
 
 def _eval_move(args):
-    board, move, depth = args
-    boardafter = board.apply_move(move)
-    score = -negamax_alphabeta(boardafter, depth=depth)
+    board, move, depth, transposition_table, control, ordering, a, b, options = args
+    score = -negamax_alphabeta(board.apply_move(move), -b, -a, depth=depth,
+                               transposition_table=transposition_table, control=control,
+                               ordering=ordering, options=options)
     # print('#', move.to_xboard_notation(), score)
-    return score, move, boardafter
+    return score, move
 
 
-def find_best_move(board, process_pool=None, depth=DEFAULT_DEPTH):
-    """scan the best possible move for my_team, using minimax."""
+# in a pool worker : the transposition table, kept from one search to the next, the search it
+# was last used for and the move ordering of that search
+_worker_transposition_table = None
+_worker_search = None
+_worker_ordering = None
 
-    frombook = openingsBook.find_best_move(board)
+
+# in a pool worker : the signals of the search it takes part in (only the last ones are kept mapped)
+_worker_signals = None
+
+
+def _attach_signals(path):
+    """The SearchSignals of the given path, None when they are gone (the search is over)"""
+    global _worker_signals
+    if _worker_signals is not None:
+        if _worker_signals.path == path:
+            return _worker_signals
+        _worker_signals.close()
+        _worker_signals = None
+    try:
+        _worker_signals = SearchSignals(path)
+    except FileNotFoundError:
+        return None
+    return _worker_signals
+
+
+class _WorkerControl(SearchControl):
+
+    """Also stops the search of a pool worker when the process that dispatched it sets the stop flag, or
+       when the tasks of the search used up their nodes budget altogether"""
+
+    def __init__(self, signals, task, deadline=None):
+        SearchControl.__init__(self, deadline)
+        self.signals = signals
+        self.task = task
+
+    def expired(self):
+        signals = self.signals
+        signals.set_nodes(self.task, self.nodes)
+        if signals.max_nodes is not None and signals.nodes >= signals.max_nodes:
+            signals.stopped = True
+        return signals.stopped or SearchControl.expired(self)
+
+
+def _eval_root_move(args):
+    """Scores a move in a pool worker. Only the FEN of the position and the code of the move are
+       sent, and only the score, the code and the counters of the search are sent back.
+
+       signals is the path of the SearchSignals of the search (or None) : the move is searched with the
+       best score found so far as alpha, within the nodes budget shared by the tasks (task being the
+       index of this one), and not at all once the search is stopped."""
+    global _worker_transposition_table, _worker_search, _worker_ordering
+    fen, code, depth, search, deadline, max_nodes, a, b, options, signals, task = args
+    control = SearchControl(deadline, max_nodes)
+    if signals is not None:
+        signals = _attach_signals(signals)
+        if signals is None or signals.stopped:
+            raise SearchTimeout()
+        a = max(a, min(signals.alpha, b - 1))
+        control = _WorkerControl(signals, task, deadline)
+    if _worker_transposition_table is None:
+        _worker_transposition_table = TranspositionTable()
+    if search != _worker_search:
+        _worker_search = search
+        _worker_transposition_table.new_search()
+        _worker_ordering = MoveOrdering()
+    board = SearchBoard(BoardState.from_FEN(fen))
+    board.push(Move.from_code(code))
+    score = -negamax_alphabeta(board, -b, -a, depth=depth,
+                               transposition_table=_worker_transposition_table, control=control,
+                               ordering=_worker_ordering, options=options)
+    if signals is not None:
+        signals.set_nodes(task, control.nodes)
+    return score, code, control.counters()
+
+
+# identifies each call to find_best_move in the pool workers
+_searches = itertools.count()
+
+
+def _pool_results(iterator, count, control):
+    """The results of the tasks given to the pool, a SearchTimeout is raised as soon as the search is stopped"""
+    for _ in range(count):
+        while True:
+            try:
+                result = iterator.next(0.05)
+                break
+            except PoolTimeoutError:
+                if control is not None and control.expired():
+                    raise SearchTimeout()
+        yield result
+
+
+def _eval_moves(board, moves, depth, process_pool, transposition_table, control, search=None, costs=None,
+                ordering=None, results=None, window=(-sys.maxsize, sys.maxsize), options=None):
+    """Scores each move, returns a list of (score, move). The scores are appended to results as they
+       come, if given, so that they are not lost when the search is stopped.
+
+       The scores are exact inside the (alpha, beta) window, they are only bounds outside of it.
+
+       costs tells the number of nodes that each move is expected to need : on a process pool,
+       the most expensive moves are dispatched first so that no worker is left with a long search
+       while the others are idle. It is updated with the nodes actually searched.
+    """
+    results = [] if results is None else results
+    a, b = window
+    if process_pool and len(moves) > 1:
+        # the first move (the best one of the previous iteration) is searched here : its score is the
+        # alpha bound the workers start from, which they read from shared memory as it is raised
+        score, first = _eval_move((board, moves[0], depth, transposition_table, control, ordering, a, b, options))
+        results.append((score, first))
+        moves = moves[1:]
+        alpha = min(max(a, score - 1), b - 1)
+        deadline = None if control is None else control.deadline
+        if costs is None:
+            costs = {}
+        if not costs:
+            # the number of replies is a fair guess of the size of the subtree
+            for move in moves:
+                costs[move] = sum(1 for _ in board.apply_move(move).legal_moves())
+        signals = SearchSignals(tasks=len(moves))
+        signals.alpha = alpha
+        if control is not None and control.max_nodes is not None:
+            # what is left of the budget is shared by the workers, whichever moves turn out to need it
+            signals.max_nodes = max(0, control.max_nodes - control.nodes)
+        # the nodes of the tasks that sent their counters back
+        counted = 0
+        try:
+            fen = board.to_FEN()
+            bycode = {move.code: move for move in moves}
+            tasks = [(fen, move.code, depth, search, deadline, None, alpha, b, options, signals.path, task)
+                     for task, move in enumerate(sorted(moves, key=lambda m: -costs.get(m, 0)))]
+            for score, code, counters in _pool_results(process_pool.imap_unordered(_eval_root_move, tasks),
+                                                       len(tasks), control):
+                move = bycode[code]
+                costs[move] = counters[0]
+                counted += counters[0]
+                if control is not None:
+                    control.add(counters)
+                results.append((score, move))
+                if score - 1 > signals.alpha:
+                    signals.alpha = min(score - 1, b - 1)
+        finally:
+            # the tasks still running (after a stop) or not started yet give up at once
+            signals.stopped = True
+            if control is not None:
+                # the nodes of the tasks that were given up count too
+                control.nodes += max(0, signals.nodes - counted)
+            signals.close()
+        return results
+    # the scores only need to be exact for the moves that are at least as good as the best one so far,
+    # the others may be cut off as soon as they are known to be worse
+    best = -sys.maxsize
+    for move in moves:
+        score, move = _eval_move((board, move, depth, transposition_table, control, ordering, max(a, best - 1), b,
+                                  options))
+        best = max(best, score)
+        results.append((score, move))
+    return results
+
+
+def _choose_move(board, moves):
+    maxscore, maxmove = max(moves, key=lambda x: x[0])
+    if len(moves) > 1:
+        kept = [move for score, move in moves if score == maxscore]
+        # always prefer the one that put the opponent in check
+        for move in kept:
+            if board.apply_move(move).is_check():
+                return move
+        # if there is still a choice to make, choose any
+        return random.choice(kept)
+    return maxmove
+
+
+def find_best_move(board, process_pool=None, depth=DEFAULT_DEPTH, transposition_table=None, deadline=None, max_nodes=None, lazy_smp=0,
+                   control=None, on_depth=None, with_stats=False, options=None, book=True):
+    """scan the best possible move for my_team, using minimax.
+
+       A TranspositionTable may be given, and passed again for the next moves of the game so that
+       the positions already evaluated are not searched again. When the search is spread over a
+       process pool, each worker keeps a table of its own instead, for the whole life of the pool.
+
+       When a deadline (as returned by time.time()) or a maximum number of nodes is given, the search
+       is iterative : it goes one ply deeper each time, up to the given depth, until the budget is
+       exhausted. The move found by the last completed iteration is returned.
+       The budget may also be given as a SearchControl, whose stop() method may then be called by
+       another thread to get the best move found so far.
+
+       on_depth(stats) is called with the SearchStats of the search after each completed iteration, when it
+       is iterative (with lazy_smp, after each iteration of the main worker). With with_stats=True, a
+       (move, stats) tuple is returned.
+
+       With lazy_smp > 0 and a process pool, that many workers search the whole position at once, sharing
+       a transposition table held in shared memory (see chess3.smp). It is kept from one move to the next
+       when transposition_table is a chess3.smp.SharedTranspositionTable.
+
+       options is a SearchOptions, telling which of the selective parts of the search are used (all of them by default).
+       With book=False, the openings book is not looked at : the move always comes from a search.
+    """
+    stats = SearchStats()
+    # a search that may be stopped, or that reports its progress, goes one ply deeper at a time
+    iterative = control is not None or deadline is not None or max_nodes is not None or on_depth is not None
+    if control is None:
+        control = SearchControl(deadline, max_nodes)
+    if options is None:
+        options = DEFAULT_OPTIONS
+    move = _find_best_move(board, process_pool, depth, transposition_table, lazy_smp, control, iterative,
+                           on_depth, stats, options, book)
+    stats.move = move
+    stats.update(control)
+    return (move, stats) if with_stats else move
+
+
+def _find_best_move(board, process_pool, depth, transposition_table, lazy_smp, control, iterative, on_depth, stats,
+                    options, book):
+    frombook = openingsBook.find_best_move(board) if book else None
     if frombook:
         return frombook
 
-    if process_pool:
-        moves = process_pool.map(
-            _eval_move, [(board, m, depth) for m in board.legal_moves()])
-    else:
-        moves = list(map(_eval_move, [(board, m, depth)
-                                      for m in board.legal_moves()]))
-
-    boardsafter = {move: boardafter for score, move, boardafter in moves}
-
-    if len(moves) > 0:
-        maxscore, maxmove, boardafter = max(moves, key=lambda x: x[0])
-        if len(moves) > 1:
-            kept = [move for score, move,
-                    boardafter in moves if score == maxscore]
-            # always prefer the one that put the opponent in check
-            for move in kept:
-                boardafter = boardsafter[move]
-                if boardafter.is_check():
-                    return move
-            # if there is still a choice to make, choose any
-            return random.choice(kept)
-        return maxmove
-    else:
-        return None
+    if lazy_smp and process_pool:
+        from chess3.smp import SharedTranspositionTable, lazy_smp_search
+        if not isinstance(transposition_table, SharedTranspositionTable):
+            transposition_table = None
+        return lazy_smp_search(board, process_pool, lazy_smp, depth, transposition_table,
+                               control=control, stats=stats, options=options, on_depth=on_depth)
 
+    legal = list(board.legal_moves())
+    if not legal:
+        return None
+    if transposition_table is not None:
+        transposition_table.new_search()
+
+    search = next(_searches)
+    costs = {}
+    ordering = MoveOrdering()
+    if not iterative:
+        moves = _eval_moves(board, legal, depth, process_pool, transposition_table, control, search, costs, ordering,
+                            options=options)
+        bestmove = _choose_move(board, moves)
+        stats.iteration(depth, max(score for score, move in moves), bestmove, control)
+        return bestmove
+    bestmove = legal[0]
+    for d in range(depth + 1):
+        started = time.time()
+        moves = []
+        window = (-sys.maxsize, sys.maxsize)
+        if options.aspiration and stats.score is not None and abs(stats.score) < sys.maxsize:
+            window = (stats.score - ASPIRATION_WINDOW, stats.score + ASPIRATION_WINDOW)
+        try:
+            _eval_moves(board, legal, d, process_pool, transposition_table, control,
+                        search, costs, ordering, moves, window, options)
+            best = max(score for score, move in moves)
+            if not window[0] < best < window[1]:
+                # the best score is out of the window, so it is only a bound : search again without a window
+                moves = []
+                _eval_moves(board, legal, d, process_pool, transposition_table, control,
+                            search, costs, ordering, moves, options=options)
+        except SearchTimeout:
+            # the moves of an unfinished iteration may be compared with the best move of the previous
+            # one, if it got its score
+            if moves and (d == 0 or any(move == legal[0] for score, move in moves)):
+                bestmove = _choose_move(board, moves)
+            break
+        bestmove = _choose_move(board, moves)
+        stats.iteration(d, max(score for score, move in moves), bestmove, control)
+        if on_depth is not None:
+            on_depth(stats)
+        # search the most promising moves first in the next iteration
+        legal = [move for score, move in sorted(moves, key=lambda x: -x[0])]
+        # do not start an iteration that would not have the time to complete
+        if control.deadline is not None and time.time() + 2 * (time.time() - started) > control.deadline:
+            break
+    return bestmove
+
+
+def principal_variation(board, move, transposition_table, max_length=MAX_DEPTH):
+    """The moves expected to be played from the board, starting with the given one, as far as the
+       transposition table tells (by following the best move stored for each position)."""
+    pv = [move]
+    board = board.apply_move(move)
+    seen = {board.zobrist_hash}
+    while transposition_table is not None and len(pv) < max_length:
+        entry = transposition_table.probe(board.zobrist_hash)
+        if entry is None or entry[4] is None:
+            break
+        move = next((m for m in board.legal_moves() if m.code == entry[4]), None)
+        if move is None:
+            break
+        board = board.apply_move(move)
+        if board.zobrist_hash in seen:
+            break
+        seen.add(board.zobrist_hash)
+        pv.append(move)
+    return pv
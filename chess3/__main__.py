@@ -2,12 +2,139 @@
 import sys
 import re
 import os
+import time
+import queue
+import threading
 
 import chess3
 from chess3 import *
 
-def xboard_play(board, process_pool, history=[], respond=lambda x: sys.stdout.write(x + '\n')):
-    mymove = find_best_move(board, process_pool)
+
+def search_depth(plies):
+    """The depth to give to find_best_move for a search of that many plies (it does not count the root moves).
+       Both protocols count the plies : 'sd 3' and 'go depth 3' search the same tree."""
+    return max(0, plies - 1)
+
+
+class XboardClock:
+
+    """Time control, as set by the 'level', 'st' and 'sd' commands, and the clocks as given by 'time' and 'otim'"""
+
+    def __init__(self):
+        self.moves_per_session = 0
+        self.increment = 0
+        self.seconds_per_move = None
+        self.max_depth = None
+        # seconds left on the clocks, unknown until the GUI tells
+        self.time_left = None
+        self.opponent_time_left = None
+
+    def level(self, mps, base, inc):
+        self.moves_per_session = int(mps)
+        self.increment = float(inc)
+        self.seconds_per_move = None
+
+    def depth(self, default=MAX_DEPTH):
+        """The depth to give to find_best_move : 'sd' counts the plies, as UCI does"""
+        return default if self.max_depth is None else search_depth(self.max_depth)
+
+    @property
+    def timed(self):
+        """Whether the search is limited by time, rather than by depth"""
+        return self.seconds_per_move is not None or self.time_left is not None
+
+    def search_limits(self, board):
+        """returns the (depth, deadline) to use for searching the next move"""
+        if self.seconds_per_move is not None:
+            return self.depth(), time.time() + self.seconds_per_move
+        if self.time_left is not None:
+            moves_to_go = None
+            if self.moves_per_session:
+                moves_to_go = self.moves_per_session - \
+                    (board.moves - 1) % self.moves_per_session
+            return self.depth(), time.time() + time_for_move(self.time_left, self.increment, moves_to_go)
+        # no time control : fixed depth search
+        return self.depth(DEFAULT_DEPTH), None
+
+
+def start_process_pool(processes=None):
+    """Starts the workers that search the moves in parallel, one per cpu by default.
+       Returns the pool and its number of processes, or (None, 0) when there is no point
+       (or no way) in having more than one process."""
+    try:
+        if processes is None:
+            processes = cpu_count()
+        logging.debug('cpu count : %d' % processes)
+        if processes > 1:
+            # the workers must report to the same resource tracker as this process, otherwise
+            # they would destroy the shared transposition table when they exit
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+            return Pool(processes), processes
+    except Exception:
+        logging.debug('process pool is unavailable')
+    return None, 0
+
+
+def new_transposition_table(process_pool, megabytes=16):
+    """When there is a process pool, its workers share the table (lazy SMP) if the
+       platform supports it"""
+    if process_pool:
+        try:
+            from chess3.smp import SharedTranspositionTable
+            return SharedTranspositionTable(megabytes)
+        except Exception:
+            logging.debug('shared memory is unavailable')
+    return TranspositionTable(megabytes)
+
+
+class BackgroundSearch:
+
+    """Looks for the best move in a thread, so that commands can be read meanwhile.
+
+       Once it is over, (search, move) is put into the events queue. stop() makes it end early with
+       the best move found so far, cancel() makes it end and waits for it, its move being of no use.
+
+       When pondering, ponder_move is the move the opponent is expected to play, which leads to the board
+       being searched. The search has no deadline until the opponent actually plays it.
+    """
+
+    def __init__(self, board, events, process_pool, transposition_table=None, depth=DEFAULT_DEPTH,
+                 control=None, lazy_smp=0, on_depth=None):
+        self.board = board
+        self.events = events
+        self.control = control if control is not None else SearchControl()
+        self.cancelled = False
+        self.ponder_move = None
+        self.done = False
+        self.move = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        args=(process_pool, depth, transposition_table, lazy_smp, on_depth))
+        self._thread.start()
+
+    def _run(self, process_pool, depth, transposition_table, lazy_smp, on_depth):
+        move = None
+        try:
+            move = find_best_move(self.board, process_pool, depth=depth,
+                                  transposition_table=transposition_table, lazy_smp=lazy_smp,
+                                  control=self.control, on_depth=on_depth)
+        except Exception:
+            logging.exception('search failed')
+        self.move = move
+        self.done = True
+        self.events.put((self, move))
+
+    def stop(self):
+        self.control.stop()
+
+    def cancel(self):
+        self.cancelled = True
+        self.control.stop()
+        self._thread.join()
+
+
+def xboard_move(board, mymove, history=[], respond=lambda x: sys.stdout.write(x + '\n')):
+    """Plays the move found by the engine (resigns when there is none), returns the new board"""
     if mymove:
         respond('move ' + mymove.to_xboard_notation())
         history.append(board)
@@ -31,39 +158,97 @@ def xboard_play(board, process_pool, history=[], respond=lambda x: sys.stdout.wr
     return board
 
 
+def read_commands(command_reader, events):
+    """Runs in a thread of its own : puts the commands into the events queue as they arrive"""
+    while True:
+        try:
+            line = command_reader()
+        except EOFError:
+            events.put('quit')
+            return
+        except IOError:
+            print('#got IOError')
+            continue
+        events.put(line)
+
+
 def xboard_game(command_reader=lambda: input(), output=sys.stdout):
     """plays through the xboard protocol.
        most infos found at http://home.hccnet.nl/h.g.muller/interfacing.txt
+
+       The commands are read by another thread, and the engine thinks in the background, so that
+       the commands received while it is thinking ('?', 'ping', 'force', 'quit'...) are answered at once.
     """
     def respond(cmd, comment=False):
         logging.debug('<< ' + cmd)
         output.write(('#' if comment else '') + cmd + '\n')
         output.flush()
 
-    process_pool = None
-    # try:
-    #    c = cpu_count()
-    #    logging.debug('cpu count : %d' % c)
-    #    process_pool = Pool(c)
-    # except:
-    #    logging.debug('process pool is unavailable')
-    #    pass
+    # the workers are started once and kept warm for the whole session
+    process_pool, cores = start_process_pool()
     board = BoardState()
     force_mode = False
     history = []
+    # kept from one move to the next, cleared when a new game starts
+    transposition_table = new_transposition_table(process_pool)
+    # the workers search the whole position when they share the table, a part of the moves otherwise
+    lazy_smp = cores if not isinstance(transposition_table, TranspositionTable) else 0
+    clock = XboardClock()
+    # 'hard' : thinks on the opponent's time
+    pondering = False
+    events = queue.Queue()
+    # the search in progress, if any
+    search = None
+    reader = threading.Thread(target=read_commands, args=(command_reader, events), daemon=True)
+    reader.start()
+
+    def think():
+        depth, deadline = clock.search_limits(board)
+        return BackgroundSearch(board, events, process_pool, transposition_table, depth,
+                                SearchControl(deadline), lazy_smp)
+
+    def cancel_search():
+        if search is not None:
+            search.cancel()
+        return None
+
+    def ponder(before, move, after):
+        """Once the engine played the move, thinks on the opponent's time : the position after the reply
+           found in the transposition table is searched until the opponent moves"""
+        if not pondering or force_mode or not clock.timed:
+            return None
+        pv = principal_variation(before, move, transposition_table, 2)
+        if len(pv) < 2:
+            return None
+        thinking = BackgroundSearch(after.apply_move(pv[1]), events, process_pool, transposition_table,
+                                    clock.depth(), SearchControl(), lazy_smp)
+        thinking.ponder_move = pv[1]
+        logging.debug('pondering on ' + pv[1].to_xboard_notation())
+        return thinking
+
+    def play(move):
+        """Plays the engine's move, then ponders"""
+        before = board
+        after = xboard_move(board, move, history, respond)
+        return after, ponder(before, move, after) if move else None
 
     if output.isatty():
         respond(
             "#Howdy, type 'new' to start a new game, or 'help' to list supported commands")
 
     while True:
-        try:
-            line = command_reader()
-        except IOError:
-            print('#got IOError')
+        event = events.get()
+        if isinstance(event, tuple):
+            # a search is over
+            finished, move = event
+            if finished is search and finished.ponder_move is None:
+                search = None
+                if not finished.cancelled:
+                    board, search = play(move)
+            # else : pondering is over before the opponent moved, the move is kept until then
             continue
 
-        cmd = line.strip()
+        cmd = event.strip()
         logging.debug(">> " + cmd)
         if cmd == 'help':
             respond("""
@@ -75,9 +260,18 @@ new			: Starts a new game
 setboard <FEN string>	: Setup the board to the given state
 force			: Following moves are applied to the board, without playing
 go			: Make the engine play next move
+level <MPS> <BASE> <INC>	: Sets the time control
+st <TIME>		: Sets the time to spend on each move, in seconds
+sd <DEPTH>		: Limits the search depth (in plies, the root moves included)
+time <N>		: Sets the time left on the engine's clock, in centiseconds
+otim <N>		: Sets the time left on the opponent's clock, in centiseconds
+cores <N>		: Sets the number of processes used for searching
 undo			: Clears the last half-move
 remove			: Clears the last move
 show			: Displays the board
+?			: Plays the best move found so far
+hard			: Thinks on the opponent's time
+easy			: Stops thinking on the opponent's time
 fen			: Displays the board in FEN format (non-standard command)
 white			: Assign the engine to White
 black			: Assign the engine to Black
@@ -96,9 +290,11 @@ quit			: Exits
         # its own after it receives an input move.
 
         elif cmd == 'new':
+            search = cancel_search()
             board = BoardState()
             history = []
             force_mode = False
+            transposition_table.clear()
             respond(board.pretty_str(comment=True))
 
         elif cmd == 'protover 2':
@@ -109,18 +305,49 @@ quit			: Exits
             respond('feature sigterm=0')
             respond('feature setboard=1')
             respond('feature debug=1')
-            respond('feature time=0')
+            respond('feature time=1')
+            respond('feature smp=1')
             respond('feature done=1')
 
         elif cmd.startswith('ping'):
             n = cmd.split(' ')[-1]
             respond('pong ' + n)
 
+        elif cmd == '?':
+            if search is not None and search.ponder_move is None:
+                search.stop()
+
+        elif cmd == 'hard':
+            pondering = True
+
+        elif cmd == 'easy':
+            pondering = False
+            if search is not None and search.ponder_move is not None:
+                search = cancel_search()
+
         elif cmd.startswith('setboard'):
+            search = cancel_search()
             fen = cmd[9:].strip()
             board = BoardState.from_FEN(fen)
+            transposition_table.clear()
+
+        elif cmd.startswith('level '):
+            clock.level(*cmd.split()[1:4])
+
+        elif cmd.startswith('st '):
+            clock.seconds_per_move = float(cmd.split()[1])
+
+        elif cmd.startswith('sd '):
+            clock.max_depth = int(cmd.split()[1])
+
+        elif cmd.startswith('time '):
+            clock.time_left = int(cmd.split()[1]) / 100.
+
+        elif cmd.startswith('otim '):
+            clock.opponent_time_left = int(cmd.split()[1]) / 100.
 
         elif cmd == 'force':  # accept moves and just update the board
+            search = cancel_search()
             force_mode = True
 
         elif cmd == 'go':  # start playing
@@ -128,9 +355,12 @@ quit			: Exits
             # and keep spontaneously generating moves for that side each thime
             # that side has to move again.
             force_mode = False
-            board = xboard_play(board, process_pool, history, respond)
+            if search is None or search.ponder_move is not None:
+                search = cancel_search()
+                search = think()
 
         elif cmd == 'undo':
+            search = cancel_search()
             if len(history) > 0:
                 board = history[-1]
                 history = history[:-1]
@@ -138,6 +368,7 @@ quit			: Exits
                 respond('#nothing to undo')
 
         elif cmd == 'remove':
+            search = cancel_search()
             if len(history) > 1:
                 board = history[-2]
                 history = history[:-2]
@@ -147,27 +378,37 @@ quit			: Exits
         # not part of xboard protocol, only for debugging purposes
         elif cmd == 'show':
             respond(board.pretty_str())
-            respond('# : ' + ['black', 'white']
-                    [opponen(board.team) == TEAM_WHITES] + ' to play')
+            respond('# : ' + team_str(board.team) + ' to play')
         elif cmd == 'fen':
             respond(board.to_FEN())
 
+        elif cmd.startswith('cores '):
+            search = cancel_search()
+            release(process_pool, transposition_table)
+            process_pool, cores = start_process_pool(int(cmd.split()[1]))
+            transposition_table = new_transposition_table(process_pool)
+            lazy_smp = cores if not isinstance(transposition_table, TranspositionTable) else 0
+
         elif cmd == 'quit':
+            search = cancel_search()
+            release(process_pool, transposition_table)
             return
         elif cmd in ('white', 'black'):
-            board.trait = cmd[0]
+            search = cancel_search()
+            # the side to move is part of the hash, so the board is rebuilt
+            fen = board.to_FEN().split(' ')
+            fen[1] = cmd[0]
+            board = BoardState.from_FEN(' '.join(fen))
         else:
             if re.match('^[a-h][1-8][a-h][1-8].?$', cmd):
-                move = Move(to_coord(cmd[0:2]), to_coord(cmd[2:4]))
-                # detect pawn promotions
-                if len(cmd) == 5:
-                    move.promotion = cmd[-1]
-                    if board.team == TEAM_WHITES:
-                        move.promotion = move.promotion.upper()
+                move = Move.from_xboard_notation(cmd, board.team)
             else:
                 move = board.find_move_from_san(cmd)
             # received a move from the opponent
             if move:
+                pondered = search if search is not None and search.ponder_move == move else None
+                if pondered is None:
+                    search = cancel_search()
                 try:
                     board = board.apply_move(move, check_legal=True)
                     # update the board
@@ -180,19 +421,289 @@ quit			: Exits
                     respond('illegal move: ' + cmd)
                     continue
                 # evaluate what to play
-                if not force_mode:
-                    board = xboard_play(board, process_pool, history, respond)
+                if force_mode:
+                    search = cancel_search()
+                elif pondered is not None:
+                    # the expected move : the search goes on, now on the engine's clock
+                    logging.debug('ponder hit')
+                    pondered.ponder_move = None
+                    pondered.control.deadline = clock.search_limits(board)[1]
+                    if pondered.done:
+                        board, search = play(pondered.move)
+                else:
+                    search = think()
             else:
                 respond("#ignored command : '" + cmd + "'")
 
 
+def release(process_pool, transposition_table):
+    """Stops the workers, and frees the shared memory of the table"""
+    if process_pool:
+        process_pool.terminate()
+    if not isinstance(transposition_table, TranspositionTable):
+        transposition_table.close()
+
+
+class UciPosition:
+
+    """The board set by the 'position' commands. The GUI sends the whole game each time, so the board is kept :
+       when the game goes on from the previous command, only the new moves are played."""
+
+    def __init__(self):
+        self.base = 'startpos'
+        self.moves = []
+        self.board = BoardState()
+
+    def update(self, base, moves):
+        """base is 'startpos' or a FEN string, the moves are in long algebraic notation (i.e 'e7e8q')"""
+        if base != self.base or moves[:len(self.moves)] != self.moves:
+            self.base, self.moves = base, []
+            self.board = BoardState() if base == 'startpos' else BoardState.from_FEN(base)
+        for notation in moves[len(self.moves):]:
+            code = Move.from_xboard_notation(notation, self.board.team).code
+            move = next((m for m in self.board.legal_moves() if m.code == code), None)
+            if move is None:
+                raise ValueError('illegal move: ' + notation)
+            self.board = self.board.apply_move(move)
+            self.moves.append(notation)
+        return self.board
+
+
+def uci_position(args):
+    """Parses the arguments of a 'position' command, returns the base ('startpos' or a FEN string) and the moves"""
+    moves = []
+    if 'moves' in args:
+        moves = args[args.index('moves') + 1:]
+        args = args[:args.index('moves')]
+    if args[:1] == ['fen']:
+        return ' '.join(args[1:]), moves
+    return 'startpos', moves
+
+
+def uci_limits(args, board):
+    """Parses the arguments of a 'go' command, returns the depth, deadline, maximum number of nodes
+       of the search and whether it is infinite (the best move is then only given once 'stop' is received).
+       'go ponder' is infinite until 'ponderhit' is received, the limits then apply from that moment."""
+    values = {}
+    for name, value in zip(args, args[1:]):
+        if name in ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+            values[name] = int(value)
+    infinite = 'infinite' in args or not values
+    depth = search_depth(values['depth']) if 'depth' in values else MAX_DEPTH
+    deadline = None
+    if 'movetime' in values:
+        deadline = time.time() + values['movetime'] / 1000.
+    else:
+        remaining, increment = ('wtime', 'winc') if board.team == TEAM_WHITES else ('btime', 'binc')
+        if remaining in values:
+            deadline = time.time() + time_for_move(values[remaining] / 1000., values.get(increment, 0) / 1000.,
+                                                   values.get('movestogo'))
+    if infinite or 'ponder' in args:
+        return depth, None, None, True
+    return depth, deadline, values.get('nodes'), infinite
+
+
+# the search does not tell how far a mate is : it is guessed from the length of the principal variation
+def uci_score(score, pv):
+    if score >= sys.maxsize:
+        return 'mate %d' % ((len(pv) + 1) // 2)
+    if score <= -sys.maxsize:
+        return 'mate -%d' % (len(pv) // 2)
+    return 'cp %d' % score
+
+
+def uci_game(command_reader=lambda: input(), output=sys.stdout):
+    """plays through the UCI protocol (http://wbec-ridderkerk.nl/html/UCIProtocol.html).
+
+       As with xboard, the commands are read by another thread while the engine thinks in the background.
+       The search reports each completed depth with an 'info' line.
+    """
+    # the search thread writes 'info' lines too
+    lock = threading.Lock()
+
+    def respond(cmd):
+        logging.debug('<< ' + cmd)
+        with lock:
+            output.write(cmd + '\n')
+            output.flush()
+
+    process_pool, cores = start_process_pool()
+    hash_size = 16
+    transposition_table = new_transposition_table(process_pool, hash_size)
+    lazy_smp = cores if not isinstance(transposition_table, TranspositionTable) else 0
+    position = UciPosition()
+    events = queue.Queue()
+    search = None
+    # the move of an infinite search that was over before 'stop' was received
+    held = None
+    reader = threading.Thread(target=read_commands, args=(command_reader, events), daemon=True)
+    reader.start()
+
+    def cancel_search():
+        if search is not None:
+            search.cancel()
+        return None
+
+    def think(args):
+        board = position.board
+        depth, deadline, max_nodes, infinite = uci_limits(args, board)
+        control = SearchControl(deadline, max_nodes)
+        started = time.time()
+        table = transposition_table
+
+        def on_depth(stats):
+            pv = principal_variation(board, stats.move, table, stats.depth + 1)
+            respond('info depth %d score %s nodes %d nps %d time %d pv %s' % (
+                stats.depth + 1, uci_score(stats.score, pv), stats.nodes, stats.nps, stats.elapsed * 1000,
+                ' '.join(m.to_xboard_notation() for m in pv)))
+
+        thinking = BackgroundSearch(board, events, process_pool, transposition_table, depth, control,
+                                    lazy_smp, on_depth)
+        thinking.infinite = infinite
+        thinking.started = started
+        # the limits of the search once the opponent plays the expected move
+        thinking.ponder_args = [arg for arg in args if arg != 'ponder'] if 'ponder' in args else None
+        return thinking
+
+    def ponderhit(pondered):
+        """The opponent played the expected move : the search goes on, with the limits of the 'go' command"""
+        depth, deadline, max_nodes, infinite = uci_limits(pondered.ponder_args, pondered.board)
+        pondered.ponder_args = None
+        pondered.infinite = infinite
+        if max_nodes is not None:
+            max_nodes += pondered.control.nodes
+        pondered.control.deadline, pondered.control.max_nodes = deadline, max_nodes
+
+    def bestmove(finished, move):
+        spent = max(time.time() - finished.started, 1e-3)
+        nodes = finished.control.nodes
+        respond('info nodes %d nps %d time %d' % (nodes, nodes / spent, spent * 1000))
+        if not move:
+            respond('bestmove 0000')
+            return
+        pv = principal_variation(finished.board, move, transposition_table, 2)
+        respond('bestmove ' + move.to_xboard_notation() +
+                (' ponder ' + pv[1].to_xboard_notation() if len(pv) > 1 else ''))
+
+    while True:
+        event = events.get()
+        if isinstance(event, tuple):
+            finished, move = event
+            if finished is search:
+                search = None
+                if finished.infinite:
+                    held = event
+                elif not finished.cancelled:
+                    bestmove(finished, move)
+            continue
+
+        cmd = event.strip()
+        logging.debug('>> ' + cmd)
+        args = cmd.split()
+        if not args:
+            continue
+        if args[0] == 'uci':
+            respond('id name chess3 ' + chess3.__version__)
+            respond('id author Julien Rialland')
+            respond('option name Hash type spin default 16 min 1 max 4096')
+            respond('option name Threads type spin default %d min 1 max 256' % max(cores, 1))
+            respond('option name Ponder type check default false')
+            respond('uciok')
+
+        elif args[0] == 'isready':
+            respond('readyok')
+
+        elif args[0] == 'ucinewgame':
+            search, held = cancel_search(), None
+            position = UciPosition()
+            transposition_table.clear()
+
+        elif args[0] == 'setoption' and 'name' in args and 'value' in args:
+            search, held = cancel_search(), None
+            name = ' '.join(args[args.index('name') + 1:args.index('value')]).lower()
+            value = ' '.join(args[args.index('value') + 1:])
+            if name == 'hash':
+                hash_size = int(value)
+                if not isinstance(transposition_table, TranspositionTable):
+                    transposition_table.close()
+                transposition_table = new_transposition_table(process_pool, hash_size)
+            elif name == 'threads':
+                release(process_pool, transposition_table)
+                process_pool, cores = start_process_pool(int(value))
+                transposition_table = new_transposition_table(process_pool, hash_size)
+            elif name != 'ponder':  # the GUI tells when to ponder, with 'go ponder'
+                respond('info string unknown option ' + name)
+            lazy_smp = cores if not isinstance(transposition_table, TranspositionTable) else 0
+
+        elif args[0] == 'position':
+            search, held = cancel_search(), None
+            try:
+                position.update(*uci_position(args[1:]))
+            except Exception as e:
+                logging.exception('bad position: ' + cmd)
+                respond('info string ' + str(e))
+
+        elif args[0] == 'go':
+            search, held = cancel_search(), None
+            search = think(args[1:])
+
+        elif args[0] == 'ponderhit':
+            if search is not None and search.ponder_args is not None:
+                ponderhit(search)
+            elif held is not None and held[0].ponder_args is not None:
+                # the search was over before the opponent moved
+                ponderhit(held[0])
+                if not held[0].infinite:
+                    bestmove(*held)
+                    held = None
+
+        elif args[0] == 'stop':
+            if search is not None:
+                search.infinite = False
+                search.stop()
+            elif held is not None:
+                bestmove(*held)
+                held = None
+
+        elif args[0] == 'quit':
+            cancel_search()
+            release(process_pool, transposition_table)
+            return
+
+        else:
+            respond('info string ignored command: ' + cmd)
+
+
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['perft']:
+        from chess3.perft import main
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ['book']:
+        from chess3.book import main
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ['pgn']:
+        from chess3.pgn import main
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ['analyse']:
+        from chess3.analyse import main
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ['bench']:
+        from chess3.bench import main
+        sys.exit(main(sys.argv[2:]))
     if '--debug' in sys.argv:
         logging.basicConfig(level=logging.DEBUG)
     bookfile = './Most_played_2mlj_base.bin'
     if os.path.exists(bookfile):
-        openingsBook.read(bookfile)
+        # mapped rather than read : the lookups are done on demand, and the pages are shared with the workers
+        openingsBook.open(bookfile)
     else:
         pass
         # logging.warn('# openings book ' + bookfile + ' not found !')
-    xboard_game()
+    if '--uci' in sys.argv:
+        uci_game()
+    else:
+        xboard_game()
+    # the thread that reads the commands is still waiting for a line, which would hang (or crash)
+    # the interpreter shutdown
+    sys.stdout.flush()
+    os._exit(0)
@@ -0,0 +1,267 @@
+# -*- coding:utf-8 -*-
+"""Analyses batches of positions, keeping the results in a cache so that no position is searched twice.
+
+The positions are read as JSON lines ({"fen": ..., "id": ..., "depth": ...}, only the FEN being
+required) or as EPD / FEN lines (the 'id' opcode of an EPD line is kept). One JSON line is written for
+each of them, with the best move (in long algebraic notation and in SAN), the score (in centipawns, for
+the side to move) and the principal variation :
+
+    python -m chess3 analyse positions.epd --depth 4 --cache analyses.db -o results.jsonl
+
+The cache is a sqlite database, keyed by the zobrist key of the position and the depth of the search.
+A result found at a greater depth is used for a shallower request, the answer telling that greater
+depth. The same position appearing several times in a batch is only searched once.
+"""
+import collections
+import json
+import queue
+import re
+import sqlite3
+import sys
+
+from chess3 import BoardState, TranspositionTable, DEFAULT_DEPTH, find_best_move, principal_variation
+
+_EPD_ID = re.compile(r'\bid\s+"([^"]*)"')
+
+
+def read_requests(lines):
+    """Yields the requests ({'fen': ..., 'id': ..., 'depth': ...}) found in JSON, EPD or FEN lines"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            request = json.loads(line)
+        else:
+            fields = line.split(None, 6)
+            if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+                request = {'fen': ' '.join(fields[:6])}
+            else:
+                # EPD : the halfmove clock and the move number are replaced by opcodes
+                request = {'fen': ' '.join(fields[:4]) + ' 0 1'}
+                match = _EPD_ID.search(line)
+                if match:
+                    request['id'] = match.group(1)
+        request.setdefault('id', number)
+        yield request
+
+
+def _signed(key):
+    # sqlite integers are signed 64-bits
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class AnalysisCache:
+
+    """The results of the analyses, in a sqlite database. They are committed every `batch` results,
+       and when the cache is closed."""
+
+    def __init__(self, filename, batch=100):
+        self._db = sqlite3.connect(filename)
+        self._db.execute('CREATE TABLE IF NOT EXISTS analysis (key INTEGER, depth INTEGER, position TEXT, '
+                         'result TEXT, PRIMARY KEY (key, depth))')
+        self._batch = batch
+        self._pending = 0
+
+    def get(self, board, depth):
+        """The result of the deepest analysis of the board that went at least to the given depth, or None.
+           Its 'depth' is the one the analysis actually went to."""
+        position = _position(board)
+        for found, stored, result in self._db.execute(
+                'SELECT position, depth, result FROM analysis WHERE key = ? AND depth >= ? ORDER BY depth DESC',
+                (_signed(board.zobrist_hash), depth)):
+            if found == position:
+                result = json.loads(result)
+                result['depth'] = stored
+                return result
+        return None
+
+    def put(self, board, depth, result):
+        self._db.execute('INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?)',
+                         (_signed(board.zobrist_hash), depth, _position(board), json.dumps(result)))
+        self._pending += 1
+        if self._pending >= self._batch:
+            self._db.commit()
+            self._pending = 0
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def _position(board):
+    # the FEN without the move counters, which do not change the analysis
+    return ' '.join(board.to_FEN().split()[:4])
+
+
+# in a pool worker (or in the process itself, without a pool) : kept from one position to the next,
+# as the positions of a batch often have common continuations
+_transposition_table = None
+
+
+def _analyse(args):
+    """Searches a position, returns the result as a dict"""
+    global _transposition_table
+    fen, depth = args
+    if _transposition_table is None:
+        _transposition_table = TranspositionTable()
+    board = BoardState.from_FEN(fen)
+    # the results are those of the search, a move from the book would come without a score
+    move, stats = find_best_move(board, depth=depth, transposition_table=_transposition_table, with_stats=True,
+                                 book=False)
+    if move is None:
+        return {'bestmove': None, 'san': None, 'score': None, 'pv': [], 'nodes': stats.nodes}
+    pv = principal_variation(board, move, _transposition_table, depth + 1)
+    result = {'bestmove': move.to_xboard_notation(), 'san': board.to_san(move), 'score': stats.score,
+              'pv': [m.to_xboard_notation() for m in pv], 'nodes': stats.nodes}
+    if abs(stats.score) >= sys.maxsize:
+        # the search does not tell how far the mate is, the principal variation does
+        result['score'] = None
+        result['mate'] = (len(pv) + 1) // 2 if stats.score > 0 else -(len(pv) // 2)
+    return result
+
+
+class _Job:
+
+    """A search, and the requests that wait for it"""
+
+    def __init__(self, board, depth):
+        self.board = board
+        self.depth = depth
+        self.requests = []
+        self.result = None
+        self.pending = None
+
+
+def analyse(requests, depth=DEFAULT_DEPTH, cache=None, process_pool=None, ordered=True, window=64):
+    """Yields the results of the requests (as read by read_requests), in the order of the requests or as
+       soon as they are available. With a process pool, at most `window` searches are in progress.
+
+       The results are the requests, with the fields of the analysis (or an 'error') added. Without a
+       cache, an in-memory one is used, so that the repeated positions are still searched once.
+    """
+    if cache is None:
+        cache = AnalysisCache(':memory:')
+    # the searches in progress, by (zobrist key, depth)
+    jobs = {}
+    # ordered : the (result or request, job) in the order of the requests
+    waiting = collections.deque()
+    # completion order : the jobs that are over, as told by the pool
+    completed = queue.Queue()
+
+    def collect(job):
+        try:
+            job.result = job.pending.get()
+            cache.put(job.board, job.depth, job.result)
+        except Exception as e:
+            job.result = {'error': 'search failed: %s' % e}
+        del jobs[job.board.zobrist_hash, job.depth]
+
+    def answer(request, result, cached):
+        request = dict(request)
+        request.update(result)
+        request['cached'] = cached
+        return request
+
+    def flush(limit):
+        # gives the results that are ready, waiting for some while `limit` searches or more are in progress
+        while True:
+            if ordered:
+                while waiting and (waiting[0][1] is None or waiting[0][1].result is not None):
+                    request, job = waiting.popleft()
+                    yield request if job is None else answer(request, job.result, False)
+                if not waiting or len(jobs) < limit:
+                    return
+                collect(waiting[0][1])
+            else:
+                if len(jobs) < limit:
+                    return
+                job = completed.get()
+                collect(job)
+                for request in job.requests:
+                    yield answer(request, job.result, False)
+
+    for request in requests:
+        try:
+            board = BoardState.from_FEN(request['fen'])
+            request['depth'] = int(request.get('depth', depth))
+        except Exception as e:
+            waiting.append((dict(request, error='invalid request: %s' % e), None))
+            if not ordered:
+                yield waiting.pop()[0]
+            continue
+        key = (board.zobrist_hash, request['depth'])
+        job = jobs.get(key)
+        if job is None:
+            result = cache.get(board, request['depth'])
+            if result is not None:
+                waiting.append((answer(request, result, True), None))
+                if not ordered:
+                    yield waiting.pop()[0]
+                continue
+            job = jobs[key] = _Job(board, request['depth'])
+            args = (request['fen'], request['depth'])
+            if process_pool is None:
+                job.pending = _Done(args)
+                if not ordered:
+                    completed.put(job)
+            else:
+                done = None if ordered else lambda _, job=job: completed.put(job)
+                job.pending = process_pool.apply_async(_analyse, (args,), callback=done, error_callback=done)
+        job.requests.append(request)
+        if ordered:
+            waiting.append((request, job))
+        for answered in flush(window if process_pool is not None else 1):
+            yield answered
+    for answered in flush(1):
+        yield answered
+
+
+class _Done:
+
+    """Stands for the AsyncResult of a pool, when the search is done in the process itself"""
+
+    def __init__(self, args):
+        self.args = args
+
+    def get(self):
+        return _analyse(self.args)
+
+
+def main(args):
+    """Entry point of `python -m chess3 analyse`"""
+    import argparse
+    import time
+    from multiprocessing import Pool, cpu_count
+    parser = argparse.ArgumentParser(prog='python -m chess3 analyse',
+                                     description='analyses positions given as JSON lines ({"fen": ...}), EPD or FEN')
+    parser.add_argument('input', nargs='?', help='file of positions (default: the standard input)')
+    parser.add_argument('-o', '--output', help='where to write the results (default: the standard output)')
+    parser.add_argument('-d', '--depth', type=int, default=DEFAULT_DEPTH,
+                        help='depth of the searches (default: %d)' % DEFAULT_DEPTH)
+    parser.add_argument('--cache', help='sqlite database where the results are kept')
+    parser.add_argument('-p', '--processes', type=int, default=cpu_count(),
+                        help='number of processes searching (default: one per cpu)')
+    parser.add_argument('--order', choices=('input', 'completion'), default='input',
+                        help='order of the results (default: input)')
+    options = parser.parse_args(args)
+
+    source = open(options.input) if options.input else sys.stdin
+    output = open(options.output, 'w') if options.output else sys.stdout
+    cache = AnalysisCache(options.cache) if options.cache else None
+    process_pool = Pool(options.processes) if options.processes > 1 else None
+    count, cached, start = 0, 0, time.time()
+    try:
+        for result in analyse(read_requests(source), options.depth, cache, process_pool,
+                              ordered=options.order == 'input'):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            count += 1
+            cached += bool(result.get('cached'))
+    finally:
+        if process_pool is not None:
+            process_pool.terminate()
+        if cache is not None:
+            cache.close()
+    sys.stderr.write('%d positions (%d from the cache) in %.2fs\n' % (count, cached, time.time() - start))
+    return 0
@@ -0,0 +1,99 @@
+# -*- coding:utf-8 -*-
+"""Measures what each selective part of the search (see SearchOptions) saves, on a set of positions.
+
+Each position is searched once per configuration, with a fresh transposition table : with all the
+selective parts off (plain alpha-beta), with each one of them alone, and with all of them. The number
+of nodes of each configuration is compared with the first one, along with how often it found the
+same best move.
+
+    python -m chess3 bench --depth 4
+    python -m chess3 bench --movetime 5     # how deep each configuration goes in 5 seconds
+"""
+import random
+import time
+
+from chess3 import BoardState, SearchControl, SearchOptions, TranspositionTable, find_best_move
+
+# middlegames with tactics, quiet middlegames and endgames
+BENCH_POSITIONS = [
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4',
+    'r2q1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N2N2/PP2BPPP/R2Q1RK1 w - - 0 10',
+    'r1b2rk1/2q1bppp/p2p1n2/np2p3/3PP3/5N1P/PPBN1PP1/R1BQR1K1 w - - 0 13',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '8/8/4kpp1/3p4/p6P/2B4b/6P1/6K1 b - - 1 48',
+    '8/5pk1/6p1/7p/7P/6P1/5PK1/8 w - - 0 1',
+]
+
+CONFIGURATIONS = [
+    ('alpha-beta', SearchOptions(pvs=False, aspiration=False, null_move=False, lmr=False)),
+    ('pvs', SearchOptions(pvs=True, aspiration=False, null_move=False, lmr=False)),
+    ('aspiration', SearchOptions(pvs=False, aspiration=True, null_move=False, lmr=False)),
+    ('null move', SearchOptions(pvs=False, aspiration=False, null_move=True, lmr=False)),
+    ('lmr', SearchOptions(pvs=False, aspiration=False, null_move=False, lmr=True)),
+    ('all', SearchOptions()),
+]
+
+
+def search(fen, options, depth=None, movetime=None):
+    """Searches a position to the given depth, or for the given number of seconds, returns its SearchStats"""
+    board = BoardState.from_FEN(fen)
+    deadline = None if movetime is None else time.time() + movetime
+    # the moves of equal scores are chosen at random : the same choices for every configuration
+    random.seed(0)
+    # always iterative, so that the aspiration windows have a previous score to start from
+    move, stats = find_best_move(board, depth=depth, transposition_table=TranspositionTable(),
+                                 control=SearchControl(deadline), options=options, with_stats=True)
+    return stats
+
+
+def run(depth=3, movetime=None, positions=None, configurations=None, respond=print):
+    """Searches each position with each configuration, reports one line per configuration.
+       Returns {name: (nodes, seconds, average depth, best moves found by the first configuration too)}"""
+    positions = positions or BENCH_POSITIONS
+    configurations = configurations or CONFIGURATIONS
+    results = {}
+    reference = None
+    for name, options in configurations:
+        nodes, elapsed, depths, moves = 0, 0., 0, []
+        for fen in positions:
+            stats = search(fen, options, depth if movetime is None else 64, movetime)
+            nodes += stats.nodes
+            elapsed += stats.elapsed
+            depths += stats.depth
+            moves.append(stats.move)
+        if reference is None:
+            reference = nodes, moves
+        same = sum(1 for mine, theirs in zip(moves, reference[1]) if mine == theirs)
+        results[name] = (nodes, elapsed, depths / len(positions), same)
+        respond('%-12s %10d nodes %8.2fs %8d nps  %5.1f%% of the nodes  depth %.1f  same move %d/%d' % (
+            name, nodes, elapsed, nodes / max(elapsed, 1e-6), 100. * nodes / max(reference[0], 1),
+            depths / len(positions), same, len(positions)))
+    return results
+
+
+def main(args):
+    """Entry point of `python -m chess3 bench`"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m chess3 bench',
+                                     description='compares the nodes searched with and without the selective parts '
+                                                 'of the search')
+    parser.add_argument('fen', nargs='*', help='positions to search (a built-in set when omitted)')
+    parser.add_argument('-d', '--depth', type=int, default=3, help='depth of the searches (default: 3)')
+    parser.add_argument('-t', '--movetime', type=float,
+                        help='searches each position for that many seconds instead, and tells the depth reached')
+    parser.add_argument('--only', help='comma-separated names of the configurations to run (%s)' %
+                                       ', '.join(name for name, options in CONFIGURATIONS))
+    options = parser.parse_args(args)
+
+    positions = [' '.join(options.fen)] if options.fen else None
+    configurations = CONFIGURATIONS
+    if options.only:
+        names = options.only.split(',')
+        configurations = [(name, o) for name, o in CONFIGURATIONS if name in names]
+        if not configurations:
+            parser.error('no such configuration: ' + options.only)
+    run(options.depth, options.movetime, positions, configurations)
+    return 0
@@ -0,0 +1,187 @@
+# -*- coding:utf-8 -*-
+"""Bitboard primitives used by chess3.BoardState.
+
+A bitboard is a python int where bit n is set when the square n is occupied,
+squares being numbered from a1 (0) to h8 (63), rank by rank, which is the same
+indexing as the legacy string representation of the board.
+
+All the attack tables are computed once, when the module is imported.
+"""
+
+WHITE = 0
+BLACK = 1
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+
+# a piece is identified by color * 6 + kind, i.e. 0-5 for whites, 6-11 for blacks
+PIECE_LETTERS = 'PNBRQKpnbrqk'
+
+# castling rights flags (same order as the polyglot castling keys)
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+# (i, j) coordinates of each square, shared so that no tuple gets allocated
+# when building moves
+SQUARE_COORDS = tuple((sq % 8, sq // 8) for sq in range(64))
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # python < 3.10
+    def popcount(bb):
+        return bin(bb).count('1')
+
+
+def lsb(bb):
+    """index of the least significant bit that is set"""
+    return (bb & -bb).bit_length() - 1
+
+
+def squares(bb):
+    """iterates over the indexes of the bits that are set"""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def _offsets_table(offsets):
+    table = []
+    for sq in range(64):
+        i, j = SQUARE_COORDS[sq]
+        bb = 0
+        for di, dj in offsets:
+            x, y = i + di, j + dj
+            if 0 <= x < 8 and 0 <= y < 8:
+                bb |= 1 << (y * 8 + x)
+        table.append(bb)
+    return tuple(table)
+
+
+KNIGHT_ATTACKS = _offsets_table(
+    [(-2, -1), (-1, -2), (1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1)])
+
+KING_ATTACKS = _offsets_table(
+    [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1)])
+
+# squares attacked by a pawn of the given color standing on a square
+PAWN_ATTACKS = (_offsets_table([(-1, 1), (1, 1)]),
+                _offsets_table([(-1, -1), (1, -1)]))
+
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, 1), (1, 1), (1, -1), (-1, -1)]
+
+
+def _ray(sq, di, dj):
+    i, j = SQUARE_COORDS[sq]
+    x, y, ray = i + di, j + dj, []
+    while 0 <= x < 8 and 0 <= y < 8:
+        ray.append(y * 8 + x)
+        x += di
+        y += dj
+    return ray
+
+
+def _sliding_table(directions):
+    """For each square, returns the mask of the relevant blockers and a dict
+       giving the attacked squares for every possible occupancy of that mask.
+    """
+    masks, tables = [], []
+    for sq in range(64):
+        # attacks along each ray only depend on the blockers on that ray, so
+        # they are computed per ray first, then combined
+        rays = []
+        for di, dj in directions:
+            ray = _ray(sq, di, dj)
+            # the last square of a ray never blocks anything
+            raymask = sum(1 << s for s in ray[:-1])
+            attacks = {}
+            occ = 0
+            while True:
+                bb = 0
+                for s in ray:
+                    bb |= 1 << s
+                    if occ >> s & 1:
+                        break
+                attacks[occ] = bb
+                occ = (occ - raymask) & raymask
+                if occ == 0:
+                    break
+            rays.append((raymask, attacks))
+        mask = 0
+        for raymask, _ in rays:
+            mask |= raymask
+        (m1, t1), (m2, t2), (m3, t3), (m4, t4) = rays
+        table = {}
+        occ = 0
+        while True:
+            table[occ] = t1[occ & m1] | t2[occ & m2] | t3[occ & m3] | t4[occ & m4]
+            occ = (occ - mask) & mask
+            if occ == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return tuple(masks), tuple(tables)
+
+
+# usage : ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
+ROOK_MASKS, ROOK_TABLE = _sliding_table(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLE = _sliding_table(BISHOP_DIRECTIONS)
+
+
+def rook_attacks(sq, occupied):
+    return ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq, occupied):
+    return BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+
+
+def queen_attacks(sq, occupied):
+    return ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]] | BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+
+
+# castling rights that remain after a piece moves from or to a square
+CASTLING_MASKS = [0xF] * 64
+CASTLING_MASKS[4] = 0xF & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[7] = 0xF & ~WHITE_KINGSIDE
+CASTLING_MASKS[0] = 0xF & ~WHITE_QUEENSIDE
+CASTLING_MASKS[60] = 0xF & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASKS[63] = 0xF & ~BLACK_KINGSIDE
+CASTLING_MASKS[56] = 0xF & ~BLACK_QUEENSIDE
+CASTLING_MASKS = tuple(CASTLING_MASKS)
+
+
+def _lines():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for di, dj in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            ray = _ray(sq, di, dj)
+            full = (1 << sq) | sum(1 << s for s in ray) | sum(1 << s for s in _ray(sq, -di, -dj))
+            bb = 0
+            for s in ray:
+                between[sq][s] = bb
+                line[sq][s] = full
+                bb |= 1 << s
+    return tuple(map(tuple, between)), tuple(map(tuple, line))
+
+
+# BETWEEN[a][b] : the cells strictly between a and b, LINE[a][b] : the whole line (rank, file
+# or diagonal) going through a and b. Both are empty when a and b are not aligned.
+BETWEEN, LINE = _lines()
@@ -0,0 +1,177 @@
+# -*- coding:utf-8 -*-
+"""Builds polyglot opening books from game collections.
+
+The positions of each game are counted as (zobrist key, move) pairs. The counts
+are kept in memory up to a given number of pairs ; past that, they are sorted and
+written to a temporary file (a run), and counting starts over. Once all the games
+are read, the runs are merged together (the counts of a pair found in several runs
+being added up), which gives the entries of the book, already sorted by key.
+
+The whole collection is thus read once, whatever its size, with bounded memory :
+
+>>> builder = BookBuilder()
+>>> builder.add_game(['e4', 'e5', 'Nf3'])
+>>> builder.add_game(['e4', 'c5'])
+>>> book = OpeningsBook()
+>>> builder.write('book.bin')
+>>> book.open('book.bin')
+>>> book.find_moves(BoardState())
+[(e2e4, 2)]
+>>> book.close()
+>>> os.remove('book.bin')
+"""
+import heapq
+import os
+import struct
+import tempfile
+
+from chess3 import BoardState, OpeningsBook, Move
+from chess3.pgn import read_games
+
+# key, move, count of a spilled entry
+RUN_ENTRY = struct.Struct('>QHQ')
+
+# king takes its own rook, as polyglot encodes castling
+POLYGLOT_CASTLING = {(4, 6): 7, (4, 2): 0, (60, 62): 63, (60, 58): 56}
+
+
+def polyglot_move(move):
+    """16-bits polyglot encoding of a move"""
+    rook = POLYGLOT_CASTLING.get((move.from_square, move.to_square))
+    if rook is not None and move.castling:
+        return Move(move.from_square, rook).code
+    return move.code
+
+
+class BookBuilder:
+
+    """Counts the moves played in each position of the games it is given, and writes them as a polyglot book.
+
+       max_ply : number of half-moves of each game that are looked at
+       max_entries : number of (position, move) counts kept in memory before spilling them to disk
+    """
+
+    def __init__(self, max_ply=30, max_entries=1000000, tmpdir=None):
+        self.max_ply = max_ply
+        self.max_entries = max_entries
+        self.tmpdir = tmpdir
+        self.games = 0
+        self._counts = {}
+        self._runs = []
+
+    def add_game(self, moves, board=None):
+        """Counts the moves of a game, given in SAN or as Move instances, from the given board (the initial
+           position by default). The game is cut at the first move that cannot be read."""
+        board = board or BoardState()
+        counts = self._counts
+        for ply, move in enumerate(moves):
+            if ply >= self.max_ply:
+                break
+            if not isinstance(move, Move):
+                move = board.find_move_from_san(move)
+                if move is None:
+                    break
+            entry = (board.zobrist_hash, polyglot_move(move))
+            counts[entry] = counts.get(entry, 0) + 1
+            board = board.apply_move(move)
+        self.games += 1
+        if len(counts) >= self.max_entries:
+            self._spill()
+
+    def _spill(self):
+        fd, path = tempfile.mkstemp(prefix='chess3-book-', suffix='.run', dir=self.tmpdir)
+        with os.fdopen(fd, 'wb') as f:
+            pack = RUN_ENTRY.pack
+            for (key, move), count in sorted(self._counts.items()):
+                f.write(pack(key, move, count))
+        self._runs.append(path)
+        self._counts = {}
+
+    @staticmethod
+    def _read_run(path):
+        size = RUN_ENTRY.size
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(size * 4096)
+                if not data:
+                    break
+                for entry in RUN_ENTRY.iter_unpack(data):
+                    yield entry
+
+    def entries(self, min_count=1):
+        """Yields the (key, move, weight) of the book, sorted by key, the heaviest moves first.
+           The temporary files are removed once it is over."""
+        runs = [self._read_run(path) for path in self._runs]
+        runs.append((key, move, count) for (key, move), count in sorted(self._counts.items()))
+        try:
+            position, last = [], None
+            for key, move, count in heapq.merge(*runs):
+                if last is not None and (key, move) == last[:2]:
+                    last = (key, move, last[2] + count)
+                    continue
+                if last is not None:
+                    position.append(last)
+                    if last[0] != key:
+                        for entry in self._weights(position, min_count):
+                            yield entry
+                        position = []
+                last = (key, move, count)
+            if last is not None:
+                position.append(last)
+                for entry in self._weights(position, min_count):
+                    yield entry
+        finally:
+            for path in self._runs:
+                os.remove(path)
+            self._runs = []
+
+    @staticmethod
+    def _weights(position, min_count):
+        # polyglot weights are 16-bits : the counts of a position are scaled down when needed
+        position = [entry for entry in position if entry[2] >= min_count]
+        if not position:
+            return []
+        heaviest = max(count for key, move, count in position)
+        scale = max(1., heaviest / 0xFFFF)
+        return sorted(((key, move, max(1, int(count / scale))) for key, move, count in position),
+                      key=lambda entry: -entry[2])
+
+    def write(self, filename, min_count=1):
+        """Writes the book, moves played less than min_count times are left out"""
+        entry = OpeningsBook.ENTRY
+        with open(filename, 'wb') as f:
+            for key, move, weight in self.entries(min_count):
+                f.write(entry.pack(key, move, weight, 0))
+
+
+def main(args):
+    """Entry point of `python -m chess3 book`"""
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(prog='python -m chess3 book',
+                                     description='builds a polyglot openings book from PGN files (which may be compressed)')
+    parser.add_argument('pgn', nargs='+', help='game collections')
+    parser.add_argument('-o', '--output', required=True, help='book file to write')
+    parser.add_argument('--max-ply', type=int, default=30,
+                        help='number of half-moves of each game to look at (default: 30)')
+    parser.add_argument('--min-count', type=int, default=1,
+                        help='leaves out the moves played fewer times (default: 1)')
+    parser.add_argument('--max-entries', type=int, default=1000000,
+                        help='counts kept in memory before spilling to disk (default: 1000000)')
+    parser.add_argument('--tmpdir', help='where to spill the counts (default: the system temp dir)')
+    options = parser.parse_args(args)
+
+    builder = BookBuilder(options.max_ply, options.max_entries, options.tmpdir)
+    start = time.time()
+    for filename in options.pgn:
+        # the moves are checked while being counted
+        for game in read_games(filename, validate=False):
+            try:
+                board = game.initial_board()
+            except Exception:
+                # a FEN header that cannot be read : the game is left out
+                continue
+            builder.add_game(game.moves, board)
+    builder.write(options.output, options.min_count)
+    print('%d games in %.2fs' % (builder.games, time.time() - start))
+    return 0
@@ -0,0 +1,122 @@
+# -*- coding:utf-8 -*-
+"""Material and piece-square tables used by BoardState.evaluate().
+
+The values (in centipawns) are the ones of Tomasz Michniewski's "simplified
+evaluation function", with an endgame flavour : the king is better in the center,
+passed pawns are worth more as they advance, and rooks and pawns gain some value.
+Both a middlegame and an endgame score are maintained, the evaluation blends
+them according to the material left on the board (tapered evaluation).
+
+MG[piece][sq] and EG[piece][sq] include the value of the piece, with the
+sign of its color (positive for whites), so that the score of a position is
+the sum of the entries of its pieces and can be updated move by move.
+"""
+
+# piece values, for the middlegame and the endgame
+MG_VALUES = (100, 320, 330, 500, 900, 0)
+EG_VALUES = (120, 300, 320, 530, 930, 0)
+
+# the weight of each kind of piece in the game phase : 24 is the whole material of
+# the initial position, 0 an endgame with kings and pawns only
+PHASE_WEIGHTS = (0, 1, 1, 2, 4, 0)
+PHASE_TOTAL = 24
+
+# tables as seen from white, from a8 to h1 (the way a board is printed)
+_PAWN = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0)
+
+_PAWN_ENDGAME = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    100, 100, 100, 100, 100, 100, 100, 100,
+    60, 60, 60, 60, 60, 60, 60, 60,
+    35, 35, 35, 35, 35, 35, 35, 35,
+    20, 20, 20, 20, 20, 20, 20, 20,
+    10, 10, 10, 10, 10, 10, 10, 10,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0)
+
+_KNIGHT = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50)
+
+_BISHOP = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20)
+
+_ROOK = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0)
+
+_QUEEN = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20)
+
+_KING = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20)
+
+_KING_ENDGAME = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50)
+
+
+def _tables(values, tables):
+    result = []
+    for color in (0, 1):
+        for kind in range(6):
+            table = []
+            for sq in range(64):
+                # a8 is the first entry of the tables, and a black piece sees the board upside down
+                row = sq ^ 56 if color == 0 else sq
+                value = values[kind] + tables[kind][row]
+                table.append(value if color == 0 else -value)
+            result.append(tuple(table))
+    return tuple(result)
+
+
+MG = _tables(MG_VALUES, (_PAWN, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING))
+EG = _tables(EG_VALUES, (_PAWN_ENDGAME, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING_ENDGAME))
+PHASE = PHASE_WEIGHTS * 2
@@ -0,0 +1,116 @@
+# -*- coding:utf-8 -*-
+"""Performance test (perft) : counts the leaves of the tree of legal moves.
+
+The counts for well-known positions are published, so that comparing them
+is the usual way to check a move generator, and timing them gives its speed.
+
+>>> perft(BoardState(), 3)
+8902
+"""
+import time
+
+from chess3 import BoardState
+
+# (name, FEN, node counts for depths 1, 2, 3 ...)
+# see https://www.chessprogramming.org/Perft_Results
+REFERENCE_POSITIONS = [
+    ('start', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     [20, 400, 8902, 197281, 4865609]),
+    # castling, en passant and promotions all over the place
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603]),
+    # discovered checks and pins along the en passant rank
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    # promotions, castling rights lost by captures
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def perft(board, depth, table=None):
+    """Number of move sequences of the given length from this board.
+
+       When a dict is given as table, the counts of the subtrees are stored in it, indexed
+       by Zobrist hash and depth, so that transpositions are only counted once.
+    """
+    if depth <= 0:
+        return 1
+    if depth == 1:
+        return sum(1 for _ in board.legal_moves())
+    if table is not None:
+        key = (board.zobrist_hash, depth)
+        nodes = table.get(key)
+        if nodes is not None:
+            return nodes
+    nodes = 0
+    for move in board.legal_moves():
+        nodes += perft(board.apply_move(move), depth - 1, table)
+    if table is not None:
+        table[key] = nodes
+    return nodes
+
+
+def divide(board, depth, table=None):
+    """Yields (move, nodes) for each legal move, which helps finding the move
+       where the counts differ from another move generator"""
+    for move in board.legal_moves():
+        yield move, perft(board.apply_move(move), depth - 1, table)
+
+
+def run_suite(max_depth=None, use_hash=False, respond=print):
+    """Runs perft on the reference positions, up to the given depth (the
+       depth of the published counts by default). Returns True if all the counts match."""
+    total, elapsed, ok = 0, 0., True
+    for name, fen, counts in REFERENCE_POSITIONS:
+        board = BoardState.from_FEN(fen)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            start = time.time()
+            nodes = perft(board, depth, {} if use_hash else None)
+            spent = time.time() - start
+            total += nodes
+            elapsed += spent
+            status = 'ok' if nodes == expected else 'FAILED (expected %d)' % expected
+            ok = ok and nodes == expected
+            respond('%-10s depth %d : %10d nodes %8.2fs %10d nps  %s' %
+                    (name, depth, nodes, spent, nodes / max(spent, 1e-6), status))
+    respond('total : %d nodes in %.2fs, %d nps' % (total, elapsed, total / max(elapsed, 1e-6)))
+    return ok
+
+
+def main(args):
+    """Entry point of `python -m chess3 perft`"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m chess3 perft',
+                                     description='counts the positions reachable in a number of moves')
+    parser.add_argument('fen', nargs='*',
+                        help='position to count from (the reference positions when omitted)')
+    parser.add_argument('-d', '--depth', type=int,
+                        help='number of half-moves (for the reference positions : the deepest to check)')
+    parser.add_argument('--divide', action='store_true',
+                        help='prints the count for each move of the position')
+    parser.add_argument('--hash', action='store_true',
+                        help='remembers the counts of the positions already visited')
+    options = parser.parse_args(args)
+
+    if not options.fen:
+        return 0 if run_suite(options.depth, options.hash) else 1
+
+    board = BoardState.from_FEN(' '.join(options.fen))
+    depth = options.depth or 1
+    table = {} if options.hash else None
+    start = time.time()
+    if options.divide:
+        nodes = 0
+        for move, n in divide(board, depth, table):
+            print('%s: %d' % (move.to_xboard_notation(), n))
+            nodes += n
+    else:
+        nodes = perft(board, depth, table)
+    spent = time.time() - start
+    print('nodes : %d, time : %.2fs, %d nps' % (nodes, spent, nodes / max(spent, 1e-6)))
+    return 0
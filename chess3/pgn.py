@@ -0,0 +1,253 @@
+# -*- coding:utf-8 -*-
+"""Reads and writes games in the PGN format, one game at a time.
+
+Files are read line by line, so that collections of any size can be processed,
+and may be compressed (gzip, bzip2 or xz, according to their extension).
+
+>>> import io
+>>> pgn = io.StringIO('[White "me"]\\n[Result "1-0"]\\n\\n1. e4 {best by test} e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0\\n')
+>>> game = next(read_games(pgn, boards=True))
+>>> game.headers['White'], game.moves[-1], game.result
+('me', 'Qxf7#', '1-0')
+>>> game.boards[-1].is_check() == CHECKMATE
+True
+"""
+import bz2
+import gzip
+import lzma
+import re
+
+from chess3 import BoardState, Move, CHECKMATE
+
+_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open, '.lzma': lzma.open}
+
+_HEADER = re.compile(r'\[\s*(\w+)\s*"((?:[^"\\]|\\.)*)"\s*\]')
+
+# comments, annotations, move numbers and results (variations are removed first)
+_NOT_A_MOVE = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+|\d+\.+|[?!]+|1-0|0-1|1/2-1/2|\*')
+_VARIATION = re.compile(r'\([^()]*\)')
+_RESULT = re.compile(r'(1-0|0-1|1/2-1/2|\*)\s*$')
+
+# the tags that come first, in that order, as the standard requires
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+
+def open_pgn(filename, mode='r'):
+    """Opens a PGN file as text, decompressing or compressing it according to its extension"""
+    for extension, opener in _OPENERS.items():
+        if filename.endswith(extension):
+            return opener(filename, mode + 't', encoding='utf-8', errors='replace')
+    return open(filename, mode, encoding='utf-8', errors='replace')
+
+
+class Game:
+
+    """A game read from a PGN file : its headers (in file order), its moves in SAN, its result, and the
+       boards after each move when they were asked for (boards[0] being the initial position).
+
+       error tells why the moves could not be replayed (an illegal move, a bad FEN header), None when they
+       could : the boards then stop before the move at fault."""
+
+    def __init__(self, headers=None, moves=None, result='*', boards=None, error=None):
+        self.headers = headers if headers is not None else {}
+        self.moves = moves if moves is not None else []
+        self.result = result
+        self.boards = boards
+        self.error = error
+
+    def initial_board(self):
+        fen = self.headers.get('FEN')
+        return BoardState.from_FEN(fen) if fen else BoardState()
+
+    def __repr__(self):
+        return '<Game %s - %s, %d moves, %s>' % (self.headers.get('White', '?'), self.headers.get('Black', '?'),
+                                                 len(self.moves), self.result)
+
+
+def _parse_movetext(text):
+    while '(' in text:
+        stripped = _VARIATION.sub(' ', text)
+        if stripped == text:  # unbalanced
+            break
+        text = stripped
+    result = _RESULT.search(text)
+    return _NOT_A_MOVE.sub(' ', text).split(), result.group(1) if result else '*'
+
+
+def _in_comment(line, inside):
+    """Whether a {...} comment is still open at the end of the line, given whether it was at its start"""
+    for char in line:
+        if inside:
+            inside = char != '}'
+        elif char == '{':
+            inside = True
+        elif char == ';':  # the rest of the line is a comment
+            break
+    return inside
+
+
+def _game(headers, movetext, boards, validate):
+    # joined by newlines : a ';' comment ends with its line
+    moves, result = _parse_movetext('\n'.join(movetext))
+    game = Game(headers, moves, headers.get('Result', result))
+    if validate or boards:
+        played = []
+        try:
+            board = game.initial_board()
+            played.append(board)
+            for san in moves:
+                move = board.find_move_from_san(san)
+                if move is None:
+                    game.error = 'illegal move %s' % san
+                    break
+                board = board.apply_move(move)
+                played.append(board)
+        except Exception as e:
+            game.error = 'cannot replay the moves: %s' % e
+        if boards:
+            game.boards = played
+    return game
+
+
+def read_games(source, boards=False, validate=True):
+    """Yields the games of a PGN file (a file name, or any iterable of lines).
+
+       With validate=False, the moves are not checked against the rules, which is much faster when the
+       text is all that matters. boards=True gives the BoardState after each move in game.boards.
+       A game whose moves cannot be replayed is still yielded, with the reason in game.error, and the
+       reading goes on with the next one.
+    """
+    if isinstance(source, str):
+        with open_pgn(source) as f:
+            for game in read_games(f, boards, validate):
+                yield game
+        return
+    headers, movetext = {}, []
+    # a line of a comment that spans several lines is never a header
+    inside = False
+    for line in source:
+        if inside:
+            inside = _in_comment(line, True)
+            movetext.append(line.strip())
+        elif line.startswith('['):
+            if movetext:
+                yield _game(headers, movetext, boards, validate)
+                headers, movetext = {}, []
+            match = _HEADER.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+        elif line.startswith('%'):  # escaped line
+            continue
+        else:
+            line = line.strip()
+            if line:
+                movetext.append(line)
+                inside = _in_comment(line, False)
+    if headers or movetext:
+        yield _game(headers, movetext, boards, validate)
+
+
+class PgnWriter:
+
+    """Writes games one after the other, to a file name (compressed according to its extension) or a
+       text file object. Lines of movetext are wrapped at 80 characters."""
+
+    def __init__(self, target, width=80):
+        self._owned = isinstance(target, str)
+        self._f = open_pgn(target, 'w') if self._owned else target
+        self.width = width
+
+    def write(self, game=None, headers=None, moves=None, result=None):
+        """Writes a Game, or the given headers, moves (in SAN or as Move instances) and result"""
+        if game is not None:
+            headers, moves, result = game.headers, game.moves, game.result
+        headers = dict(headers or {})
+        result = result or headers.get('Result', '*')
+        headers['Result'] = result
+        out = []
+        for tag in SEVEN_TAG_ROSTER:
+            out.append('[%s "%s"]\n' % (tag, _escape(headers.pop(tag, '?'))))
+        for tag, value in headers.items():
+            out.append('[%s "%s"]\n' % (tag, _escape(value)))
+        out.append('\n')
+        board = None
+        first = 1
+        if 'FEN' in headers:
+            board = BoardState.from_FEN(headers['FEN'])
+            first = board.moves
+        moves = list(moves or [])
+        if any(isinstance(move, Move) for move in moves):
+            moves = _san_moves(board or BoardState(), moves)
+        line = ''
+        black_first = board is not None and board.trait == 'b'
+        tokens = []
+        for index, san in enumerate(moves):
+            ply = index + (1 if black_first else 0)
+            if ply % 2 == 0:
+                tokens.append('%d.' % (first + ply // 2))
+            elif index == 0:
+                tokens.append('%d...' % first)
+            tokens.append(str(san))
+        tokens.append(result)
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > self.width:
+                out.append(line + '\n')
+                line = token
+            else:
+                line = line + ' ' + token if line else token
+        out.append(line + '\n\n')
+        self._f.write(''.join(out))
+
+    def close(self):
+        if self._owned:
+            self._f.close()
+        else:
+            self._f.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _san_moves(board, moves):
+    sans = []
+    for move in moves:
+        if not isinstance(move, Move):
+            move = board.find_move_from_san(move)
+            if move is None:
+                raise ValueError('illegal move %s' % moves[len(sans)])
+        sans.append(board.to_san(move))
+        board = board.apply_move(move)
+    return sans
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def main(args):
+    """Entry point of `python -m chess3 pgn` : reads PGN files and tells how fast it went"""
+    import argparse
+    import os
+    import time
+    parser = argparse.ArgumentParser(prog='python -m chess3 pgn',
+                                     description='reads PGN files (which may be compressed), reports the throughput')
+    parser.add_argument('pgn', nargs='+', help='game collections')
+    parser.add_argument('--fast', action='store_true', help='does not check the moves')
+    parser.add_argument('--boards', action='store_true', help='also builds the boards of each game')
+    options = parser.parse_args(args)
+
+    games, errors, size, start = 0, 0, 0, time.time()
+    for filename in options.pgn:
+        size += os.path.getsize(filename)
+        for game in read_games(filename, boards=options.boards, validate=not options.fast):
+            games += 1
+            if game.error:
+                errors += 1
+                print('%s: %r: %s' % (filename, game, game.error))
+    spent = max(time.time() - start, 1e-6)
+    print('%d games (%d with errors), %.1f MB in %.2fs : %d games/s, %.1f MB/s' %
+          (games, errors, size / 1e6, spent, games / spent, size / 1e6 / spent))
+    return 0
@@ -0,0 +1,340 @@
+# -*- coding:utf-8 -*-
+"""Lazy SMP : several processes search the same position, sharing one transposition table.
+
+There is no coordination between the searches apart from the table : each worker
+runs its own iterative deepening, the helpers looking at the moves in another
+order and half of them one ply deeper, so that they fill the table with the
+positions the others will meet. The result of the deepest completed search wins.
+
+The table lives in a multiprocessing.shared_memory block (python 3.8+). It takes
+no lock : each slot holds the packed entry and the key xor-ed with it, so that a
+slot that was being written by another process while being read does not match
+the key and is ignored.
+"""
+import sys
+from array import array
+
+from chess3 import (BoardState, SearchBoard, SearchControl, SearchTimeout, MoveOrdering,
+                    negamax_alphabeta)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# iterations of the main search kept until the process that runs the search reads them
+REPORT_SLOTS = 64
+
+# workers that report their number of nodes (the others share their slots)
+NODE_SLOTS = 64
+
+# bytes zeroed at once by SharedTranspositionTable.clear
+CLEAR_CHUNK = 1 << 20
+
+# scores are stored on 32 bits, the extreme values standing for +/- sys.maxsize
+SCORE_LIMIT = 2 ** 31 - 1
+
+
+class SharedTranspositionTable:
+
+    """A TranspositionTable (same probe/store interface and replacement policies) whose slots are
+       held in shared memory, so that it can be used by several processes at once.
+
+       The process that creates it owns the memory and must close() it. The table is pickled as the
+       name of the shared memory block, the other processes attach to it when unpickling. Their
+       resource tracker should be the one of the owner (i.e multiprocessing.resource_tracker
+       was running before the pool was started), or the block is destroyed when they exit.
+    """
+
+    # two 64-bits words per slot
+    ENTRY_SIZE = 16
+
+    def __init__(self, megabytes=16, policy='depth', name=None, size=None):
+        if shared_memory is None:
+            raise RuntimeError('a shared transposition table needs python 3.8+')
+        if policy not in ('depth', 'always'):
+            raise ValueError('unknown replacement policy: ' + str(policy))
+        self.policy = policy
+        if name is None:
+            self.size = max(1, megabytes * 1024 * 1024 // self.ENTRY_SIZE)
+            # the slots, the generation, the stop flag, the number of iterations of the main search followed by
+            # the last ones (depth, score, move, nodes), and the nodes searched so far by each worker
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=(2 * self.size + 3 + 4 * REPORT_SLOTS + NODE_SLOTS) * 8)
+            self._owner = True
+        else:
+            self.size = size
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        # a new block of shared memory is filled with zeros, i.e empty slots
+        self._words = self._shm.buf.cast('Q')
+
+    def __reduce__(self):
+        return _attach, (self._shm.name, self.size, self.policy)
+
+    @property
+    def generation(self):
+        return self._words[2 * self.size]
+
+    def new_search(self):
+        """Marks the current entries as coming from an older search"""
+        self._words[2 * self.size] = (self.generation + 1) & 63
+
+    def clear(self):
+        # zeroed in place, a chunk at a time, rather than through a copy of the whole table
+        buf = self._shm.buf
+        zeros = bytes(min(len(buf), CLEAR_CHUNK))
+        for start in range(0, len(buf), CLEAR_CHUNK):
+            end = min(start + CLEAR_CHUNK, len(buf))
+            buf[start:end] = zeros[:end - start]
+
+    @property
+    def stopped(self):
+        """Set by the process that wants all the searches using the table to stop"""
+        return self._words[2 * self.size + 1] != 0
+
+    @stopped.setter
+    def stopped(self, value):
+        self._words[2 * self.size + 1] = int(bool(value))
+
+    def clear_report(self):
+        """Forgets the iterations and the nodes reported by a previous search"""
+        start = 2 * self.size + 2
+        for index in range(start, start + 1 + 4 * REPORT_SLOTS + NODE_SLOTS):
+            self._words[index] = 0
+
+    def report(self, depth, score, code):
+        """Called by the main search at the end of each iteration"""
+        words, start = self._words, 2 * self.size + 2
+        nodes = start + 1 + 4 * REPORT_SLOTS
+        row = start + 1 + 4 * (words[start] % REPORT_SLOTS)
+        words[row:row + 4] = array('Q', (depth, score & MASK64, code, sum(words[nodes:nodes + NODE_SLOTS])))
+        # counted last : the reader knows that the row is complete once it changes
+        words[start] += 1
+
+    def report_nodes(self, index, nodes):
+        """Called by each worker from time to time, with the number of nodes it searched so far"""
+        self._words[2 * self.size + 3 + 4 * REPORT_SLOTS + index % NODE_SLOTS] = nodes
+
+    def reports(self, first=0):
+        """The number of iterations reported by the main search so far, and the (depth, score, move code,
+           nodes of all the workers) of the ones after the first given"""
+        words, start = self._words, 2 * self.size + 2
+        count = words[start]
+        rows = []
+        # the oldest row may be being overwritten by the next iteration
+        for index in range(max(first, count - REPORT_SLOTS + 1), count):
+            row = start + 1 + 4 * (index % REPORT_SLOTS)
+            depth, score, code, nodes = words[row:row + 4]
+            rows.append((depth, score - (1 << 64) if score >> 63 else score, code, nodes))
+        return count, rows
+
+    def probe(self, key):
+        words = self._words
+        index = 2 * (key % self.size)
+        data = words[index + 1]
+        if words[index] ^ data != key or not data:
+            return None
+        score = (data & 0xFFFFFFFF) - 2 ** 31
+        if score == SCORE_LIMIT:
+            score = sys.maxsize
+        elif score == -SCORE_LIMIT:
+            score = -sys.maxsize
+        return (key, data >> 32 & 0xFF, score, data >> 40 & 3,
+                data >> 48 or None, data >> 42 & 63)
+
+    def store(self, key, depth, score, bound, move=None):
+        words = self._words
+        index = 2 * (key % self.size)
+        generation = self.generation
+        old = words[index + 1]
+        if old and self.policy == 'depth' and words[index] ^ old != key \
+                and old >> 42 & 63 == generation and depth < old >> 32 & 0xFF:
+            return
+        score = max(-SCORE_LIMIT, min(SCORE_LIMIT, score))
+        data = ((score + 2 ** 31) | min(depth, 0xFF) << 32 | bound << 40
+                | generation << 42 | (move or 0) << 48)
+        words[index] = (key ^ data) & MASK64
+        words[index + 1] = data
+
+    def close(self):
+        """Detaches from the shared memory, and frees it when called by its owner"""
+        self._words.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+# the table attached by the current process (a worker) : only the last one is kept, the table of a
+# previous search or the one replaced by a resize is closed when another one comes
+_attached = None
+
+
+def _attach(name, size, policy):
+    global _attached
+    if _attached is not None:
+        if _attached._shm.name == name:
+            return _attached
+        _attached.close()
+        _attached = None
+    _attached = SharedTranspositionTable(policy=policy, name=name, size=size)
+    return _attached
+
+
+class _SharedControl(SearchControl):
+
+    """Also stops the search when another process sets the stop flag of the table, and reports the number
+       of nodes searched through the table"""
+
+    def __init__(self, table, index, deadline=None, max_nodes=None):
+        SearchControl.__init__(self, deadline, max_nodes)
+        self.table = table
+        self.index = index
+
+    def check(self, quiescence=False):
+        SearchControl.check(self, quiescence)
+        if not self.nodes & 63:
+            if self.table.stopped:
+                raise SearchTimeout()
+            if not self.nodes & 1023:
+                self.table.report_nodes(self.index, self.nodes)
+
+
+def _root_search(board, moves, depth, table, control, ordering, options):
+    """The best (score, move), and whether all the moves were searched : when the search is stopped, the
+       best of the moves searched so far is returned, SearchTimeout is raised when there is none"""
+    a, b = -sys.maxsize, sys.maxsize
+    bestmove = None
+    for move in moves:
+        board.push(move)
+        try:
+            score = -negamax_alphabeta(board, -b, -a, depth, table, control, ordering, options)
+        except SearchTimeout:
+            if bestmove is None:
+                raise
+            return a, bestmove, False
+        finally:
+            board.pop()
+        if bestmove is None or score > a:
+            a, bestmove = score, move
+    return a, bestmove, True
+
+
+def _evaluate_after(board, move):
+    """The evaluation of the position after the move, for the side that is to play then"""
+    board.push(move)
+    try:
+        return board.evaluate()
+    finally:
+        board.pop()
+
+
+def _search(args):
+    """Runs in a worker : iterative deepening until the depth is reached or the search is stopped.
+       Returns the (depth, score, move code) of the last completed iteration, and the counters of the search.
+       When not even the first iteration was completed, the depth is -1 and the move is the best of the
+       moves searched (None when there is none)."""
+    fen, table, index, depth, deadline, max_nodes, options = args
+    board = SearchBoard(BoardState.from_FEN(fen))
+    control = _SharedControl(table, index, deadline, max_nodes)
+    ordering = MoveOrdering()
+    moves = list(board.legal_moves())
+    # the first iteration, which may not be completed, starts with the moves that look best
+    moves.sort(key=lambda move: _evaluate_after(board, move))
+    if index:
+        shift = index % len(moves)
+        moves = moves[shift:] + moves[:shift]
+    result = (-1, None, None)
+    try:
+        for d in range(index & 1, depth + 1 + (index & 1)):
+            score, move, complete = _root_search(board, moves, d, table, control, ordering, options)
+            if not complete:
+                if result[0] < 0:
+                    result = (-1, score, move.code)
+                break
+            result = (d, score, move.code)
+            if index == 0:
+                table.report_nodes(index, control.nodes)
+                table.report(d, score, move.code)
+            moves.remove(move)
+            moves.insert(0, move)
+    except SearchTimeout:
+        pass
+    if index == 0:
+        # the main search is over, the helpers are of no use anymore
+        table.stopped = True
+    return result + (control.counters(),)
+
+
+def lazy_smp_search(board, process_pool, workers, depth, table=None, deadline=None, max_nodes=None, control=None,
+                    stats=None, options=None, on_depth=None):
+    """Searches the board with as many workers of the pool, returns the best move found, or None.
+
+       The table may be kept from one move to the next, a temporary one is used when it is None.
+       The nodes budget is shared between the workers. When a SearchControl is given, its budget
+       is used, and the workers are stopped as soon as its stop() method is called. The counters of
+       the workers are added to it, and the depth and score of the search are set in stats, if given.
+       options (a SearchOptions) is passed on to the searches of the workers.
+
+       The main worker reports each iteration it completes through the table : when a control and stats are
+       given, the iteration is recorded in stats (the nodes being those of all the workers so far), and
+       on_depth(stats) is called, if given.
+    """
+    legal = {move.code: move for move in board.legal_moves()}
+    if not legal:
+        return None
+    if control is not None:
+        deadline, max_nodes = control.deadline, control.max_nodes
+    owned = table is None
+    if owned:
+        table = SharedTranspositionTable()
+    reporting = control is not None and stats is not None
+    nodes = control.nodes if control is not None else 0
+    reported = 0
+
+    def report():
+        # records the iterations completed by the main worker since the last call
+        count, rows = table.reports(reported)
+        for d, score, code, searched in rows:
+            control.nodes = nodes + searched
+            stats.iteration(d, score, legal[code], control)
+            if on_depth is not None:
+                on_depth(stats)
+        return count
+
+    try:
+        table.new_search()
+        table.clear_report()
+        table.stopped = False
+        share = None if max_nodes is None else max(1, max_nodes // workers)
+        fen = board.to_FEN()
+        pending = process_pool.map_async(
+            _search, [(fen, table, index, depth, deadline, share, options) for index in range(workers)])
+        while not pending.ready():
+            pending.wait(0.05)
+            if control is not None and control.expired():
+                table.stopped = True
+            if reporting:
+                reported = report()
+        results = pending.get()
+        if reporting:
+            report()
+    finally:
+        if owned:
+            table.close()
+    # the deepest search wins, the main one when several reached the same depth
+    if control is not None:
+        # the nodes reported along the way are replaced by the exact counts
+        control.nodes = nodes
+        for d, score, code, counters in results:
+            control.add(counters)
+    d, index, score, code = max((d, -index, score, code)
+                                for index, (d, score, code, counters) in enumerate(results))
+    if stats is not None and d >= 0:
+        stats.depth, stats.score = d, score
+    if code is None:
+        # no move was searched at all : the one that leads to the best position, as evaluated
+        return min(legal.values(), key=lambda move: board.apply_move(move).evaluate())
+    return legal[code]
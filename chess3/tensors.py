@@ -0,0 +1,111 @@
+# -*- coding:utf-8 -*-
+"""Conversion of positions to NumPy arrays, for machine learning pipelines (needs numpy).
+
+Each position gives :
+
+* 12 planes of 8x8 cells, one per piece (color * 6 + kind, as in chess3.bitboard), indexed by
+  [piece, rank, file] so that a1 is [0, 0] and h8 is [7, 7]
+* 13 features : the side to move (1 for whites), the four castling rights (in the order of the
+  polyglot keys : white kingside, white queenside, black kingside, black queenside), and the
+  file of the en-passant cell, one-hot encoded
+* optionally, a 64x64 mask of the legal moves, indexed by [from cell, to cell] (the four
+  promotions of a pawn share the same entry)
+
+The positions are read by chunks, so that memory stays bounded whatever their number, and
+the chunks may be encoded by the workers of a process pool :
+
+>>> planes = numpy.zeros((2, PLANES, 8, 8), dtype=numpy.float32)
+>>> features = numpy.zeros((2, FEATURES), dtype=numpy.float32)
+>>> masks = numpy.zeros((2, 64, 64), dtype=numpy.uint8)
+>>> encode([BoardState(), '4k3/8/8/8/8/8/8/4K2R b K - 0 1'], planes, features, masks)
+2
+>>> float(planes[0, KING, 0, 4]), features[1, :5].tolist(), int(masks[0].sum())
+(1.0, [0.0, 1.0, 0.0, 0.0, 0.0], 20)
+"""
+import collections
+import itertools
+
+from chess3 import BoardState
+from chess3.bitboard import KING, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+PLANES = 12
+FEATURES = 13
+
+_CASTLING_FLAGS = (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)
+
+
+def _encode_chunk(args):
+    """Encodes a list of boards (or FEN strings), returns the (planes, features, masks) arrays"""
+    boards, with_masks = args
+    n = len(boards)
+    bitboards = numpy.empty((n, PLANES), dtype='<u8')
+    features = numpy.zeros((n, FEATURES), dtype=numpy.uint8)
+    positions, origins, targets = [], [], []
+    for index, board in enumerate(boards):
+        if isinstance(board, str):
+            board = BoardState.from_FEN(board)
+        bitboards[index] = board._bb
+        row = features[index]
+        row[0] = board.trait == 'w'
+        for flag, castling in enumerate(_CASTLING_FLAGS):
+            row[1 + flag] = bool(board.castling & castling)
+        if board._ep is not None:
+            row[5 + (board._ep & 7)] = 1
+        if with_masks:
+            for move in board.legal_moves():
+                positions.append(index)
+                origins.append(move.from_square)
+                targets.append(move.to_square)
+    # the bytes of a bitboard are its ranks, from the first one, and its bits the files
+    planes = numpy.unpackbits(bitboards.view(numpy.uint8), axis=1, bitorder='little').reshape(n, PLANES, 8, 8)
+    masks = None
+    if with_masks:
+        masks = numpy.zeros((n, 64, 64), dtype=numpy.uint8)
+        masks[positions, origins, targets] = 1
+    return planes, features, masks
+
+
+def batches(boards, chunksize=1024, masks=False, process_pool=None, prefetch=8):
+    """Yields the (planes, features, masks) arrays of each chunk of boards (or FEN strings), in order.
+       masks is None unless asked for.
+
+       With a process pool, at most `prefetch` chunks are being encoded at once.
+    """
+    if numpy is None:
+        raise RuntimeError('chess3.tensors needs numpy')
+    boards = iter(boards)
+    chunks = iter(lambda: list(itertools.islice(boards, chunksize)), [])
+    if process_pool is None:
+        for chunk in chunks:
+            yield _encode_chunk((chunk, masks))
+        return
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(process_pool.apply_async(_encode_chunk, ((chunk, masks),)))
+        if len(pending) >= prefetch:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def encode(boards, planes, features, masks=None, chunksize=1024, process_pool=None):
+    """Fills preallocated arrays of shapes (N, 12, 8, 8), (N, 13) and (N, 64, 64) (the latter being
+       optional) from boards or FEN strings, returns the number of positions written.
+       The arrays may be of any numeric dtype. A ValueError is raised when there are more than N boards.
+    """
+    start = 0
+    for chunk_planes, chunk_features, chunk_masks in batches(boards, chunksize, masks is not None, process_pool):
+        stop = start + len(chunk_planes)
+        if stop > len(planes):
+            raise ValueError('more than %d boards' % len(planes))
+        planes[start:stop] = chunk_planes
+        features[start:stop] = chunk_features
+        if masks is not None:
+            masks[start:stop] = chunk_masks
+        start = stop
+    return start
@@ -20,5 +20,6 @@ setuptools.setup(
         "Topic :: Games/Entertainment"
       ],
       python_requires='>=3.6',
+      extras_require={'numpy': ['numpy>=1.17']},
 )
 
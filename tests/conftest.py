@@ -0,0 +1,64 @@
+# -*- coding:utf-8 -*-
+"""Runs the xboard and UCI loops in a thread, fed from a queue, for the tests of the protocols."""
+import queue
+import threading
+import time
+
+import pytest
+
+
+class _Output:
+
+    """Collects the lines written by the engine, so that a test may wait for one"""
+
+    def __init__(self):
+        self.lines = []
+        self._text = ''
+        self._changed = threading.Condition()
+
+    def write(self, text):
+        with self._changed:
+            self._text += text
+            *lines, self._text = self._text.split('\n')
+            self.lines.extend(lines)
+            self._changed.notify_all()
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def expect(self, prefix, timeout=10):
+        """The first line that starts with prefix (or for which it returns True), written since the last call"""
+        match = prefix if callable(prefix) else lambda line: line.startswith(prefix)
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                for index, line in enumerate(self.lines):
+                    if match(line):
+                        del self.lines[:index + 1]
+                        return line
+                if not self._changed.wait(max(0., deadline - time.time())):
+                    raise AssertionError('no %r in %r' % (prefix, self.lines))
+
+
+@pytest.fixture
+def protocol():
+    """protocol(loop) starts the loop (xboard_game or uci_game), returns send(command) and its _Output.
+       The loops are sent 'quit' at the end of the test, and must be over soon after."""
+    threads = []
+
+    def start(loop):
+        commands = queue.Queue()
+        output = _Output()
+        thread = threading.Thread(target=loop, args=(commands.get, output), daemon=True)
+        thread.start()
+        threads.append((commands, thread))
+        return commands.put, output
+
+    yield start
+    for commands, thread in threads:
+        commands.put('quit')
+        thread.join(10)
+        assert not thread.is_alive()
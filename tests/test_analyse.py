@@ -0,0 +1,31 @@
+# -*- coding:utf-8 -*-
+"""A result taken from the cache tells the depth it was found at, and the positions of the openings book are
+searched like the others."""
+from chess3 import BoardState, Move, OpeningsBook, openingsBook
+from chess3.analyse import AnalysisCache, analyse
+
+
+def test_cache_hit_tells_the_stored_depth(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.db'))
+    board = BoardState()
+    cache.put(board, 3, {'bestmove': 'e2e4'})
+    assert cache.get(board, 2) == {'bestmove': 'e2e4', 'depth': 3}
+    assert cache.get(board, 3)['depth'] == 3
+    assert cache.get(board, 4) is None
+    cache.close()
+
+
+def test_positions_of_the_book_are_searched(tmp_path):
+    board = BoardState()
+    path = str(tmp_path / 'book.bin')
+    with open(path, 'wb') as f:
+        f.write(OpeningsBook.ENTRY.pack(board.zobrist_hash, Move(8, 16).code, 1, 0))
+    openingsBook.open(path)
+    try:
+        assert openingsBook.find_best_move(board) is not None
+        result, = analyse([{'fen': board.to_FEN(), 'id': 1, 'depth': 2}])
+    finally:
+        openingsBook.close()
+    assert 'error' not in result
+    assert result['score'] is not None
+    assert result['bestmove'] != 'a2a3'
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+"""The attack maps, computed once per position, agree with the attackers looked for cell by cell."""
+import random
+
+from chess3 import BLACK, BoardState, SearchBoard, TEAM_BLACKS, TEAM_WHITES, WHITE
+from chess3.perft import REFERENCE_POSITIONS
+
+
+def _boards(plies=40, seed=5):
+    """Boards met along a random game from each reference position"""
+    rng = random.Random(seed)
+    for name, fen, counts in REFERENCE_POSITIONS:
+        board = BoardState.from_FEN(fen)
+        for _ in range(plies):
+            yield board
+            moves = list(board.legal_moves())
+            if not moves:
+                break
+            board = board.apply_move(rng.choice(moves))
+
+
+def _scanned(board, color):
+    """The attack map, from the attackers of each of the 64 cells"""
+    occupied = board._colors[0] | board._colors[1]
+    return sum(1 << sq for sq in range(64) if board._attackers(sq, color, occupied))
+
+
+def test_maps():
+    for board in _boards():
+        for color in (WHITE, BLACK):
+            assert board._attacks(color) == _scanned(board, color), (board.to_FEN(), color)
+
+
+def test_queries():
+    for board in _boards():
+        for team, color in ((TEAM_WHITES, WHITE), (TEAM_BLACKS, BLACK)):
+            attacked = _scanned(board, color)
+            own = board._colors[color]
+            assert board.count_controlled_cells(team) == bin(attacked & ~own).count('1')
+            threats = own & _scanned(board, color ^ 1)
+            # file by file
+            under_attack = [(i, j) for i in range(8) for j in range(8) if threats >> (j * 8 + i) & 1]
+            assert list(board.cells_under_attack(team)) == under_attack
+            for i, j in under_attack:
+                attacker, (x, y) = board.is_under_attack(i, j, team)
+                assert board._colors[color ^ 1] >> (y * 8 + x) & 1
+
+
+def test_check_with_and_without_maps():
+    for board in _boards():
+        fresh = BoardState.from_FEN(board.to_FEN())
+        # the lines through the king only, then the map
+        in_check = fresh.in_check()
+        fresh._attacks(WHITE), fresh._attacks(BLACK)
+        assert fresh.in_check() == in_check
+        assert bool(fresh.is_check()) == in_check
+
+
+def test_cached_once_per_position():
+    board = BoardState()
+    assert board._attack_maps is None
+    board.count_controlled_cells(TEAM_WHITES)
+    assert board._attack_maps[WHITE] is not None and board._attack_maps[BLACK] is None
+    maps = board._attack_maps
+    list(board.cells_under_attack(TEAM_BLACKS))
+    assert board._attack_maps is maps
+    # the next position computes its own
+    after = board.apply_move(board.find_move_from_san('e4'))
+    assert after._attack_maps is None
+    assert after._attacks(WHITE) != board._attacks(WHITE)
+
+
+def test_search_board_forgets_the_maps():
+    board = BoardState.from_FEN(REFERENCE_POSITIONS[1][1])
+    search_board = SearchBoard(board)
+    before = search_board._attacks(WHITE), search_board._attacks(BLACK)
+    for move in list(board.legal_moves())[:10]:
+        search_board.push(move)
+        after = board.apply_move(move)
+        assert (search_board._attacks(WHITE), search_board._attacks(BLACK)) == (
+            _scanned(after, WHITE), _scanned(after, BLACK))
+        search_board.pop()
+        assert (search_board._attacks(WHITE), search_board._attacks(BLACK)) == before
@@ -0,0 +1,43 @@
+# -*- coding:utf-8 -*-
+"""Polyglot books : castling is decoded from the board, and moves that are not legal are left out."""
+import pytest
+
+from chess3 import BoardState, Move, OpeningsBook
+
+
+def _write_book(path, board, moves):
+    with open(path, 'wb') as f:
+        for code, weight in moves:
+            f.write(OpeningsBook.ENTRY.pack(board.zobrist_hash, code, weight, 0))
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+def test_castling_and_illegal_moves(tmp_path, mapped):
+    # the king may castle, and a rook stands on h1 next to it once f1 and g1 are empty
+    board = BoardState.from_FEN('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    e1h1 = Move(4, 7).code
+    a1h8 = Move(0, 63).code
+    a1a8 = Move(0, 56).code
+    path = str(tmp_path / 'book.bin')
+    _write_book(path, board, [(e1h1, 10), (a1h8, 20), (a1a8, 5)])
+    book = OpeningsBook()
+    if mapped:
+        book.open(path)
+    else:
+        book.read(path)
+    try:
+        moves = book.find_moves(board)
+    finally:
+        book.close()
+    if mapped:
+        assert [(m.to_xboard_notation(), m.castling, w) for m, w in moves] == [('e1g1', True, 10), ('a1a8', False, 5)]
+    else:
+        # read() only keeps the heaviest move of each position, which is not legal here
+        assert moves == []
+
+
+def test_rook_move_is_not_castling():
+    # no king on e1 : a rook going from e1 to h1 is not castling
+    board = BoardState.from_FEN('4k3/8/8/8/8/8/8/4R1K1 w - - 0 1')
+    move = Move.from_polyglot(Move(4, 7).code, board.team, board)
+    assert not move.castling and move.to_square == 7
@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+"""The book builder : the counts spilled to disk and merged back are the ones kept in memory."""
+import os
+
+from chess3 import BoardState, Move, OpeningsBook
+from chess3.book import BookBuilder, main, polyglot_move
+
+GAMES = [
+    ['e4', 'e5', 'Nf3', 'Nc6', 'Bc4', 'Nf6', 'O-O'],
+    ['e4', 'c5', 'Nf3', 'd6'],
+    ['d4', 'd5', 'c4'],
+    ['e4', 'e5', 'Nf3', 'Nf6'],
+    ['e4', 'e5', 'Nc3'],
+]
+
+
+def _build(**kwargs):
+    builder = BookBuilder(**kwargs)
+    for moves in GAMES:
+        builder.add_game(moves)
+    return builder
+
+
+def test_spill_and_merge(tmp_path):
+    expected = list(_build().entries())
+    builder = _build(max_entries=1, tmpdir=str(tmp_path))
+    # one run per game
+    assert len(builder._runs) == len(GAMES)
+    assert list(builder.entries()) == expected
+    # the runs are removed once merged
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_entries():
+    entries = list(_build().entries())
+    keys = [key for key, move, weight in entries]
+    assert keys == sorted(keys)
+    start = BoardState().zobrist_hash
+    first = [(Move.from_code(move).to_xboard_notation(), weight) for key, move, weight in entries if key == start]
+    assert first == [('e2e4', 4), ('d2d4', 1)]
+    # min_count leaves out the moves played once
+    assert [weight for key, move, weight in _build().entries(min_count=2) if key == start] == [4]
+
+
+def test_castling_is_king_takes_rook():
+    board = BoardState.from_FEN('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    assert Move.from_code(polyglot_move(board.find_move_from_san('O-O'))).to_xboard_notation() == 'e1h1'
+    assert Move.from_code(polyglot_move(board.find_move_from_san('O-O-O'))).to_xboard_notation() == 'e1a1'
+    # a king that is not castling keeps its move
+    assert polyglot_move(board.find_move_from_san('Kf1')) == board.find_move_from_san('Kf1').code
+
+
+def test_weights_scaled_to_16_bits():
+    builder = BookBuilder()
+    builder._counts = {(1, 796): 200000, (1, 797): 100000, (2, 796): 3}
+    assert list(builder.entries()) == [(1, 796, 0xFFFF), (1, 797, 0xFFFF // 2), (2, 796, 3)]
+
+
+def test_written_book_is_read_back(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    _build(max_entries=2, tmpdir=str(tmp_path)).write(path)
+    book = OpeningsBook()
+    book.open(path)
+    try:
+        board = BoardState()
+        for san in GAMES[0][:6]:
+            board = board.apply_move(board.find_move_from_san(san))
+        moves = book.find_moves(board)
+    finally:
+        book.close()
+    assert [(move.to_xboard_notation(), move.castling, weight) for move, weight in moves] == [('e1g1', True, 1)]
+
+
+def test_main(tmp_path, capsys):
+    pgn = tmp_path / 'games.pgn'
+    pgn.write_text(''.join('[White "%d"]\n\n%s *\n\n' % (number, ' '.join(moves))
+                           for number, moves in enumerate(GAMES)))
+    path = str(tmp_path / 'book.bin')
+    assert main([str(pgn), '-o', path, '--max-entries', '1', '--tmpdir', str(tmp_path)]) == 0
+    assert '%d games' % len(GAMES) in capsys.readouterr().out
+    assert os.path.getsize(path) == OpeningsBook.ENTRY.size * len(list(_build().entries()))
@@ -0,0 +1,68 @@
+# -*- coding:utf-8 -*-
+"""The evaluation totals carried by the boards are the ones computed from scratch, and they are symmetric."""
+import random
+
+from chess3 import BoardState, SearchBoard
+from chess3.evaluation import EG_VALUES, MG_VALUES, PHASE_TOTAL
+from chess3.perft import REFERENCE_POSITIONS
+
+
+def _random_games(plies=80, games=3, seed=2):
+    """(board, move) along random games from each reference position, promotions and castlings included"""
+    rng = random.Random(seed)
+    for name, fen, counts in REFERENCE_POSITIONS:
+        for _ in range(games):
+            board = BoardState.from_FEN(fen)
+            for _ in range(plies):
+                moves = list(board.legal_moves())
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                yield board, move
+                board = board.apply_move(move)
+
+
+def _mirror(fen):
+    """The same position with the colors swapped, the board seen from the other side"""
+    placement, trait = fen.split()[:2]
+    rows = [row.swapcase() for row in reversed(placement.split('/'))]
+    return '%s %s - - 0 1' % ('/'.join(rows), 'b' if trait == 'w' else 'w')
+
+
+def test_initial_position():
+    board = BoardState()
+    assert board.evaluate() == 0
+    assert board._phase == PHASE_TOTAL
+
+
+def test_updated_by_apply_move():
+    for board, move in _random_games():
+        after = board.apply_move(move)
+        assert (after._mg, after._eg, after._phase) == after._compute_evaluation(), (board.to_FEN(), move)
+
+
+def test_updated_by_push_and_pop():
+    for board, move in _random_games(games=1):
+        search_board = SearchBoard(board)
+        before = search_board.evaluate()
+        search_board.push(move)
+        assert search_board.evaluate() == board.apply_move(move).evaluate()
+        search_board.pop()
+        assert search_board.evaluate() == before
+
+
+def test_symmetry():
+    for board, move in _random_games(games=1):
+        fen = ' '.join(board.to_FEN().split()[:2]) + ' - - 0 1'
+        assert BoardState.from_FEN(fen).evaluate() == BoardState.from_FEN(_mirror(fen)).evaluate(), fen
+
+
+def test_tapered():
+    # a queen up in the middlegame is worth its middlegame value, a pawn up in a pawn ending its endgame value
+    middlegame = BoardState.from_FEN('rnb1kbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    assert abs(middlegame.evaluate() - MG_VALUES[4]) < 50
+    ending = BoardState.from_FEN('4k3/8/8/8/8/8/P7/4K3 w - - 0 1')
+    assert ending._phase == 0
+    assert abs(ending.evaluate() - EG_VALUES[0]) < 50
+    # the side to play sees the score from its own side
+    assert BoardState.from_FEN('4k3/8/8/8/8/8/P7/4K3 b - - 0 1').evaluate() == -ending.evaluate()
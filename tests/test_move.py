@@ -0,0 +1,28 @@
+# -*- coding:utf-8 -*-
+"""Moves are told apart by their origin, target and promotion, when they are checked against the board too."""
+import pytest
+
+from chess3 import BoardState, Move
+
+PROMOTION = '4k3/P7/8/8/8/8/8/4K3 w - - 0 1'
+
+
+def test_code_round_trip():
+    board = BoardState.from_FEN(PROMOTION)
+    for move in board.legal_moves():
+        assert Move.from_code(move.code, board.team) == move
+        assert hash(Move.from_code(move.code, board.team)) == hash(move)
+
+
+@pytest.mark.parametrize('notation', ['a7a8q', 'a7a8n'])
+def test_legal_promotion(notation):
+    board = BoardState.from_FEN(PROMOTION)
+    after = board.apply_move(Move.from_xboard_notation(notation, board.team), check_legal=True)
+    assert after.to_FEN().split()[0] == notation[-1].upper() + '3k3/8/8/8/8/8/8/4K3'
+
+
+@pytest.mark.parametrize('notation', ['a7a8', 'e1d1q', 'a7b8q', 'e1e3'])
+def test_illegal_moves_are_rejected(notation):
+    board = BoardState.from_FEN(PROMOTION)
+    with pytest.raises(Exception):
+        board.apply_move(Move.from_xboard_notation(notation, board.team), check_legal=True)
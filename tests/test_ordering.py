@@ -0,0 +1,70 @@
+# -*- coding:utf-8 -*-
+"""Move ordering : the hash move, the captures by MVV-LVA, the killer moves, then the quiet moves by history."""
+from chess3 import (BoardState, MoveOrdering, SearchControl, SearchOptions, TranspositionTable,
+                    negamax_alphabeta)
+from chess3.bench import BENCH_POSITIONS
+
+# the pawn and the queen may both take the black queen, the queen may take the knight
+FEN = 'k7/8/8/3q4/4P3/5n2/8/K2Q4 w - - 0 1'
+
+
+def _notations(moves):
+    return [move.to_xboard_notation() for move in moves]
+
+
+def test_all_the_legal_moves():
+    board = BoardState.from_FEN(FEN)
+    assert sorted(_notations(MoveOrdering().order(board))) == sorted(_notations(board.legal_moves()))
+
+
+def test_captures_by_mvv_lva():
+    moves = MoveOrdering().order(BoardState.from_FEN(FEN))
+    # the most valuable victim first, by the least valuable attacker first
+    assert _notations(moves[:3]) == ['e4d5', 'd1d5', 'd1f3']
+    assert not any(move.capture for move in moves[3:])
+
+
+def test_hash_move_first():
+    board = BoardState.from_FEN(FEN)
+    quiet = board.find_move_from_san('Kb1')
+    assert MoveOrdering().order(board, quiet.code)[0] == quiet
+
+
+def test_captures_only():
+    board = BoardState.from_FEN(FEN)
+    assert all(move.capture or move.promotion for move in MoveOrdering().order(board, quiet=False))
+
+
+def test_killers_then_history():
+    board = BoardState.from_FEN(FEN)
+    ordering = MoveOrdering()
+    kb1, kb2, qd3 = (board.find_move_from_san(san) for san in ('Kb1', 'Kb2', 'Qd3'))
+    ordering.cutoff(board, qd3, 1)
+    ordering.cutoff(board, kb2, 2)
+    ordering.cutoff(board, kb1, 3)
+    # the last two are the killers of the ply, the most recent first, right after the captures
+    captures = sum(1 for move in board.legal_moves() if move.capture)
+    assert ordering.order(board)[captures:captures + 2] == [kb1, kb2]
+    # with the killers forgotten, the history scores (the depth squared) remain
+    ordering.killers = []
+    assert ordering.order(board)[captures:captures + 3] == [kb1, kb2, qd3]
+
+
+class _Unordered(MoveOrdering):
+
+    def order(self, board, hashmove=None, quiet=True):
+        return list(board.legal_moves(quiet))
+
+
+def test_ordering_saves_nodes():
+    board = BoardState.from_FEN(BENCH_POSITIONS[4])
+    options = SearchOptions(pvs=False, aspiration=False, null_move=False, lmr=False)
+    nodes, scores = [], []
+    for ordering in (MoveOrdering(), _Unordered()):
+        control = SearchControl()
+        scores.append(negamax_alphabeta(board, depth=3, transposition_table=TranspositionTable(), control=control,
+                                        ordering=ordering, options=options))
+        nodes.append(control.nodes)
+    assert scores[0] == scores[1]
+    # an order of magnitude
+    assert nodes[0] * 10 < nodes[1]
@@ -0,0 +1,102 @@
+# -*- coding:utf-8 -*-
+"""Regression gate for the move generator : perft counts of the reference positions, push/pop and
+zobrist keys of the search board, and SAN round trips."""
+import random
+
+import pytest
+
+from chess3 import BoardState, SearchBoard
+from chess3.perft import REFERENCE_POSITIONS, perft
+
+PERFT_DEPTH = 3
+
+
+@pytest.mark.parametrize('name, fen, counts', REFERENCE_POSITIONS, ids=[p[0] for p in REFERENCE_POSITIONS])
+def test_perft(name, fen, counts):
+    board = BoardState.from_FEN(fen)
+    for depth, expected in enumerate(counts[:PERFT_DEPTH], 1):
+        assert perft(board, depth) == expected, 'depth %d' % depth
+
+
+def test_perft_with_hash():
+    name, fen, counts = REFERENCE_POSITIONS[1]
+    assert perft(BoardState.from_FEN(fen), 3, {}) == counts[2]
+
+
+def _random_boards(plies=60, games=4, seed=1):
+    """Boards met along random games from each reference position"""
+    rng = random.Random(seed)
+    for name, fen, counts in REFERENCE_POSITIONS:
+        for _ in range(games):
+            board = BoardState.from_FEN(fen)
+            for _ in range(plies):
+                yield board
+                moves = list(board.legal_moves())
+                if not moves:
+                    break
+                board = board.apply_move(rng.choice(moves))
+
+
+def _state(board):
+    return (board.to_FEN(), board.zobrist_hash, list(board._bb), list(board._colors), list(board._mailbox),
+            board.castling, board._ep)
+
+
+def test_polyglot_key_of_the_initial_position():
+    assert BoardState().zobrist_hash == 0x463b96181691fc9c
+
+
+def test_zobrist_round_trip():
+    for board in _random_boards():
+        # the key maintained move after move is the one computed from scratch
+        assert board.zobrist_hash == BoardState.from_FEN(board.to_FEN()).zobrist_hash, board.to_FEN()
+
+
+def test_push_pop():
+    for board in _random_boards(games=2):
+        search_board = SearchBoard(board)
+        before = _state(search_board)
+        for move in board.legal_moves():
+            search_board.push(move)
+            assert _state(search_board)[:2] == _state(board.apply_move(move))[:2]
+            search_board.pop()
+            assert _state(search_board) == before
+
+
+def test_null_move():
+    for board in _random_boards(games=1):
+        search_board = SearchBoard(board)
+        before = _state(search_board)
+        search_board.push_null()
+        assert search_board.after_null
+        assert search_board.zobrist_hash == BoardState.from_FEN(search_board.snapshot().to_FEN()).zobrist_hash
+        search_board.pop_null()
+        assert _state(search_board) == before
+
+
+def test_san_round_trip():
+    for board in _random_boards(games=2):
+        moves = list(board.legal_moves())
+        sans = [board.to_san(move) for move in moves]
+        assert len(set(sans)) == len(sans), board.to_FEN()
+        for move, san in zip(moves, sans):
+            found = board.find_move_from_san(san)
+            assert found == move, (board.to_FEN(), san)
+            assert (found.capture, found.castling, found.enpassant, found.promotion) == \
+                (move.capture, move.castling, move.enpassant, move.promotion)
+
+
+@pytest.mark.parametrize('fen, san, expected', [
+    ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'O-O-O', 'e1c1'),
+    ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', 'exf6', 'e5f6'),
+    ('8/P7/8/8/8/8/6k1/K7 w - - 0 1', 'a8=Q+', 'a7a8q'),
+    ('4k3/8/8/8/8/8/8/R5RK w - - 0 1', 'Rad1', 'a1d1'),
+])
+def test_find_move_from_san(fen, san, expected):
+    assert BoardState.from_FEN(fen).find_move_from_san(san).to_xboard_notation() == expected
+
+
+def test_ambiguous_and_illegal_san():
+    board = BoardState.from_FEN('4k3/8/8/8/8/8/8/R5RK w - - 0 1')
+    assert board.find_move_from_san('Rd1') is None
+    assert board.find_move_from_san('Qd1') is None
@@ -0,0 +1,55 @@
+# -*- coding:utf-8 -*-
+"""A game that cannot be replayed does not end the reading of a PGN stream, and the comments do not hide
+moves or split games."""
+import io
+
+from chess3.pgn import read_games
+
+PGN = '''[White "a"]
+
+1. e4 e5 2. Nf3 Nc6 1-0
+
+[White "b"]
+
+1. e4 e5 2. Ke3 Nc6 0-1
+
+[White "c"]
+[FEN "not a position"]
+
+1. e4 1/2-1/2
+
+[White "d"]
+
+1. d4 d5 *
+'''
+
+
+def test_bad_games_are_reported_and_skipped():
+    games = list(read_games(io.StringIO(PGN), boards=True))
+    assert [game.headers['White'] for game in games] == ['a', 'b', 'c', 'd']
+    assert [game.error is None for game in games] == [True, False, False, True]
+    assert 'Ke3' in games[1].error
+    # the boards stop before the move at fault
+    assert len(games[1].boards) == 3
+    assert games[2].boards == []
+    assert len(games[3].boards) == 3
+
+
+def test_no_replay_without_validation():
+    games = list(read_games(io.StringIO(PGN), validate=False))
+    assert all(game.error is None for game in games)
+    assert games[1].moves == ['e4', 'e5', 'Ke3', 'Nc6']
+
+
+def test_end_of_line_comment():
+    game, = read_games(io.StringIO('[White "a"]\n\n1. e4 e5 ; a comment\n2. Nf3 Nc6 *\n'))
+    assert game.moves == ['e4', 'e5', 'Nf3', 'Nc6']
+    assert game.error is None
+
+
+def test_comment_over_several_lines():
+    pgn = '[White "a"]\n\n1. e4 {a comment\n[that looks like a header]\nstill the comment} e5 2. Nf3 *\n'
+    game, = read_games(io.StringIO(pgn))
+    assert game.headers == {'White': 'a'}
+    assert game.moves == ['e4', 'e5', 'Nf3']
+    assert game.error is None
@@ -0,0 +1,92 @@
+# -*- coding:utf-8 -*-
+"""Pondering : the expected reply is searched on the opponent's time, the search goes on when it is played."""
+import logging
+import time
+
+import pytest
+
+from chess3 import BoardState
+from chess3.__main__ import uci_game, xboard_game
+
+
+def _wait_for_log(caplog, prefix, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for message in caplog.messages:
+            if message.startswith(prefix):
+                return message
+        time.sleep(0.01)
+    raise AssertionError('no %r in the log' % prefix)
+
+
+@pytest.fixture
+def pondering(protocol, caplog):
+    """An xboard engine, with one second per move, pondering after its reply to 1.e4 : returns
+       send, output, the board after its reply and the expected move"""
+    caplog.set_level(logging.DEBUG)
+    send, output = protocol(xboard_game)
+    for command in ('new', 'hard', 'st 1', 'e2e4'):
+        send(command)
+    board = BoardState().apply_move(BoardState().find_move_from_san('e4'))
+    reply = output.expect('move ').split()[1]
+    board = board.apply_move(next(m for m in board.legal_moves() if m.to_xboard_notation() == reply))
+    expected = _wait_for_log(caplog, 'pondering on ').split()[-1]
+    return send, output, board, expected
+
+
+def test_xboard_ponder_hit(pondering, caplog):
+    send, output, board, expected = pondering
+    time.sleep(0.5)
+    started = time.time()
+    send(expected)
+    _wait_for_log(caplog, 'ponder hit')
+    output.expect('move ')
+    # the search started on the opponent's time, it is given one second from the move
+    assert time.time() - started < 3
+
+
+def test_xboard_ponder_miss(pondering, caplog):
+    send, output, board, expected = pondering
+    other = next(m.to_xboard_notation() for m in board.legal_moves() if m.to_xboard_notation() != expected)
+    send(other)
+    move = output.expect('move ').split()[1]
+    assert not any(message.startswith('ponder hit') for message in caplog.messages)
+    board = board.apply_move(next(m for m in board.legal_moves() if m.to_xboard_notation() == other))
+    assert move in {m.to_xboard_notation() for m in board.legal_moves()}
+
+
+def test_xboard_easy_stops_pondering(pondering, caplog):
+    send, output, board, expected = pondering
+    for command in ('easy', expected):
+        send(command)
+    output.expect('move ')
+    assert not any(message.startswith('ponder hit') for message in caplog.messages)
+
+
+def test_uci_ponderhit(protocol):
+    send, output = protocol(uci_game)
+    for command in ('position startpos moves e2e4 e7e5', 'go ponder movetime 300', 'isready'):
+        send(command)
+    output.expect('readyok')
+    time.sleep(0.5)
+    # no move until the opponent plays the expected one, however long the search
+    assert not any(line.startswith('bestmove ') for line in output.lines)
+    started = time.time()
+    send('ponderhit')
+    output.expect('bestmove ')
+    assert time.time() - started < 3
+
+
+def test_uci_ponder_miss(protocol):
+    send, output = protocol(uci_game)
+    for command in ('position startpos moves e2e4 e7e5', 'go ponder movetime 300', 'stop'):
+        send(command)
+    # the GUI stops the search and ignores its move, then sends the position actually played
+    output.expect('bestmove ')
+    for command in ('position startpos moves e2e4 e7e5 d2d4', 'go depth 2'):
+        send(command)
+    move = output.expect('bestmove ').split()[1]
+    board = BoardState()
+    for san in ('e4', 'e5', 'd4'):
+        board = board.apply_move(board.find_move_from_san(san))
+    assert move in {m.to_xboard_notation() for m in board.legal_moves()}
@@ -0,0 +1,35 @@
+# -*- coding:utf-8 -*-
+"""The root moves spread over a process pool share the nodes budget of the search."""
+import random
+from multiprocessing import Pool
+
+import pytest
+
+from chess3 import BoardState, SearchControl, TranspositionTable, find_best_move
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+MAX_NODES = 100000
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with Pool(2) as pool:
+        yield pool
+
+
+def _search(process_pool):
+    random.seed(0)
+    return find_best_move(BoardState.from_FEN(KIWIPETE), process_pool=process_pool, depth=10,
+                          transposition_table=TranspositionTable(), control=SearchControl(max_nodes=MAX_NODES),
+                          with_stats=True)
+
+
+def test_pool_and_serial_at_the_same_nodes_budget(pool):
+    serial_move, serial = _search(None)
+    pool_move, parallel = _search(pool)
+    assert serial.depth >= 1
+    # the workers may each go a few nodes over before they see that the budget is used up
+    assert MAX_NODES <= parallel.nodes <= MAX_NODES * 1.05
+    assert parallel.depth >= serial.depth - 1
+    assert pool_move in BoardState.from_FEN(KIWIPETE).legal_moves()
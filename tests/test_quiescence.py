@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+"""Quiescence search : stand pat, the exchanges played out, the checks escaped, and delta pruning."""
+import sys
+
+from chess3 import (BoardState, MG_VALUES, PAWN, QUEEN, SearchControl, SearchOptions, negamax_alphabeta,
+                    quiescence)
+
+# the rook on a1 may take the undefended queen on a6
+HANGING = '4k3/8/q2p4/4p3/8/8/8/R3K2R w - - 0 1'
+
+
+def test_stand_pat_in_a_quiet_position():
+    board = BoardState()
+    control = SearchControl()
+    assert quiescence(board, control=control) == board.evaluate()
+    assert control.qnodes == control.nodes
+
+
+def test_exchange_played_out():
+    board = BoardState.from_FEN(HANGING)
+    # the queen is won, not more
+    score = quiescence(board)
+    assert score > board.evaluate() + MG_VALUES[QUEEN] // 2
+    assert score < board.evaluate() + 2 * MG_VALUES[QUEEN]
+
+
+def test_defended_pawn_is_not_taken():
+    # without the queen, taking the pawn on e5 loses the rook : the side to play stands pat
+    board = BoardState.from_FEN('4k3/8/3p4/4p3/8/8/8/4K2R w - - 0 1')
+    assert board.find_move_from_san('Rh5') is not None
+    assert quiescence(board) == board.evaluate()
+
+
+def test_checkmate():
+    board = BoardState.from_FEN('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3')
+    assert quiescence(board) == -sys.maxsize
+
+
+def test_stand_pat_cutoff():
+    board = BoardState.from_FEN(HANGING)
+    control = SearchControl()
+    evaluation = board.evaluate()
+    assert quiescence(board, evaluation - 100, evaluation - 50, control) >= evaluation - 50
+    assert control.nodes == 1
+
+
+def test_delta_pruning():
+    # far below alpha, taking a pawn cannot help : not even tried
+    board = BoardState.from_FEN('4k3/8/8/4p3/8/8/8/4K2R w - - 0 1')
+    evaluation = board.evaluate()
+    control = SearchControl()
+    alpha = evaluation + MG_VALUES[PAWN] + 500
+    assert quiescence(board, alpha, alpha + 100, control) == evaluation
+    assert control.nodes == 1
+
+
+def test_counted_apart():
+    control = SearchControl()
+    board = BoardState.from_FEN(HANGING)
+    assert negamax_alphabeta(board, depth=0, control=control) == quiescence(board)
+    control = SearchControl()
+    negamax_alphabeta(board, depth=2, control=control, options=SearchOptions(null_move=False))
+    assert 0 < control.qnodes < control.nodes
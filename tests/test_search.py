@@ -0,0 +1,44 @@
+# -*- coding:utf-8 -*-
+"""Each selective part of the search (see SearchOptions) may be switched off without changing the move found."""
+import pytest
+
+from chess3 import BoardState, DEFAULT_DEPTH, SearchOptions, TranspositionTable, negamax_alphabeta
+from chess3.bench import BENCH_POSITIONS, search
+
+FLAGS = ('pvs', 'aspiration', 'null_move', 'lmr')
+
+PLAIN = SearchOptions(**dict.fromkeys(FLAGS, False))
+
+# a middlegame with tactics, a quiet one and an endgame
+POSITIONS = [BENCH_POSITIONS[2], BENCH_POSITIONS[4], BENCH_POSITIONS[6]]
+
+
+@pytest.fixture(scope='module')
+def plain():
+    return {fen: search(fen, PLAIN, 3) for fen in POSITIONS}
+
+
+@pytest.mark.parametrize('flag', FLAGS)
+def test_switch_each_option(flag, plain):
+    without = SearchOptions(**{flag: False})
+    alone = SearchOptions(**dict((name, name == flag) for name in FLAGS))
+    for fen in POSITIONS:
+        for options in (without, alone):
+            assert search(fen, options, 3).move == plain[fen].move, (fen, options)
+
+
+def test_all_options(plain):
+    for fen in POSITIONS:
+        stats = search(fen, SearchOptions(), 3)
+        assert stats.move == plain[fen].move, fen
+        assert stats.nodes < plain[fen].nodes, fen
+
+
+def test_lmr_keeps_the_last_ply():
+    # reducing into the last ply made 1.a3 look as good as the best moves
+    board = BoardState()
+    for san in ('a3', 'e4', 'Nf3'):
+        child = board.apply_move(board.find_move_from_san(san))
+        scores = [negamax_alphabeta(child, depth=DEFAULT_DEPTH, transposition_table=TranspositionTable(),
+                                    options=SearchOptions(lmr=lmr)) for lmr in (True, False)]
+        assert scores[0] == scores[1], san
@@ -0,0 +1,39 @@
+# -*- coding:utf-8 -*-
+"""Lazy SMP : the move played when the workers did not complete a single iteration, the reported depths."""
+from multiprocessing import Pool, resource_tracker
+
+import pytest
+
+from chess3 import BoardState, SearchControl, find_best_move
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+
+@pytest.fixture(scope='module')
+def pool():
+    # the workers must report the shared table to the resource tracker of this process
+    resource_tracker.ensure_running()
+    with Pool(2) as pool:
+        yield pool
+
+
+# 1 node : nothing searched at all, a few thousands : some of the root moves searched
+@pytest.mark.parametrize('max_nodes', [1, 12000])
+def test_unfinished_search_is_not_the_first_move(pool, max_nodes):
+    board = BoardState.from_FEN(KIWIPETE)
+    move, stats = find_best_move(board, process_pool=pool, lazy_smp=2, depth=10,
+                                 control=SearchControl(max_nodes=max_nodes), with_stats=True)
+    assert stats.depth == -1
+    assert move in board.legal_moves()
+    assert move != next(iter(board.legal_moves()))
+
+
+def test_on_depth(pool):
+    board = BoardState.from_FEN(KIWIPETE)
+    depths = []
+    move, stats = find_best_move(board, process_pool=pool, lazy_smp=2, depth=2,
+                                 on_depth=lambda stats: depths.append((stats.depth, stats.nodes)), with_stats=True)
+    # the iterations of the main worker, with the nodes of all the workers
+    assert [depth for depth, nodes in depths] == [0, 1, 2]
+    assert 0 < depths[0][1] <= depths[1][1] <= depths[2][1] <= stats.nodes
+    assert stats.depth == 2 and stats.move == move
@@ -0,0 +1,57 @@
+# -*- coding:utf-8 -*-
+"""Search statistics : the counters, the rates and the iterations reported by find_best_move."""
+from chess3 import BoardState, SearchControl, SearchStats, TranspositionTable, find_best_move
+
+MIDDLEGAME = 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10'
+
+
+def test_on_depth():
+    board = BoardState.from_FEN(MIDDLEGAME)
+    reported = []
+
+    def on_depth(stats):
+        reported.append((stats.depth, stats.nodes, len(stats.iterations), stats.move))
+
+    move, stats = find_best_move(board, depth=3, on_depth=on_depth, with_stats=True)
+    # once per completed iteration, the counters growing
+    assert [depth for depth, nodes, iterations, best in reported] == [0, 1, 2, 3]
+    assert [iterations for depth, nodes, iterations, best in reported] == [1, 2, 3, 4]
+    nodes = [nodes for depth, nodes, iterations, best in reported]
+    assert nodes == sorted(nodes) and nodes[0] > 0
+    assert reported[-1][3] == move == stats.move
+    assert [depth for depth, seconds, nodes in stats.iterations] == [0, 1, 2, 3]
+    assert sum(nodes for depth, seconds, nodes in stats.iterations) == stats.nodes
+
+
+def test_counters_and_rates():
+    board = BoardState.from_FEN(MIDDLEGAME)
+    table = TranspositionTable()
+    move, stats = find_best_move(board, depth=3, transposition_table=table, control=SearchControl(),
+                                 with_stats=True)
+    assert move in board.legal_moves()
+    assert (stats.depth, stats.move) == (3, move)
+    assert 0 < stats.qnodes < stats.nodes
+    assert 0 < stats.first_cutoffs <= stats.cutoffs
+    assert 0 < stats.tt_hits <= stats.tt_probes
+    assert 0 < stats.first_cutoff_rate <= 1 and 0 < stats.tt_hit_rate <= 1
+    assert stats.nps > 0 and stats.elapsed > 0
+    assert stats.branching_factor == stats.iterations[-1][2] / stats.iterations[-2][2]
+    assert 'depth 3' in str(stats)
+
+
+def test_fixed_depth_search():
+    # not iterative : a single iteration, at the given depth
+    move, stats = find_best_move(BoardState.from_FEN(MIDDLEGAME), depth=2, with_stats=True)
+    assert [depth for depth, seconds, nodes in stats.iterations] == [2]
+    assert stats.iterations[0][2] == stats.nodes
+    assert stats.branching_factor == 0.
+
+
+def test_nothing_searched():
+    stats = SearchStats()
+    assert (stats.depth, stats.score, stats.move) == (-1, None, None)
+    assert stats.nps == 0 and stats.first_cutoff_rate == 0. and stats.tt_hit_rate == 0.
+    assert stats.branching_factor == 0.
+    # mated : no move to search
+    move, stats = find_best_move(BoardState.from_FEN('7k/6Q1/6K1/8/8/8/8/8 b - - 0 1'), with_stats=True)
+    assert move is None and stats.nodes == 0
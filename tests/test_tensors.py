@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+"""Tensor export : the planes, features and masks of each board, whatever the chunks and the pool."""
+import random
+from multiprocessing import Pool
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from chess3 import BoardState  # noqa: E402
+from chess3.perft import REFERENCE_POSITIONS  # noqa: E402
+from chess3.tensors import FEATURES, PLANES, batches, encode  # noqa: E402
+
+
+def _boards(plies=40, seed=3):
+    """Boards met along a random game from each reference position"""
+    rng = random.Random(seed)
+    boards = []
+    for name, fen, counts in REFERENCE_POSITIONS:
+        board = BoardState.from_FEN(fen)
+        for _ in range(plies):
+            boards.append(board)
+            moves = list(board.legal_moves())
+            if not moves:
+                break
+            board = board.apply_move(rng.choice(moves))
+    return boards
+
+
+def _arrays(n, masks=True):
+    return (numpy.zeros((n, PLANES, 8, 8), dtype=numpy.float32), numpy.zeros((n, FEATURES), dtype=numpy.float32),
+            numpy.zeros((n, 64, 64), dtype=numpy.uint8) if masks else None)
+
+
+def test_planes_features_and_masks():
+    boards = _boards()
+    planes, features, masks = _arrays(len(boards))
+    assert encode(boards, planes, features, masks, chunksize=7) == len(boards)
+    for index, board in enumerate(boards):
+        for square, piece in enumerate(board._mailbox):
+            column = planes[index, :, square // 8, square % 8]
+            if piece is None:
+                assert not column.any()
+            else:
+                assert column.sum() == 1 and column[piece] == 1
+        assert features[index, 0] == (board.trait == 'w')
+        fen_castling = board.to_FEN().split()[2]
+        assert [bool(f) for f in features[index, 1:5]] == [c in fen_castling for c in 'KQkq']
+        assert features[index, 5:].sum() == (board._ep is not None)
+        moves = {(move.from_square, move.to_square) for move in board.legal_moves()}
+        assert masks[index].sum() == len(moves)
+        assert all(masks[index, frm, to] for frm, to in moves)
+
+
+def test_fen_strings():
+    boards = _boards(10)
+    expected, from_fen = _arrays(len(boards), False), _arrays(len(boards), False)
+    encode(boards, *expected[:2])
+    encode([board.to_FEN() for board in boards], *from_fen[:2])
+    assert (expected[0] == from_fen[0]).all() and (expected[1] == from_fen[1]).all()
+
+
+def test_chunks():
+    boards = _boards(10)
+    chunks = list(batches(boards, chunksize=4))
+    assert [len(planes) for planes, features, masks in chunks] == [4] * (len(boards) // 4) + (
+        [len(boards) % 4] if len(boards) % 4 else [])
+    assert all(masks is None for planes, features, masks in chunks)
+
+
+def test_process_pool():
+    boards = _boards(10)
+    expected, pooled = _arrays(len(boards)), _arrays(len(boards))
+    encode(boards, *expected, chunksize=5)
+    with Pool(2) as pool:
+        encode(boards, *pooled, chunksize=5, process_pool=pool)
+    assert all((a == b).all() for a, b in zip(expected, pooled))
+
+
+def test_too_many_boards():
+    planes, features, masks = _arrays(2, False)
+    with pytest.raises(ValueError):
+        encode([BoardState()] * 3, planes, features)
@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+"""The transposition table : replacement policies, and bounds that give the search the same scores."""
+import sys
+
+import pytest
+
+from chess3 import (BoardState, EXACT, LOWERBOUND, UPPERBOUND, SearchOptions, TranspositionTable,
+                    negamax_alphabeta)
+from chess3.bench import BENCH_POSITIONS
+
+# the selective parts of the search are left out : the scores must be exactly the same with and without table
+PLAIN = SearchOptions(pvs=False, aspiration=False, null_move=False, lmr=False)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        TranspositionTable(policy='oldest')
+
+
+def test_probe():
+    table = TranspositionTable(1)
+    assert table.probe(12345) is None
+    table.store(12345, 3, 42, EXACT, 796)
+    assert table.probe(12345) == (12345, 3, 42, EXACT, 796, 0)
+    # another key that falls in the same slot
+    assert table.probe(12345 + table.size) is None
+
+
+def test_depth_preferred():
+    table = TranspositionTable(1)
+    key, other = 7, 7 + table.size
+    table.store(key, 4, 10, EXACT)
+    # a shallower search of another position does not replace the entry
+    table.store(other, 2, 20, EXACT)
+    assert table.probe(key)[1] == 4 and table.probe(other) is None
+    # a shallower search of the same position does
+    table.store(key, 1, 30, LOWERBOUND)
+    assert table.probe(key)[1:4] == (1, 30, LOWERBOUND)
+    table.store(other, 2, 20, EXACT)
+    assert table.probe(other)[1] == 2
+    # the entries of a previous search are always replaced
+    table.new_search()
+    table.store(key, 0, 40, UPPERBOUND)
+    assert table.probe(key)[1:4] == (0, 40, UPPERBOUND) and table.probe(other) is None
+
+
+def test_always_replace():
+    table = TranspositionTable(1, policy='always')
+    key, other = 7, 7 + table.size
+    table.store(key, 4, 10, EXACT)
+    table.store(other, 1, 20, EXACT)
+    assert table.probe(key) is None and table.probe(other)[1] == 1
+
+
+def test_clear():
+    table = TranspositionTable(1)
+    table.new_search()
+    table.store(7, 4, 10, EXACT)
+    table.clear()
+    assert table.probe(7) is None and table.generation == 0
+
+
+@pytest.mark.parametrize('fen', BENCH_POSITIONS[2:5])
+def test_same_scores_with_the_table(fen):
+    board = BoardState.from_FEN(fen)
+    table = TranspositionTable()
+    for depth in (1, 2, 3):
+        expected = negamax_alphabeta(board, depth=depth, options=PLAIN)
+        # the table is kept from one depth to the next, as iterative deepening does
+        assert negamax_alphabeta(board, depth=depth, transposition_table=table, options=PLAIN) == expected
+        # a search with a narrow window gives a bound on the same side as the exact score
+        for a, b in ((expected - 30, expected - 10), (expected + 10, expected + 30)):
+            score = negamax_alphabeta(board, a, b, depth=depth, transposition_table=table, options=PLAIN)
+            assert (score <= a) == (expected <= a) and (score >= b) == (expected >= b)
+        # the position itself is stored, at that depth
+        entry = table.probe(board.zobrist_hash)
+        assert entry[1] == depth
+
+
+def test_bounds_stored():
+    board = BoardState.from_FEN(BENCH_POSITIONS[4])
+    exact = negamax_alphabeta(board, depth=2, options=PLAIN)
+    table = TranspositionTable()
+    # fails high
+    negamax_alphabeta(board, -sys.maxsize, exact - 1, depth=2, transposition_table=table, options=PLAIN)
+    assert table.probe(board.zobrist_hash)[3] == LOWERBOUND
+    table.clear()
+    # fails low
+    negamax_alphabeta(board, exact + 1, sys.maxsize, depth=2, transposition_table=table, options=PLAIN)
+    assert table.probe(board.zobrist_hash)[3] == UPPERBOUND
+    table.clear()
+    negamax_alphabeta(board, depth=2, transposition_table=table, options=PLAIN)
+    assert table.probe(board.zobrist_hash)[2:4] == (exact, EXACT)
@@ -0,0 +1,116 @@
+# -*- coding:utf-8 -*-
+"""The UCI loop : the handshake, the positions, the limits of 'go' and the 'info' lines of the search."""
+import time
+
+import pytest
+
+from chess3 import BoardState
+from chess3.__main__ import UciPosition, uci_game, uci_limits, uci_position
+
+
+@pytest.fixture
+def engine(protocol):
+    return protocol(uci_game)
+
+
+def _legal(fen, notation):
+    return notation in {move.to_xboard_notation() for move in BoardState.from_FEN(fen).legal_moves()}
+
+
+def test_handshake(engine):
+    send, output = engine
+    send('uci')
+    assert output.expect('option name Hash ') == 'option name Hash type spin default 16 min 1 max 4096'
+    output.expect('uciok')
+    send('isready')
+    output.expect('readyok')
+    send('bogus')
+    assert output.expect('info string') == 'info string ignored command: bogus'
+
+
+def test_go_depth(engine):
+    send, output = engine
+    for command in ('ucinewgame', 'position startpos moves e2e4 e7e5', 'go depth 3'):
+        send(command)
+    infos = []
+    while True:
+        line = output.expect(lambda line: line.startswith(('info depth ', 'bestmove ')))
+        if line.startswith('bestmove '):
+            break
+        infos.append(line.split())
+    move = line.split()[1]
+    # one line per completed depth, with its score, counters and principal variation
+    assert [int(info[2]) for info in infos] == [1, 2, 3]
+    for info in infos:
+        assert info[3:5] in (['score', 'cp'], ['score', 'mate'])
+        assert info[6] == 'nodes' and info[8] == 'nps' and info[10] == 'time' and info[12] == 'pv'
+    assert infos[-1][13] == move
+    assert _legal('rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2', move)
+
+
+def test_go_nodes_and_movetime(engine):
+    send, output = engine
+    send('position fen 4k3/8/8/8/8/8/4P3/4K3 w - - 0 1 moves e1d1')
+    send('go nodes 500')
+    nodes = int(output.expect('info nodes ').split()[2])
+    # the budget is checked every few nodes
+    assert nodes < 1000
+    output.expect('bestmove ')
+    started = time.time()
+    send('go movetime 200')
+    output.expect('bestmove ')
+    assert time.time() - started < 5
+
+
+def test_go_infinite_and_stop(engine):
+    send, output = engine
+    for command in ('position startpos', 'go infinite', 'isready'):
+        send(command)
+    output.expect('readyok')
+    time.sleep(0.2)
+    assert not any(line.startswith('bestmove ') for line in output.lines)
+    send('stop')
+    assert _legal(BoardState().to_FEN(), output.expect('bestmove ').split()[1])
+
+
+def test_setoption_and_bad_position(engine):
+    send, output = engine
+    for command in ('setoption name Hash value 1', 'setoption name Colour value red',
+                    'position startpos moves e2e5', 'isready'):
+        send(command)
+    assert output.expect('info string') == 'info string unknown option colour'
+    assert output.expect('info string') == 'info string illegal move: e2e5'
+    output.expect('readyok')
+    send('go depth 1')
+    output.expect('bestmove ')
+
+
+def test_position_reuses_the_board(monkeypatch):
+    position = UciPosition()
+    board = position.update(*uci_position(['startpos', 'moves', 'e2e4']))
+    played = []
+    apply_move = BoardState.apply_move
+    monkeypatch.setattr(BoardState, 'apply_move', lambda self, move, *args, **kwargs: (
+        played.append(move.to_xboard_notation()), apply_move(self, move, *args, **kwargs))[1])
+    # the game goes on : the board of the previous command is kept, only the new move is played
+    after = position.update(*uci_position(['startpos', 'moves', 'e2e4', 'e7e5']))
+    assert played == ['e7e5']
+    assert position.moves == ['e2e4', 'e7e5']
+    monkeypatch.undo()
+    assert after.to_FEN() == board.apply_move(board.find_move_from_san('e5')).to_FEN()
+    # another game starts over
+    fen = '4k3/8/8/8/8/8/4P3/4K3 w - - 0 1'
+    assert position.update(*uci_position(['fen'] + fen.split())).to_FEN() == fen
+    assert position.moves == []
+
+
+def test_limits():
+    board = BoardState()
+    assert uci_limits(['infinite'], board)[1:] == (None, None, True)
+    assert uci_limits([], board)[3]
+    depth, deadline, max_nodes, infinite = uci_limits(['depth', '4', 'nodes', '1000'], board)
+    assert (max_nodes, infinite, deadline) == (1000, False, None)
+    deadline = uci_limits(['wtime', '60000', 'btime', '1000', 'winc', '0'], board)[1]
+    # white's clock, not black's
+    assert 0 < deadline - time.time() < 60
+    assert deadline - time.time() > 1
@@ -0,0 +1,60 @@
+# -*- coding:utf-8 -*-
+"""The xboard loop answers the commands that arrive while the engine is thinking."""
+import time
+
+import pytest
+
+from chess3.__main__ import xboard_game
+
+
+def _fen(line):
+    return line.count('/') == 7 and not line.startswith('#')
+
+
+@pytest.fixture
+def engine(protocol):
+    return protocol(xboard_game)
+
+
+def test_ping_and_move_now_while_thinking(engine):
+    send, output = engine
+    for command in ('xboard', 'protover 2', 'new', 'st 60', 'go'):
+        send(command)
+    output.expect('feature done=1')
+    started = time.time()
+    send('ping 7')
+    assert output.expect('pong') == 'pong 7'
+    send('?')
+    output.expect('move ')
+    assert time.time() - started < 10
+
+
+def test_force_mode(engine):
+    send, output = engine
+    for command in ('new', 'force', 'e2e4', 'e7e5', 'fen'):
+        send(command)
+    assert output.expect(_fen) == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2'
+    assert not any(line.startswith('move ') for line in output.lines)
+    send('show')
+    assert output.expect('# : ') == '# : white to play'
+
+
+def test_reply_and_illegal_move(engine):
+    send, output = engine
+    for command in ('new', 'sd 2', 'e2e5'):
+        send(command)
+    output.expect('illegal move: e2e5')
+    send('e2e4')
+    move = output.expect('move ')
+    send('fen')
+    # the engine replied for black
+    assert output.expect(_fen).split()[1:2] == ['w']
+    assert len(move.split()[1]) == 4
+
+
+def test_quit_while_thinking(engine):
+    send, output = engine
+    for command in ('new', 'st 60', 'go', 'ping 1'):
+        send(command)
+    output.expect('pong 1')
+    # the fixture sends 'quit' : the loop must end without waiting for the search